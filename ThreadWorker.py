@@ -1,4 +1,5 @@
-from PyQt5.QtCore import pyqtSlot, QRunnable, QObject, pyqtSignal
+from PyQt5.QtCore import pyqtSlot, QRunnable, QObject, pyqtSignal, QThreadPool, QTimer
+import threading
 import traceback
 import sys
 
@@ -72,6 +73,99 @@ class WorkerSignals(QObject):
     progress = pyqtSignal(int)
 
 
+class LatestJobRunner(QObject):
+    """
+    Runs jobs in a thread pool, but only the most recently submitted one. Used for calculations triggered by widgets
+    that change quickly (spin boxes, sliders, ...), where only the result for the latest value matters.
+
+    Submitted job is started after a short delay, if another job is submitted in the meantime the first one is dropped
+    without ever starting (debouncing). Submitting a job also cancels the job that is currently running: the function
+    of every job gets a threading.Event as its only argument, and it should check it regularly and return as soon as
+    it is set. Results of superseded jobs are never passed to their callbacks.
+
+    """
+
+    def __init__(self, delay=100, thread_pool=None, parent=None):
+        """
+        :param delay: int: number of milliseconds to wait for another job before starting the submitted one
+        :param thread_pool: QThreadPool: pool in which jobs are started, global thread pool by default
+        :param parent: QObject: parent of the runner
+        """
+        super(LatestJobRunner, self).__init__(parent)
+
+        self.thread_pool = thread_pool if thread_pool is not None else QThreadPool.globalInstance()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.start_job)
+
+        # increased every time a job is submitted or cancelled, results of jobs from older generations are ignored
+        self.generation = 0
+
+        # (function, callback) of the job waiting for the timer to start it
+        self.pending = None
+
+        # event used to tell the currently running job to stop
+        self.cancel_event = None
+
+    def submit(self, func, callback):
+        """
+        Replace all previously submitted jobs by this one.
+
+        :param func: function(cancel_event) that calculates the result in a separate thread, returns None if cancelled
+        :param callback: function(result) called in the GUI thread with the result of the job
+        :return: NoneType
+        """
+        self.cancel()
+        self.pending = (func, callback)
+        self.timer.start()
+
+    def cancel(self):
+        """
+        Drop the job waiting to be started, and tell the running job (if there is one) to stop.
+
+        :return: NoneType
+        """
+        self.timer.stop()
+        self.pending = None
+        self.generation += 1
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+
+    def start_job(self):
+        """
+        Start the pending job in the thread pool.
+
+        :return: NoneType
+        """
+        if self.pending is None:
+            return
+        func, callback = self.pending
+        self.pending = None
+
+        generation = self.generation
+        self.cancel_event = threading.Event()
+        worker = Worker(func, self.cancel_event)
+        worker.signals.result.connect(lambda result: self.job_done(generation, callback, result))
+        self.thread_pool.start(worker)
+
+    def job_done(self, generation, callback, result):
+        """
+        Pass the result to the callback, unless the job was superseded or cancelled while it was running.
+
+        :param generation: int: generation of the finished job
+        :param callback: function(result) to call
+        :param result: result of the job
+        :return: NoneType
+        """
+        if generation != self.generation or result is None:
+            return
+        self.cancel_event = None
+        callback(result)
+
+
 def progress_func(progress):
     """
     Helper function for thread worker
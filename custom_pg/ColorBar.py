@@ -7,6 +7,8 @@ import pyqtgraph as pg
 import numpy as np
 from custom_pg.ViewBox import ViewBox
 from custom_pg.AxisItem import AxisItem
+from custom_pg.ImageItem import ImageItem
+from processing.ArrayStatistics import get_statistics
 from pyqtgraph import QtCore, QtGui
 
 logger = logging.getLogger(__name__)
@@ -135,8 +137,11 @@ class ColorBarItem(pg.GraphicsWidget):
             image_data = image.image
             if image_data is None:
                 return
-            self.images_min[image] = image_data.min()
-            self.images_max[image] = image_data.max()
+            # auto range of the bar is the range that the image uses when its levels are set automatically
+            if isinstance(image, ImageItem):
+                self.images_min[image], self.images_max[image] = image.get_auto_levels()
+            else:
+                self.images_min[image], self.images_max[image] = get_statistics(image_data).get_min_max()
         self.image_min = min(self.images_min.values())
         self.image_max = max(self.images_max.values())
         # Set spatial extent of bar to range of image
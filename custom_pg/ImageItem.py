@@ -7,6 +7,8 @@ import pyqtgraph as pg
 import numpy as np
 from pyqtgraph import QtCore
 
+from processing.ArrayStatistics import get_statistics, HISTOGRAM_BINS
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,6 +17,9 @@ class ImageItem(pg.ImageItem):
     sigLookupTableChanged = QtCore.Signal()
 
     def __init__(self, image=None, **kargs):
+        # (low, high) percentiles used as levels when levels are set automatically, None to use minimum and maximum
+        self.auto_percentiles = None
+
         pg.ImageItem.__init__(self, image, **kargs)
 
     def setLevels(self, levels, update=True):
@@ -63,4 +68,42 @@ class ImageItem(pg.ImageItem):
                 levels = self.levels
             else:
                 autoLevels = True
-        pg.ImageItem.setImage(self, image=image, autoLevels=autoLevels, levels=levels, **kwargs)
\ No newline at end of file
+        pg.ImageItem.setImage(self, image=image, autoLevels=autoLevels, levels=levels, **kwargs)
+
+    def get_auto_levels(self):
+        """
+        Levels used when levels are set automatically: minimum and maximum of the image, or the percentiles set in
+        auto_percentiles (robust to a few extreme values). Both are taken from the statistics cached for the image
+        data, percentiles are approximated from a subsample of the image.
+
+        :return: tuple: (low, high)
+        """
+        statistics = get_statistics(self.image)
+        if self.auto_percentiles is not None:
+            low, high = statistics.get_percentiles(*self.auto_percentiles)
+            if low < high:
+                return low, high
+        return statistics.get_min_max()
+
+    def quickMinMax(self, targetSize=1e6):
+        """
+        Levels used by pyqtgraph when levels are set automatically (see get_auto_levels).
+
+        :param targetSize: not used, kept for compatibility with pyqtgraph
+        :return: tuple: (min, max)
+        """
+        return self.get_auto_levels()
+
+    def getHistogram(self, bins='auto', step='auto', targetImageSize=200, targetHistogramSize=500, **kwds):
+        """
+        Histogram of the image, taken from the statistics cached for the image data. Calls with custom bins or steps,
+        and images with color channels, are passed to pyqtgraph.
+
+        :return: tuple: (left edges of the bins, counts)
+        """
+        if self.image is None or self.image.size == 0:
+            return None, None
+        if bins != 'auto' or step != 'auto' or kwds or self.image.ndim != 2:
+            return pg.ImageItem.getHistogram(self, bins=bins, step=step, targetImageSize=targetImageSize,
+                                             targetHistogramSize=targetHistogramSize, **kwds)
+        return get_statistics(self.image).get_histogram(HISTOGRAM_BINS)
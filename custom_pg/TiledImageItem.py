@@ -0,0 +1,174 @@
+from collections import OrderedDict
+from math import floor, log2
+
+import numpy as np
+import pyqtgraph.functions as fn
+from pyqtgraph import QtCore
+
+from custom_pg.ImageItem import ImageItem
+
+
+# Size (in pixels of the pyramid level) of the square tiles that the image is split into when it is colored
+TILE_SIZE = 512
+
+# Maximum number of colored tiles kept in memory (one tile takes TILE_SIZE^2 * 4 bytes)
+MAX_CACHED_TILES = 128
+
+
+class TiledImageItem(ImageItem):
+    """
+    Image item that draws very large images fast. Instead of coloring the whole image (applying levels and the lookup
+    table to every pixel) any time the levels or the colormap change, it colors only the parts of the image that are
+    visible, and only at the resolution that can actually be seen on the screen.
+
+    The image is kept as a pyramid of downsampled versions (level n is the image downsampled 2^n times by averaging).
+    When painting, the level with approximately one pixel per screen pixel is selected, and only the tiles of that level
+    that are visible in the view are colored. Colored tiles are cached until the image, the levels or the lookup table
+    change, so panning over already seen parts of the image does not color anything again.
+
+    Image coordinates are the same as for the normal ImageItem (one unit per pixel of the full resolution image), so
+    the item can be translated, scaled and used with histograms and ROIs the same way.
+
+    """
+
+    def __init__(self, image=None, **kargs):
+        # pyramid of downsampled images, index in the list is the level
+        self.pyramid = []
+
+        # (level, tile row, tile column): QImage, ordered from least recently used to most recently used
+        self.tiles = OrderedDict()
+
+        ImageItem.__init__(self, image, **kargs)
+
+    def setImage(self, image=None, autoLevels=True, levels=None, **kwargs):
+        if image is not None:
+            self.pyramid = []
+        self.clear_tiles()
+        ImageItem.setImage(self, image=image, autoLevels=autoLevels, levels=levels, **kwargs)
+
+    def setLevels(self, levels, update=True):
+        self.clear_tiles()
+        ImageItem.setLevels(self, levels, update)
+
+    def setLookupTable(self, lut, update=True, emit=True):
+        self.clear_tiles()
+        ImageItem.setLookupTable(self, lut, update, emit)
+
+    def clear_tiles(self):
+        """
+        Drop all colored tiles, they will be colored again the next time they are painted.
+
+        :return: NoneType
+        """
+        self.tiles = OrderedDict()
+
+    def get_level(self, level):
+        """
+        Get the image downsampled 2^level times. Levels are calculated from the previous level by averaging blocks of
+        2x2 pixels, and are kept until a new image is set.
+
+        :param level: int: pyramid level, 0 is the full resolution image
+        :return: np.ndarray: downsampled image
+        """
+        if not self.pyramid:
+            self.pyramid = [self.image]
+        while len(self.pyramid) <= level:
+            previous = self.pyramid[-1]
+            rows, columns = previous.shape[0] // 2 * 2, previous.shape[1] // 2 * 2
+            if rows == 0 or columns == 0:
+                return previous
+            blocks = previous[:rows, :columns].reshape(rows // 2, 2, columns // 2, 2, *previous.shape[2:])
+            self.pyramid.append(blocks.mean(axis=(1, 3)))
+        return self.pyramid[level]
+
+    @staticmethod
+    def choose_level(transform):
+        """
+        Select the pyramid level that has approximately one pixel per screen pixel at the current zoom.
+
+        :param transform: QTransform: transformation from image coordinates to device (screen) pixels
+        :return: int: pyramid level
+        """
+        pixel_size = min(np.hypot(transform.m11(), transform.m12()), np.hypot(transform.m21(), transform.m22()))
+        if pixel_size <= 0 or pixel_size >= 1:
+            return 0
+        return int(floor(log2(1.0 / pixel_size)))
+
+    def render_tile(self, data):
+        """
+        Apply levels and the lookup table to a part of the image.
+
+        :param data: np.ndarray: part of the image (column-major, same as the image)
+        :return: QImage: colored tile
+        """
+        lut = self.lut
+        if callable(lut):
+            lut = lut(self.image)
+        if self.axisOrder == "col-major":
+            data = data.transpose((1, 0, 2)[:data.ndim])
+        argb, alpha = fn.makeARGB(data, lut=lut, levels=self.levels)
+        return fn.makeQImage(argb, alpha, transpose=False)
+
+    def get_tile(self, level, row, column):
+        """
+        Get a colored tile of the pyramid level from the cache, or color it if it is not there.
+
+        :param level: int: pyramid level
+        :param row: int: index of the tile along the first axis of the image
+        :param column: int: index of the tile along the second axis of the image
+        :return: QImage: colored tile
+        """
+        key = (level, row, column)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        data = self.get_level(level)
+        rows = slice(row * TILE_SIZE, (row + 1) * TILE_SIZE)
+        columns = slice(column * TILE_SIZE, (column + 1) * TILE_SIZE)
+        tile = self.render_tile(data[rows, columns])
+        self.tiles[key] = tile
+        while len(self.tiles) > MAX_CACHED_TILES:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def paint(self, p, *args):
+        if self.image is None or self.image.size == 0 or self.levels is None:
+            return
+
+        level = self.choose_level(p.transform())
+        data = self.get_level(level)
+        factor = self.image.shape[0] / data.shape[0], self.image.shape[1] / data.shape[1]
+
+        # col-major images have the first axis of the image along the x axis, row-major along the y axis
+        col_major = self.axisOrder == "col-major"
+
+        # tiles of the selected level that are visible in the view
+        rows = range(0, (data.shape[0] - 1) // TILE_SIZE + 1)
+        columns = range(0, (data.shape[1] - 1) // TILE_SIZE + 1)
+        if p.hasClipping():
+            view = p.clipBoundingRect()
+        else:
+            inverse, invertible = p.transform().inverted()
+            view = inverse.mapRect(QtCore.QRectF(p.viewport())) if invertible else None
+        if view is not None:
+            (first_low, first_high), (second_low, second_high) = [(view.left(), view.right()),
+                                                                  (view.top(), view.bottom())][::1 if col_major else -1]
+            rows = range(max(int(first_low / factor[0]) // TILE_SIZE, 0),
+                         min(int(first_high / factor[0]) // TILE_SIZE + 1, len(rows)))
+            columns = range(max(int(second_low / factor[1]) // TILE_SIZE, 0),
+                            min(int(second_high / factor[1]) // TILE_SIZE + 1, len(columns)))
+
+        for row in rows:
+            for column in columns:
+                tile = self.get_tile(level, row, column)
+                first, second = row * TILE_SIZE * factor[0], column * TILE_SIZE * factor[1]
+                if col_major:
+                    target = QtCore.QRectF(first, second, tile.width() * factor[0], tile.height() * factor[1])
+                else:
+                    target = QtCore.QRectF(second, first, tile.width() * factor[1], tile.height() * factor[0])
+                p.drawImage(target, tile)
+
+        if self.border is not None:
+            p.setPen(self.border)
+            p.drawRect(self.boundingRect())
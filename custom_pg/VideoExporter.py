@@ -3,7 +3,6 @@ from pyqtgraph.parametertree import Parameter
 from pyqtgraph.GraphicsScene import GraphicsScene
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import QGraphicsItem
-from custom_pg.VideoPlayer import VideoPlayer
 
 __all__ = ['VideoExporter']
 
@@ -54,6 +53,9 @@ class VideoExporter(Exporter):
         return self.params
 
     def export(self, fileName=None, toBytes=False, copy=False):
+        # VideoPlayer needs opencv and pillow, import it only when the video is actually being recorded
+        from custom_pg.VideoPlayer import VideoPlayer
+
         area = self.getTargetRect()
         point = QtCore.QPoint(area.left(), area.top())
         if isinstance(self.item, GraphicsScene):
@@ -1,13 +1,11 @@
 from PyQt5.QtWidgets import QWidget, QDesktopWidget, QApplication, QVBoxLayout, QPushButton, QHBoxLayout, QLabel
 from PyQt5.QtCore import pyqtSignal, QPoint, QRectF, QThreadPool
 from PyQt5.QtGui import QIcon, QPixmap
-from PIL import ImageGrab
 from ThreadWorker import Worker
 
 import sys
 import numpy as np
 import pyqtgraph as pg
-import cv2
 
 
 class VideoPlayer(QWidget):
@@ -35,6 +33,9 @@ class VideoPlayer(QWidget):
         self.height = height
         self.position = position
 
+        # opencv and pillow are only needed when recording videos, so they are not imported before that
+        import cv2
+
         self.fourcc = cv2.VideoWriter_fourcc(*"XVID")
         self.out = cv2.VideoWriter("Untitled.avi", self.fourcc, 30.0, (int(self.width), int(self.height)))
 
@@ -95,6 +96,8 @@ class VideoPlayer(QWidget):
 
         :return:
         """
+        from PIL import ImageGrab
+
         img = ImageGrab.grab(bbox=(int(self.position.x()), int(self.position.y()),
                                    int(self.position.x() + self.width),
                                    int(self.position.y() + self.height)))
@@ -108,6 +111,8 @@ class VideoPlayer(QWidget):
         :param img:
         :return:
         """
+        import cv2
+
         if img is None:
             img = self.get_image()
         frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -171,6 +176,8 @@ class VideoPlayer(QWidget):
 
         :return:
         """
+        import cv2
+
         if self.recording:
             self.recording = False
             self.paused = False
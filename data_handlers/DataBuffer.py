@@ -115,13 +115,16 @@ class DataBuffer(QObject):
         in distance of 1 from previous, to have correct data u need to scale your complete data and for that u need to
         know the thing that is calculated here.
 
+        N points span N - 1 steps. The value is only exact for evenly spaced setpoints, for other setpoints it is the
+        average step.
+
         :return: tuple: (scale_x, scale_y)
         """
-        x_divider = len(self.data["x"])
-        if x_divider == 0:
+        x_divider = len(self.data["x"]) - 1
+        if x_divider <= 0:
             x_divider = 1
-        y_divider = len(self.data["y"][0])
-        if y_divider == 0:
+        y_divider = len(self.data["y"][0]) - 1
+        if y_divider <= 0:
             y_divider = 1
         return (self.data["x"][-1] - self.data["x"][0]) / x_divider, \
                (self.data["y"][0][-1] - self.data["y"][0][0]) / y_divider
@@ -213,20 +216,37 @@ class DataBuffer(QObject):
         print("Data is ready to be displayed.")
         return True
 
-    def create_matrix_file(self, index):
+    def create_matrix_file(self, index, location=None, progress=None):
         """
-        Create a matrix file for the specified matrix of this data set.
+        Create a matrix file for the specified matrix of this data set. Format of the file is selected by the extension
+        of the location (text, .npy, .npz or HDF5, see MatrixExport), axis values and labels are saved with the matrix.
 
         :param index: Specify the zero based index of the matrix in this buffer. For measurements that measure more then
                     one parameter.
+        :param location: string: location of the file, by default a text file next to the original file
+        :param progress: callable(float): called with the fraction of the matrix that is written
 
-        :return: NoneType
+        :return: string: location of the created file
+        """
+        from data_handlers.MatrixExport import export_matrix
+
+        if location is None:
+            location = self.location + "_matrix_{0}".format(index)
+        return export_matrix(location, self.get_matrix(index), self.get_x_axis_values(),
+                             self.get_y_axis_values()[0], self.get_matrix_labels(index), progress)
+
+    def get_matrix_labels(self, index):
+        """
+        Get names and units of the axes of one of the matrices of this data set.
+
+        :param index: int: zero based index of the matrix
+        :return: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
         """
-        name = self.location + "_matrix_{0}".format(index)
-        file = open(name, "w")
-        raw_data = np.transpose(self.get_matrix(index))
-        np.savetxt(file, raw_data, delimiter="\t")
-        file.close()
+        # VipData keeps labels of the measured parameters under "matrix"
+        z_labels = self.axis_values.get("z", self.axis_values.get("matrix", {}))
+        return {"x": self.axis_values["x"],
+                "y": self.axis_values["y"][0],
+                "z": z_labels.get(index, {"name": "matrix{}".format(index), "unit": ""})}
 
     def textual_data_representation(self):
         """
@@ -238,6 +258,30 @@ class DataBuffer(QObject):
 
         return self.textual
 
+    def get_session_state(self):
+        """
+        Method that returns everything needed to recreate this data buffer without reading the original file again.
+        Used when saving a session (SessionSnapshot.SnapshotData is created from this when the session is restored).
+
+        Heatmap windows append derived matrices to the list of matrices of the buffer, only the measured ones are
+        saved here, derived ones are saved as a part of the state of the Heatmap window.
+
+        :return: dict: state of this data buffer
+        """
+        data = dict(self.data)
+        if "matrix" in data:
+            data["matrix"] = list(data["matrix"][:self.number_of_measured_parameters])
+
+        return {"location": self.location,
+                "name": self.name,
+                "data": data,
+                "axis_values": self.axis_values,
+                "matrix_dimensions": self.matrix_dimensions,
+                "number_of_set_parameters": self.number_of_set_parameters,
+                "number_of_measured_parameters": self.number_of_measured_parameters,
+                "textual": self.textual,
+                "string_type": self.string_type}
+
 
 class AxisWindow(QWidget):
 
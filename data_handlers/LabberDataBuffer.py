@@ -1,13 +1,23 @@
 import numpy as np
-try:
-    from Script import Labber
-except ImportError as e:
-    print("Seems like Labber API files are not available on this computer.")
-    print("You will not be able to open Labber files on this PC.")
-    print("Detailed exception text: ", str(e))
 from data_handlers.DataBuffer import DataBuffer
 
 
+def import_labber_api():
+    """
+    Labber API is optional, and not installed on most computers. Import it only when a Labber file is being opened.
+
+    :return: Labber module
+    :raises ImportError: with an explanation for the user if the Labber API is not available on this computer
+    """
+    try:
+        from Script import Labber
+    except ImportError as e:
+        raise ImportError("Seems like Labber API files are not available on this computer.\n"
+                          "You will not be able to open Labber files on this PC.\n"
+                          "Detailed exception text: {}".format(str(e)))
+    return Labber
+
+
 class LabberData(DataBuffer):
 
     def __init__(self, location):
@@ -23,7 +33,7 @@ class LabberData(DataBuffer):
 
         self.alternate = {"x": False, "y": False}
 
-        self.log_file = Labber.LogFile(location)
+        self.log_file = import_labber_api().LogFile(location)
 
         self.matrix_dimensions = self.calculate_matrix_dimensions()
 
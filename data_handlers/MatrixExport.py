@@ -0,0 +1,212 @@
+import os
+import zipfile
+
+import numpy as np
+
+
+# Number of bytes of the matrix written at a time, progress is reported after every block
+EXPORT_BLOCK_SIZE = 2 ** 23
+
+# Format used to write values to text files, shortest representation that can be read back without losing precision
+TEXT_FORMAT = "%.17g"
+
+
+def import_h5py():
+    """
+    h5py is optional, and only needed to export matrices to HDF5 files. Import it only when such file is written.
+
+    :return: h5py module
+    :raises ImportError: with an explanation for the user if h5py is not installed
+    """
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError("Exporting to HDF5 files needs the h5py package, which is not installed on this computer.\n"
+                          "Detailed exception text: {}".format(str(e)))
+    return h5py
+
+
+def row_blocks(matrix, block_size=EXPORT_BLOCK_SIZE):
+    """
+    Split the matrix into blocks of consecutive rows of approximately block_size bytes.
+
+    :param matrix: np.ndarray: matrix
+    :param block_size: int: number of bytes in a block
+    :return: generator of (first row of the block, block)
+    """
+    row_size = max(matrix[0].nbytes, 1) if len(matrix) else 1
+    rows = max(1, block_size // row_size)
+    for start in range(0, len(matrix), rows):
+        yield start, matrix[start:start + rows]
+
+
+def report(progress, done, total):
+    """
+    Pass the fraction of the work that is done to the progress callback (if there is one).
+
+    :param progress: callable(float) or None: progress callback
+    :param done: int: amount of work done
+    :param total: int: total amount of work
+    :return: NoneType
+    """
+    if progress is not None:
+        progress(done / total if total else 1)
+
+
+def write_npy_array(file, array, progress=None):
+    """
+    Write an array to an open binary file in the .npy format, a block of rows at a time.
+
+    :param file: file object opened for writing in binary mode (a file on the disk or a member of a zip archive)
+    :param array: np.ndarray: array to write
+    :param progress: callable(float): called with the fraction of the array that is written
+    :return: NoneType
+    """
+    array = np.asarray(array)
+    header = {"descr": np.lib.format.dtype_to_descr(array.dtype), "fortran_order": False, "shape": array.shape}
+    np.lib.format.write_array_header_1_0(file, header)
+    if array.ndim == 0:
+        file.write(array.tobytes())
+        return
+    for start, block in row_blocks(array):
+        file.write(memoryview(np.ascontiguousarray(block)).cast("B"))
+        report(progress, start + len(block), len(array))
+
+
+def write_text(location, matrix, x_values, y_values, labels, progress=None):
+    """
+    Write the matrix to a text file in the same format that is read by MatrixFileDataBuffer (one line for every y
+    value, values separated by tabs). Labels and axis values are written in the header as comments, which are ignored
+    when the file is read.
+
+    :param location: string: location of the file
+    :param matrix: np.ndarray: matrix, first axis is the x axis
+    :param x_values: np.ndarray: values of the x axis
+    :param y_values: np.ndarray: values of the y axis
+    :param labels: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
+    :param progress: callable(float): called with the fraction of the matrix that is written
+    :return: NoneType
+    """
+    transposed = np.transpose(matrix)
+    with open(location, "w") as file:
+        for axis, values in [("x", x_values), ("y", y_values)]:
+            file.write("# {}: {} [{}]: {}\n".format(axis, labels[axis]["name"], labels[axis]["unit"],
+                                                      "\t".join(TEXT_FORMAT % value for value in values)))
+        file.write("# z: {} [{}]\n".format(labels["z"]["name"], labels["z"]["unit"]))
+        for start, block in row_blocks(transposed):
+            np.savetxt(file, block, fmt=TEXT_FORMAT, delimiter="\t")
+            report(progress, start + len(block), len(transposed))
+
+
+def write_npy(location, matrix, x_values, y_values, labels, progress=None):
+    """
+    Write only the matrix to a .npy file (the format holds a single array). Fastest format, and the file can be memory
+    mapped when it is loaded with numpy.load(location, mmap_mode="r"). Use .npz or HDF5 to keep the axes and labels.
+
+    :param location: string: location of the file
+    :param matrix: np.ndarray: matrix, first axis is the x axis
+    :param x_values: np.ndarray: values of the x axis (not saved)
+    :param y_values: np.ndarray: values of the y axis (not saved)
+    :param labels: dict: axis labels (not saved)
+    :param progress: callable(float): called with the fraction of the matrix that is written
+    :return: NoneType
+    """
+    with open(location, "wb") as file:
+        write_npy_array(file, matrix, progress)
+
+
+def write_npz(location, matrix, x_values, y_values, labels, progress=None):
+    """
+    Write the matrix, axis values and labels to a compressed .npz file. Arrays are stored under the names: matrix,
+    x, y, and x_name, x_unit, y_name, y_unit, z_name, z_unit for the labels.
+
+    Fastest compression level is used, higher levels take several times longer and barely reduce the size of measured
+    data (it is mostly noise).
+
+    :param location: string: location of the file
+    :param matrix: np.ndarray: matrix, first axis is the x axis
+    :param x_values: np.ndarray: values of the x axis
+    :param y_values: np.ndarray: values of the y axis
+    :param labels: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
+    :param progress: callable(float): called with the fraction of the matrix that is written
+    :return: NoneType
+    """
+    arrays = {"x": np.asarray(x_values), "y": np.asarray(y_values)}
+    for axis in ["x", "y", "z"]:
+        for key in ["name", "unit"]:
+            arrays["{}_{}".format(axis, key)] = np.array(str(labels[axis][key]))
+
+    with zipfile.ZipFile(location, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1, allowZip64=True) as archive:
+        for name, array in arrays.items():
+            with archive.open(name + ".npy", "w") as file:
+                write_npy_array(file, array)
+        with archive.open("matrix.npy", "w", force_zip64=True) as file:
+            write_npy_array(file, matrix, progress)
+
+
+def write_hdf5(location, matrix, x_values, y_values, labels, progress=None):
+    """
+    Write the matrix, axis values and labels to an HDF5 file. The matrix is saved in the dataset "matrix", axis values
+    in the datasets "x" and "y", which are attached to the matrix as dimension scales. Names and units are saved as
+    attributes of the datasets.
+
+    :param location: string: location of the file
+    :param matrix: np.ndarray: matrix, first axis is the x axis
+    :param x_values: np.ndarray: values of the x axis
+    :param y_values: np.ndarray: values of the y axis
+    :param labels: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
+    :param progress: callable(float): called with the fraction of the matrix that is written
+    :return: NoneType
+    """
+    h5py = import_h5py()
+
+    matrix = np.asarray(matrix)
+    with h5py.File(location, "w") as file:
+        dataset = file.create_dataset("matrix", shape=matrix.shape, dtype=matrix.dtype)
+        for start, block in row_blocks(matrix):
+            dataset[start:start + len(block)] = block
+            report(progress, start + len(block), len(matrix))
+        dataset.attrs["name"] = str(labels["z"]["name"])
+        dataset.attrs["unit"] = str(labels["z"]["unit"])
+
+        for dimension, (axis, values) in enumerate([("x", x_values), ("y", y_values)]):
+            scale = file.create_dataset(axis, data=np.asarray(values))
+            scale.attrs["name"] = str(labels[axis]["name"])
+            scale.attrs["unit"] = str(labels[axis]["unit"])
+            scale.make_scale(axis)
+            dataset.dims[dimension].attach_scale(scale)
+
+
+# {extension: (description used in file dialogs, writer)}
+EXPORT_FORMATS = {".txt": ("Text file", write_text),
+                  ".npy": ("NumPy array (matrix only)", write_npy),
+                  ".npz": ("Compressed NumPy archive", write_npz),
+                  ".h5": ("HDF5 file", write_hdf5)}
+
+
+def get_file_filters():
+    """
+    :return: string: filters for QFileDialog, one for every export format
+    """
+    return ";;".join("{} (*{})".format(description, extension)
+                     for extension, (description, _) in EXPORT_FORMATS.items())
+
+
+def export_matrix(location, matrix, x_values, y_values, labels, progress=None):
+    """
+    Write the matrix to a file in the format selected by the extension of the location (text for unknown extensions,
+    so matrix files created by older versions keep working).
+
+    :param location: string: location of the file
+    :param matrix: np.ndarray: matrix, first axis is the x axis
+    :param x_values: np.ndarray: values of the x axis
+    :param y_values: np.ndarray: values of the y axis
+    :param labels: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
+    :param progress: callable(float): called with the fraction of the matrix that is written (from the thread that
+                     writes the file)
+    :return: string: location of the written file
+    """
+    extension = os.path.splitext(location)[1].lower()
+    _, writer = EXPORT_FORMATS.get(extension, EXPORT_FORMATS[".txt"])
+    writer(location, matrix, x_values, y_values, labels, progress)
+    return location
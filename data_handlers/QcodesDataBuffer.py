@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 import helpers
 import json
 import os
@@ -65,6 +64,9 @@ class QcodesData(DataBuffer):
                         y: contains set values of parameter that represents y axis on the graph
                         z: contains list of ndarrays, which represent results of measured parameters
         """
+        # pandas is slow to import, and is only needed while parsing the file
+        import pandas as pd
+
         data = np.loadtxt(self.location, dtype=float)
         self.textual = np.array2string(data)
         self.number_of_set_parameters = self.get_number_of_dimension() - 1
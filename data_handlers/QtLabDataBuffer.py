@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 
 from data_handlers.DataBuffer import DataBuffer
 from helpers import show_error_message
@@ -30,6 +29,9 @@ class QtLabData(DataBuffer):
 
         :return: list: [len(x_axis_data), len(y_axis_data)]
         """
+        # pandas is slow to import, and is only needed while parsing the file
+        import pandas as pd
+
         self.raw_data = np.loadtxt(self.location, dtype=float)
         self.textual = np.array2string(self.raw_data)
         if len(self.raw_data) < 2:
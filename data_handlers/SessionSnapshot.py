@@ -0,0 +1,215 @@
+import json
+import struct
+
+import numpy as np
+
+from data_handlers.DataBuffer import DataBuffer
+
+
+# First bytes of every session file, used to recognize the file when loading it
+SNAPSHOT_MAGIC = b"GRAPHSAROS-SESSION"
+
+# Increase this if the layout of the header changes in a way that older versions can not read
+SNAPSHOT_VERSION = 1
+
+# Every array in the file starts at an offset that is a multiple of this number, so that it can be memory mapped
+ARRAY_ALIGNMENT = 64
+
+
+class SessionWriter:
+    """
+    Writes the state of a session (open data buffers, derived matrices, offsets, ...) to one binary file.
+
+    File layout:
+        SNAPSHOT_MAGIC
+        8 bytes: length of the JSON header (little endian unsigned integer)
+        JSON header: {"version": int, "arrays": [{dtype, shape, offset}], "state": encoded state}
+        padding up to ARRAY_ALIGNMENT
+        raw array data, every array aligned to ARRAY_ALIGNMENT (offsets are relative to the start of this section)
+
+    Arrays in the state are replaced with references to the array table in the header, everything else is saved as
+    JSON. This way the arrays can be memory mapped when the session is restored, and nothing needs to be parsed again.
+    """
+
+    def __init__(self):
+        # list of arrays that will be written to the file, index in this list is used as a reference in the header
+        self.arrays = []
+
+        # id(array) -> index in self.arrays, the same array referenced from multiple places is written only once
+        self.array_indices = {}
+
+    def add_array(self, array):
+        """
+        Register an array that needs to be written to the file and return a reference to it.
+
+        :param array: np.ndarray: array to be saved
+        :return: dict: reference to the array that is stored in the JSON header instead of the array itself
+        """
+        if id(array) not in self.array_indices:
+            self.array_indices[id(array)] = len(self.arrays)
+            self.arrays.append(array)
+        return {"__array__": self.array_indices[id(array)]}
+
+    def encode(self, obj):
+        """
+        Recursively convert the object to something that can be saved as JSON. Arrays are replaced by references,
+        dictionaries are saved as lists of items to keep keys that are not strings (axis_values use integer keys).
+
+        :param obj: object to encode
+        :return: JSON serializable version of the object
+        """
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject:
+                return [self.encode(value) for value in obj.tolist()]
+            return self.add_array(obj)
+        elif isinstance(obj, dict):
+            return {"__dict__": [[self.encode(key), self.encode(value)] for key, value in obj.items()]}
+        elif isinstance(obj, tuple):
+            return {"__tuple__": [self.encode(value) for value in obj]}
+        elif isinstance(obj, list):
+            return [self.encode(value) for value in obj]
+        elif isinstance(obj, np.generic):
+            return obj.item()
+        elif obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+        else:
+            return str(obj)
+
+    def write(self, location, state):
+        """
+        Write the session state to a file.
+
+        :param location: string: location of the session file on the disk
+        :param state: dict: state of the session, can contain nested lists, dicts and np.ndarrays
+        :return: NoneType
+        """
+        encoded_state = self.encode(state)
+
+        table = []
+        offset = 0
+        for array in self.arrays:
+            offset = align(offset)
+            table.append({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+            offset += array.nbytes
+
+        header = json.dumps({"version": SNAPSHOT_VERSION, "arrays": table, "state": encoded_state}).encode("utf-8")
+        data_start = align(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+        with open(location, "wb") as file:
+            file.write(SNAPSHOT_MAGIC)
+            file.write(struct.pack("<Q", len(header)))
+            file.write(header)
+            for array, entry in zip(self.arrays, table):
+                file.write(b"\0" * (data_start + entry["offset"] - file.tell()))
+                file.write(np.ascontiguousarray(array).tobytes())
+
+
+class SessionReader:
+    """
+    Reads a file created by SessionWriter. Arrays are memory mapped in copy-on-write mode, they are only read from the
+    disk when they are actually used, and modifying them does not change the session file.
+    """
+
+    def __init__(self, location):
+        self.location = location
+
+        with open(location, "rb") as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError("File {} is not a Graphsaros session file".format(location))
+            header_length, = struct.unpack("<Q", file.read(8))
+            header = json.loads(file.read(header_length).decode("utf-8"))
+
+        if header["version"] > SNAPSHOT_VERSION:
+            raise ValueError("Session file was created by a newer version of Graphsaros")
+
+        data_start = align(len(SNAPSHOT_MAGIC) + 8 + header_length)
+        self.arrays = []
+        for entry in header["arrays"]:
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+            if dtype.itemsize * int(np.prod(shape)) == 0:
+                self.arrays.append(np.empty(shape, dtype=dtype))
+            else:
+                self.arrays.append(np.memmap(location, dtype=dtype, mode="c",
+                                             offset=data_start + entry["offset"], shape=shape))
+
+        self.state = self.decode(header["state"])
+
+    def decode(self, obj):
+        """
+        Reverse of the SessionWriter.encode method.
+
+        :param obj: JSON object loaded from the header
+        :return: decoded object with arrays in place of the references
+        """
+        if isinstance(obj, dict):
+            if "__array__" in obj:
+                return self.arrays[obj["__array__"]]
+            elif "__tuple__" in obj:
+                return tuple(self.decode(value) for value in obj["__tuple__"])
+            elif "__dict__" in obj:
+                return {self.decode(key): self.decode(value) for key, value in obj["__dict__"]}
+        elif isinstance(obj, list):
+            return [self.decode(value) for value in obj]
+        return obj
+
+
+class SnapshotData(DataBuffer):
+    """
+    Data buffer restored from a session file. It has all the data that the original buffer had when the session was
+    saved, but it does not need to read the original file again.
+
+    """
+
+    def __init__(self, state):
+        super().__init__(state["location"])
+
+        self.name = state["name"]
+        self.data = state["data"]
+        self.axis_values = state["axis_values"]
+        self.matrix_dimensions = state["matrix_dimensions"]
+        self.number_of_set_parameters = state["number_of_set_parameters"]
+        self.number_of_measured_parameters = state["number_of_measured_parameters"]
+        self.textual = state["textual"]
+        self.string_type = state["string_type"]
+
+    def calculate_matrix_dimensions(self):
+        return self.matrix_dimensions
+
+    def prepare_data(self):
+        self.progress.emit(1)
+        return self.data
+
+    def get_axis_data(self):
+        return self.axis_values
+
+
+def align(offset):
+    """
+    Round the offset up to the nearest multiple of ARRAY_ALIGNMENT
+
+    :param offset: int: number of bytes
+    :return: int: aligned number of bytes
+    """
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+def save_session(location, state):
+    """
+    Write the state of the session to the file at the specified location.
+
+    :param location: string: location of the session file
+    :param state: dict: {"datasets": [buffer states], "heatmaps": [heatmap window states]}
+    :return: NoneType
+    """
+    SessionWriter().write(location, state)
+
+
+def load_session(location):
+    """
+    Read the state of the session from the file at the specified location.
+
+    :param location: string: location of the session file
+    :return: dict: state of the session with memory mapped arrays
+    """
+    return SessionReader(location).state
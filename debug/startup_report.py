@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+
+# Modules that take a long time to import and are not needed to display the main window
+HEAVY_MODULES = ["pyqtgraph", "pandas", "scipy", "cv2", "PIL", "h5py"]
+
+
+def parse_import_times(stderr):
+    """
+    Parse the output of python -X importtime into a dictionary.
+
+    Each line of the output looks like: "import time:       self [us] |  cumulative | imported package", nested imports
+    are indented in the last column.
+
+    :param stderr: string: everything python wrote to stderr while running with -X importtime
+    :return: dict: {module name: cumulative import time in seconds} for top level imports (imports that were not done
+                   as a part of importing some other module)
+    """
+    import_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        if package.startswith("  "):
+            # imported by some other module, already included in cumulative time of that module
+            continue
+        import_times[package.strip()] = int(cumulative) / 1e6
+    return import_times
+
+
+def measure_startup(timeout=120):
+    """
+    Start Graphsaros in a new process with "--startup-report" argument (the process exits right after the main window
+    is displayed) and python import time profiling turned on.
+
+    :param timeout: int: how many seconds to wait for the program to start
+    :return: dict: {"time_to_first_window": seconds from start of main.py until the main window was displayed,
+                    "import_times": {module: seconds} for all top level imports,
+                    "total_import_time": sum of all top level import times,
+                    "heavy_modules": list of modules from HEAVY_MODULES that got imported before the window was shown}
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "main.py", "--startup-report"], cwd=root, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+
+    report = None
+    for line in process.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            report = json.loads(line[len("STARTUP_REPORT "):])
+    if report is None:
+        raise RuntimeError("Graphsaros did not report its startup:\n{}".format(process.stderr[-2000:]))
+
+    import_times = parse_import_times(process.stderr)
+    loaded = set(report["modules"])
+
+    return {"time_to_first_window": report["time_to_first_window"],
+            "import_times": import_times,
+            "total_import_time": sum(import_times.values()),
+            "heavy_modules": [module for module in HEAVY_MODULES if module in loaded]}
+
+
+def main():
+    report = measure_startup()
+    print("Time to first window: {:.3f} s".format(report["time_to_first_window"]))
+    print("Total import time: {:.3f} s".format(report["total_import_time"]))
+    print("Heavy modules imported at startup: {}".format(", ".join(report["heavy_modules"]) or "none"))
+    print("Slowest imports:")
+    slowest = sorted(report["import_times"].items(), key=lambda item: item[1], reverse=True)[:15]
+    for module, seconds in slowest:
+        print("\t{:<40} {:.3f} s".format(module, seconds))
+
+
+if __name__ == "__main__":
+    main()
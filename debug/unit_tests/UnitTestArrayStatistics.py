@@ -0,0 +1,91 @@
+import gc
+import unittest
+
+import numpy as np
+
+from processing import ArrayStatistics as statistics_module
+from processing.ArrayStatistics import ArrayStatistics, get_statistics
+
+
+class ArrayStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(size=(300, 200))
+
+    def test_min_max_and_mean(self):
+        statistics = ArrayStatistics(self.data)
+        self.assertEqual(statistics.get_min_max(), (self.data.min(), self.data.max()))
+        self.assertAlmostEqual(statistics.get_mean(), self.data.mean())
+
+    def test_nan_values(self):
+        data = self.data.copy()
+        data[100:, :] = np.nan
+        statistics = ArrayStatistics(data)
+        self.assertEqual(statistics.get_min_max(), (np.nanmin(data), np.nanmax(data)))
+        self.assertAlmostEqual(statistics.get_mean(), np.nanmean(data))
+
+    def test_infinite_values(self):
+        # for example results of 1 / x or log(x) where x is 0
+        data = self.data.copy()
+        data[0, 0] = np.inf
+        data[5, 5] = -np.inf
+        finite = data[np.isfinite(data)]
+        statistics = ArrayStatistics(data)
+        self.assertEqual(statistics.get_min_max(), (finite.min(), finite.max()))
+        with_nan = data.copy()
+        with_nan[7, 7] = np.nan
+        self.assertEqual(ArrayStatistics(with_nan).get_min_max(), (finite.min(), finite.max()))
+        self.assertAlmostEqual(statistics.get_mean(), finite.mean())
+        self.assertTrue(np.isfinite(statistics.get_percentiles(0, 100)).all())
+
+        edges, counts = statistics.get_histogram(50)
+        self.assertEqual(edges[0], finite.min())
+        self.assertEqual(counts.sum(), statistics.get_sample().size)
+
+    def test_no_finite_values(self):
+        # statistics keep only a weak reference to the array
+        data = np.array([[np.nan, np.inf], [-np.inf, np.nan]])
+        statistics = ArrayStatistics(data)
+        self.assertTrue(np.isnan(statistics.get_min_max()).all())
+        self.assertTrue(np.isnan(statistics.get_mean()))
+        self.assertTrue(np.isnan(statistics.get_percentiles(50)).all())
+        self.assertEqual(statistics.get_histogram(), (None, None))
+
+    def test_subsample(self):
+        statistics = ArrayStatistics(self.data, max_samples=1000)
+        sample = statistics.get_sample()
+        self.assertLessEqual(sample.size, 1000)
+        self.assertTrue(np.all(np.diff(sample) >= 0))
+        low, high = statistics.get_percentiles(5, 95)
+        self.assertAlmostEqual(low, np.percentile(self.data, 5), delta=0.2)
+        self.assertAlmostEqual(high, np.percentile(self.data, 95), delta=0.2)
+
+    def test_constant_array(self):
+        data = np.ones((10, 10))
+        edges, counts = ArrayStatistics(data).get_histogram(10)
+        self.assertEqual(counts.sum(), 100)
+
+
+class GetStatisticsTest(unittest.TestCase):
+
+    def test_statistics_are_shared(self):
+        data = np.arange(10.0)
+        self.assertIs(get_statistics(data), get_statistics(data))
+        self.assertIsNot(get_statistics(data), get_statistics(data.copy()))
+
+    def test_statistics_are_forgotten(self):
+        data = np.arange(10.0)
+        key = id(data)
+        get_statistics(data)
+        self.assertIn(key, statistics_module._statistics)
+        del data
+        gc.collect()
+        self.assertNotIn(key, statistics_module._statistics)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from processing import expressions
+from processing.expressions import CompiledExpression, ExpressionError
+
+
+class CompiledExpressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.linspace(0.5, 2, 7)
+
+    def assert_rejected(self, source, variables=("x",)):
+        with self.assertRaises(ExpressionError):
+            CompiledExpression(source, variables)
+
+    def test_arithmetic_and_functions(self):
+        expression = CompiledExpression("2 * x ** 2 - sqrt(x) + np.log10(x) / pi", ("x",))
+        np.testing.assert_allclose(expression(x=self.x), 2 * self.x ** 2 - np.sqrt(self.x) + np.log10(self.x) / np.pi)
+        self.assertEqual(expression.variables, ["x"])
+
+    def test_attribute_access(self):
+        self.assert_rejected("x.__class__")
+        self.assert_rejected("x.__class__.__bases__[0].__subclasses__()")
+        self.assert_rejected("np.load")
+        self.assert_rejected("np.sqrt.__globals__")
+        self.assert_rejected("(1).real")
+
+    def test_import(self):
+        self.assert_rejected("__import__('os').system('ls')")
+        self.assert_rejected("__import__")
+        self.assert_rejected("__builtins__")
+
+    def test_keyword_calls(self):
+        self.assert_rejected("clip(x, a_min=0, a_max=1)")
+        self.assert_rejected("np.sqrt(x, out=x)")
+
+    def test_names(self):
+        self.assert_rejected("y + 1")
+        self.assert_rejected("open('file')")
+        self.assert_rejected("eval('1')")
+        self.assert_rejected("x + m0", ("x", "m1"))
+
+    def test_other_syntax(self):
+        self.assert_rejected("'text'")
+        self.assert_rejected("[x for x in range(10)]")
+        self.assert_rejected("lambda: x")
+        self.assert_rejected("x[0]")
+        self.assert_rejected("x if x else 1")
+        self.assert_rejected("x +")
+
+    def test_large_integer_powers(self):
+        # integer constants are evaluated as floats, so the power overflows instead of being calculated exactly
+        expression = CompiledExpression("x + 9 ** 9 ** 9", ("x",))
+        with self.assertRaises(ExpressionError):
+            expression(x=self.x)
+        # numpy functions overflow to infinity
+        self.assertTrue(np.all(np.isinf(expressions.transform(self.x, "pow(9, 9) ** 9 ** 9", "x"))))
+        self.assert_rejected("x + 1" + "0" * 400)
+
+    def test_integer_arithmetic(self):
+        np.testing.assert_allclose(CompiledExpression("x // 1 + 7 % 3 + 2 ** 3", ("x",))(x=self.x),
+                                   self.x // 1 + 9)
+
+    def test_transform(self):
+        np.testing.assert_allclose(expressions.transform(self.x, "x * 1e3", "x"), self.x * 1e3)
+        np.testing.assert_allclose(expressions.transform(self.x, "2", "x"), np.full(len(self.x), 2.0))
+
+    def test_same_key_for_same_formula(self):
+        self.assertEqual(CompiledExpression("m1/m0", ("m0", "m1")).key,
+                         CompiledExpression("m1 / m0", ("m0", "m1")).key)
+
+    def test_evaluate_in_chunks(self):
+        generator = np.random.default_rng(0)
+        m0, m1 = generator.normal(size=(2, 50, 30))
+        expression = expressions.compile_expression("m0 * m1 + 1", ("m0", "m1"))
+        np.testing.assert_allclose(expressions.evaluate_in_chunks(expression, {"m0": m0, "m1": m1}, chunk_size=100),
+                                   m0 * m1 + 1)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import unittest
+
+import numpy as np
+
+from processing.IsoCurve import IsoCurve, iso_segments
+
+
+def values_on_edges(data, x, y):
+    """
+    Linearly interpolate the matrix at points that lie on the edges between neighbouring points of the matrix (one of
+    the coordinates of every point is an integer).
+    """
+    values = []
+    for i, j in zip(np.ravel(x), np.ravel(y)):
+        if np.isclose(i, round(i)):
+            i, low = int(round(i)), int(np.floor(j))
+            high = min(low + 1, data.shape[1] - 1)
+            values.append(data[i, low] + (j - low) * (data[i, high] - data[i, low]))
+        else:
+            j, low = int(round(j)), int(np.floor(i))
+            high = min(low + 1, data.shape[0] - 1)
+            values.append(data[low, j] + (i - low) * (data[high, j] - data[low, j]))
+    return np.array(values)
+
+
+def sorted_segments(x, y):
+    """
+    Segments as a sorted list of ((x0, y0), (x1, y1)) with sorted end points, so they can be compared regardless of
+    their order and direction.
+    """
+    return sorted(tuple(sorted(zip(np.round(xs, 9), np.round(ys, 9)))) for xs, ys in zip(x, y))
+
+
+class IsoSegmentsTest(unittest.TestCase):
+
+    def test_single_cell(self):
+        x, y = iso_segments([[0, 0], [1, 1]], 0.25)
+        self.assertEqual(sorted_segments(x, y), [((0.25, 0), (0.25, 1))])
+
+    def test_saddle_cells(self):
+        data = np.array([[1, 0], [0, 1]])
+        # center (0.5) is above the level, like the corners with value 1, the segments cut off the corners with 0
+        x, y = iso_segments(data, 0.4)
+        self.assertEqual(sorted_segments(x, y), [((0, 0.6), (0.4, 1)), ((0.6, 0), (1, 0.4))])
+        # center is below the level, the segments cut off the corners with 1
+        x, y = iso_segments(data, 0.6)
+        self.assertEqual(sorted_segments(x, y), [((0, 0.4), (0.4, 0)), ((0.6, 1), (1, 0.6))])
+
+    def test_points_are_on_the_level(self):
+        data = np.random.default_rng(0).normal(size=(30, 25))
+        x, y = iso_segments(data, 0.3)
+        self.assertGreater(len(x), 0)
+        self.assertEqual(x.shape, y.shape)
+        self.assertEqual(x.shape[1], 2)
+        np.testing.assert_allclose(values_on_edges(data, x, y), 0.3, atol=1e-12)
+
+    def test_nan_cells(self):
+        data = np.random.default_rng(1).normal(size=(20, 20))
+        data[5, 5] = np.nan
+        data[12:, :] = np.nan
+        x, y = iso_segments(data, 0)
+        self.assertGreater(len(x), 0)
+        self.assertTrue(np.isfinite(x).all() and np.isfinite(y).all())
+        # no segment goes into the unfinished part of the matrix
+        self.assertLessEqual(x.max(), 11)
+        np.testing.assert_allclose(values_on_edges(data, x, y), 0, atol=1e-12)
+
+        x, y = iso_segments(np.full((5, 5), np.nan), 0)
+        self.assertEqual(x.shape, (0, 2))
+
+    def test_level_outside_of_the_data(self):
+        data = np.random.default_rng(2).uniform(size=(10, 10))
+        for level in [-1, 2]:
+            x, y = iso_segments(data, level)
+            self.assertEqual(x.shape, (0, 2))
+            self.assertEqual(y.shape, (0, 2))
+
+    def test_too_small(self):
+        self.assertEqual(iso_segments(np.ones((1, 5)), 0)[0].shape, (0, 2))
+        self.assertEqual(iso_segments(np.ones(5), 0)[0].shape, (0, 2))
+
+
+class IsoCurveTest(unittest.TestCase):
+
+    def setUp(self):
+        i, j = np.meshgrid(np.arange(64), np.arange(48), indexing="ij")
+        self.curve = IsoCurve(np.hypot(i - 32, j - 24), factor=2, smoothing=0)
+
+    def test_paths_are_cached(self):
+        path = self.curve.get_path(10)
+        self.assertFalse(path.isEmpty())
+        self.assertTrue(self.curve.is_cached(10))
+        self.assertIs(self.curve.get_path(10), path)
+
+    def test_path_in_image_coordinates(self):
+        # circle with radius 10 around the center of pixel (32, 24)
+        rectangle = self.curve.get_path(10).boundingRect()
+        self.assertAlmostEqual(rectangle.center().x(), 32.5, delta=0.5)
+        self.assertAlmostEqual(rectangle.center().y(), 24.5, delta=0.5)
+        self.assertAlmostEqual(rectangle.width(), 20, delta=1)
+
+    def test_cache_size(self):
+        curve = IsoCurve(self.curve.data, max_paths=2)
+        for level in [5, 10, 15]:
+            curve.get_path(level)
+        self.assertFalse(curve.is_cached(5))
+        self.assertTrue(curve.is_cached(15))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from processing.LineCut import LineCutSampler
+
+
+class LineCutSamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        # data[i, j] = 10 * i + j, bilinear interpolation of it is exact
+        self.data = np.arange(20 * 10, dtype=float).reshape(20, 10)
+        self.sampler = LineCutSampler()
+
+        # lines below go from the first to the last row, one sample per pixel of their length
+        self.rows = np.linspace(0, 19, 19)
+
+    def expected(self, columns):
+        return 10 * self.rows + np.mean(columns)
+
+    def test_line_through_pixel_centers(self):
+        # along the first axis through the centers of the pixels in column 4
+        self.sampler.set_line((0.5, 4.5), (19.5, 4.5), self.data.shape)
+        np.testing.assert_allclose(self.sampler.sample(self.data), self.expected([4]))
+
+    def test_width(self):
+        self.sampler.set_line((0.5, 4.5), (19.5, 4.5), self.data.shape, width=3)
+        np.testing.assert_allclose(self.sampler.sample(self.data), self.expected([3, 4, 5]))
+
+    def test_samples_outside_are_not_averaged(self):
+        # along the edge column, one of the three samples of every point is outside of the matrix
+        self.sampler.set_line((0.5, 0.5), (19.5, 0.5), self.data.shape, width=3)
+        np.testing.assert_allclose(self.sampler.sample(self.data), self.expected([0, 1]))
+
+        self.sampler.set_line((0.5, 9.5), (19.5, 9.5), self.data.shape, width=5)
+        np.testing.assert_allclose(self.sampler.sample(self.data), self.expected([7, 8, 9]))
+
+    def test_line_outside(self):
+        self.sampler.set_line((0.5, 20.5), (19.5, 20.5), self.data.shape, width=3)
+        self.assertTrue(np.all(np.isnan(self.sampler.sample(self.data))))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from data_handlers import MatrixExport
+from data_handlers.MatrixExport import export_matrix, row_blocks
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class MatrixExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        generator = np.random.default_rng(0)
+        self.matrix = generator.normal(size=(13, 7)) * 10.0 ** generator.integers(-20, 20, size=(13, 7))
+        self.matrix[2, 3] = np.nan
+        self.x = np.linspace(-1, 1, 13)
+        self.y = np.linspace(0, 3, 7) ** 2
+        self.labels = {"x": {"name": "gate", "unit": "V"}, "y": {"name": "bias", "unit": "mV"},
+                       "z": {"name": "current", "unit": "A"}}
+        self.progress = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def export(self, name):
+        location = os.path.join(self.directory.name, name)
+        self.assertEqual(export_matrix(location, self.matrix, self.x, self.y, self.labels, self.progress.append),
+                         location)
+        self.assertEqual(self.progress[-1], 1)
+        self.assertEqual(self.progress, sorted(self.progress))
+        return location
+
+    def test_text(self):
+        location = self.export("matrix.txt")
+        # same format as read by MatrixFileDataBuffer, one line for every y value
+        np.testing.assert_array_equal(np.transpose(np.loadtxt(location, dtype=float)), self.matrix)
+        with open(location) as file:
+            header = [file.readline() for _ in range(3)]
+        self.assertTrue(header[0].startswith("# x: gate [V]: "))
+        np.testing.assert_array_equal(np.array(header[0].split(": ")[-1].split("\t"), dtype=float), self.x)
+        np.testing.assert_array_equal(np.array(header[1].split(": ")[-1].split("\t"), dtype=float), self.y)
+        self.assertEqual(header[2], "# z: current [A]\n")
+
+    def test_npy(self):
+        location = self.export("matrix.npy")
+        loaded = np.load(location, mmap_mode="r")
+        self.assertEqual(loaded.dtype, self.matrix.dtype)
+        np.testing.assert_array_equal(loaded, self.matrix)
+
+    def test_npy_other_dtypes(self):
+        for matrix in [np.arange(12, dtype=np.int32).reshape(3, 4), np.asfortranarray(self.matrix),
+                       self.matrix[::2, ::3]]:
+            location = os.path.join(self.directory.name, "other.npy")
+            export_matrix(location, matrix, self.x, self.y, self.labels)
+            loaded = np.load(location)
+            self.assertEqual(loaded.dtype, matrix.dtype)
+            np.testing.assert_array_equal(loaded, matrix)
+
+    def test_npz(self):
+        location = self.export("matrix.npz")
+        with np.load(location) as archive:
+            np.testing.assert_array_equal(archive["matrix"], self.matrix)
+            np.testing.assert_array_equal(archive["x"], self.x)
+            np.testing.assert_array_equal(archive["y"], self.y)
+            for axis in ["x", "y", "z"]:
+                self.assertEqual(str(archive["{}_name".format(axis)]), self.labels[axis]["name"])
+                self.assertEqual(str(archive["{}_unit".format(axis)]), self.labels[axis]["unit"])
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_hdf5(self):
+        location = self.export("matrix.h5")
+        with h5py.File(location, "r") as file:
+            np.testing.assert_array_equal(file["matrix"][()], self.matrix)
+            np.testing.assert_array_equal(file["x"][()], self.x)
+            np.testing.assert_array_equal(file["y"][()], self.y)
+            self.assertEqual(file["matrix"].attrs["name"], "current")
+            self.assertEqual(file["matrix"].attrs["unit"], "A")
+            self.assertEqual(file["y"].attrs["unit"], "mV")
+            np.testing.assert_array_equal(file["matrix"].dims[0][0][()], self.x)
+            np.testing.assert_array_equal(file["matrix"].dims[1][0][()], self.y)
+
+    def test_format_from_extension(self):
+        location = self.export("MATRIX.NPY")
+        np.testing.assert_array_equal(np.load(location), self.matrix)
+        # unknown extensions are written as text, like matrix files written by older versions
+        location = self.export("matrix.dat")
+        np.testing.assert_array_equal(np.transpose(np.loadtxt(location)), self.matrix)
+
+    def test_row_blocks(self):
+        matrix = np.zeros((10, 4))
+        blocks = list(row_blocks(matrix, block_size=3 * matrix[0].nbytes))
+        self.assertEqual([start for start, _ in blocks], [0, 3, 6, 9])
+        self.assertEqual(sum(len(block) for _, block in blocks), 10)
+        self.assertEqual(len(list(row_blocks(matrix, block_size=1))), 10)
+
+    def test_file_filters(self):
+        filters = MatrixExport.get_file_filters().split(";;")
+        self.assertEqual(len(filters), len(MatrixExport.EXPORT_FORMATS))
+        self.assertIn("HDF5 file (*.h5)", filters)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+from debug.unit_tests.UnitTestSessionSnapshot import make_buffer_state
+from data_handlers.SessionSnapshot import SnapshotData
+from processing.OperationHistory import OperationHistory
+
+
+class OperationHistoryTest(unittest.TestCase):
+
+    def test_undo_redo(self):
+        history = OperationHistory()
+        self.assertFalse(history.can_undo())
+        self.assertIsNone(history.undo())
+        history.record({"kind": "a"})
+        history.record({"kind": "b"})
+        self.assertEqual(history.undo(), {"kind": "b"})
+        self.assertTrue(history.can_redo())
+        self.assertEqual(history.redo(), {"kind": "b"})
+        self.assertIsNone(history.redo())
+
+    def test_record_clears_redo(self):
+        history = OperationHistory()
+        history.record({"kind": "a"})
+        history.undo()
+        history.record({"kind": "b"})
+        self.assertFalse(history.can_redo())
+        self.assertEqual(history.undo(), {"kind": "b"})
+        self.assertIsNone(history.undo())
+
+    def test_max_length(self):
+        history = OperationHistory(max_length=3)
+        for index in range(5):
+            history.record({"kind": index})
+        self.assertEqual([history.undo()["kind"] for _ in range(3)], [4, 3, 2])
+        self.assertFalse(history.can_undo())
+
+
+class HeatmapUndoRedoTest(unittest.TestCase):
+    """
+    Undoes and redoes offsets, axis transformations and a derived matrix in a Heatmap window, and checks after every
+    step that the image is placed according to the offsets and transformations that are active.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        from graphs.Heatmap import Heatmap
+
+        state = make_buffer_state()
+        self.x, self.y = state["data"]["x"], state["data"]["y"][0]
+        self.heatmap = Heatmap(SnapshotData(state))
+
+    def tearDown(self):
+        self.heatmap.close()
+
+    def assert_state(self, x_values, y_values, matrices):
+        """
+        :param x_values: np.ndarray: expected positions of the pixel centers along the x axis
+        :param y_values: np.ndarray: expected positions of the pixel centers along the y axis
+        :param matrices: list of strings: expected names of the derived matrices
+        """
+        from PyQt5.QtCore import QPointF
+
+        img = self.heatmap.plot_elements["img"]
+        first = img.mapToParent(QPointF(0.5, 0.5))
+        last = img.mapToParent(QPointF(len(self.x) - 0.5, len(self.y) - 0.5))
+        np.testing.assert_allclose([first.x(), last.x()], [x_values[0], x_values[-1]], rtol=1e-12)
+        np.testing.assert_allclose([first.y(), last.y()], [y_values[0], y_values[-1]], rtol=1e-12)
+
+        combobox = self.heatmap.matrix_selection_combobox
+        # measured matrices, then "Side-by-side", then derived matrices
+        self.assertEqual([combobox.itemText(index) for index in range(3, combobox.count())], matrices)
+        self.assertEqual(len(self.heatmap.plt_data), 2 + len(matrices))
+
+    def test_undo_redo(self):
+        heatmap = self.heatmap
+        steps = [({"kind": "offset", "axis": "x", "value": 0.5},
+                  (self.x + 0.5, self.y, [])),
+                 ({"kind": "transformation", "axis": "y", "expression": "y * 1e3", "previous": None},
+                  (self.x + 0.5, self.y * 1e3, [])),
+                 ({"kind": "transformation", "axis": "x", "expression": "x * 2", "previous": None},
+                  ((self.x + 0.5) * 2, self.y * 1e3, [])),
+                 ({"kind": "formula", "name": "ratio", "expression": "m1 / (m0 + 2)"},
+                  ((self.x + 0.5) * 2, self.y * 1e3, ["ratio"])),
+                 ({"kind": "offset", "axis": "y", "value": 1},
+                  ((self.x + 0.5) * 2, (self.y + 1) * 1e3, ["ratio"])),
+                 ({"kind": "transformation", "axis": "y", "expression": "y - 5", "previous": "y * 1e3"},
+                  ((self.x + 0.5) * 2, self.y + 1 - 5, ["ratio"]))]
+        states = [(self.x, self.y, [])]
+        for recipe, expected in steps:
+            self.assertTrue(heatmap.do_operation(recipe))
+            self.assert_state(*expected)
+            states.append(expected)
+        ratio = heatmap.plt_data[2]
+
+        for expected in reversed(states[:-1]):
+            heatmap.undo_action()
+            self.assert_state(*expected)
+        self.assertFalse(heatmap.history.can_undo())
+        self.assertEqual(heatmap.offsets, {"horizontal": 0, "vertical": 0})
+        self.assertEqual((heatmap.transformations["x"], heatmap.transformations["y"]), (None, None))
+
+        for expected in states[1:]:
+            heatmap.redo_action()
+            self.assert_state(*expected)
+        self.assertFalse(heatmap.history.can_redo())
+        self.assertEqual(heatmap.offsets, {"horizontal": 0.5, "vertical": 1})
+        self.assertEqual((heatmap.transformations["x"], heatmap.transformations["y"]), ("x * 2", "y - 5"))
+        np.testing.assert_array_equal(heatmap.plt_data[2], ratio)
+
+    def test_failed_operation_is_not_recorded(self):
+        from graphs import Heatmap as heatmap_module
+
+        messages = []
+        show_error_message = heatmap_module.show_error_message
+        heatmap_module.show_error_message = lambda *args: messages.append(args)
+        try:
+            self.assertFalse(self.heatmap.do_operation({"kind": "transformation", "axis": "x",
+                                                        "expression": "x.__class__", "previous": None}))
+        finally:
+            heatmap_module.show_error_message = show_error_message
+        self.assertEqual(len(messages), 1)
+        self.assertIsNone(self.heatmap.transformations["x"])
+        self.assertFalse(self.heatmap.history.can_undo())
+        self.assert_state(self.x, self.y, [])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
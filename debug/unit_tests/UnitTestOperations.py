@@ -0,0 +1,438 @@
+import unittest
+
+import numpy as np
+
+from processing import operations
+from processing.ProcessingPipeline import ProcessingPipeline
+
+
+def naive_moving_average(data, window, axis):
+    """
+    Reference implementation of operations.moving_average: average of the points (ignoring NaN values) within window
+    points of every point, calculated one point at a time.
+    """
+    values = np.moveaxis(np.asarray(data, dtype=float), axis, 0)
+    result = np.empty_like(values)
+    for index in range(values.shape[0]):
+        block = values[max(index - window, 0):index + window + 1]
+        with np.errstate(invalid="ignore"), np.testing.suppress_warnings() as warnings:
+            warnings.filter(RuntimeWarning)
+            result[index] = np.nanmean(block, axis=0)
+    return np.moveaxis(result, 0, axis)
+
+
+class MovingAverageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(size=(37, 23)) + 100
+
+    def test_against_naive_average(self):
+        for axis in [0, 1]:
+            for window in [1, 2, 5, 40]:
+                np.testing.assert_allclose(operations.moving_average(self.data, window, axis),
+                                           naive_moving_average(self.data, window, axis), rtol=1e-10)
+
+    def test_zero_window_returns_data(self):
+        self.assertIs(operations.moving_average(self.data, 0, 0), self.data)
+
+    def test_nan_values(self):
+        data = self.data.copy()
+        # unfinished measurement (NaN at the end of the matrix) and some missing points
+        data[30:, :] = np.nan
+        data[5, 3] = np.nan
+        data[0, 0] = np.nan
+        for axis in [0, 1]:
+            for window in [1, 3]:
+                np.testing.assert_allclose(operations.moving_average(data, window, axis),
+                                           naive_moving_average(data, window, axis), rtol=1e-10)
+
+    def test_naive_smoothing(self):
+        expected = naive_moving_average(naive_moving_average(self.data, 2, 0), 3, 1)
+        np.testing.assert_allclose(operations.naive_smoothing(self.data, 2, 3), expected, rtol=1e-10)
+
+        example = np.array([[1, 4, 3], [2, 8, 2], [3, 5, 6]])
+        np.testing.assert_allclose(operations.naive_smoothing(example, 0, 1),
+                                   [[2.5, 8 / 3, 3.5], [5, 4, 5], [4, 14 / 3, 5.5]])
+
+
+def gaussian_convolution(data, sigma, axis):
+    """
+    Reference for gaussian smoothing: convolution with a sampled gaussian, with the matrix extended by mirroring its
+    edges.
+    """
+    radius = int(8 * sigma)
+    kernel = np.exp(-np.arange(-radius, radius + 1) ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    values = np.moveaxis(data, axis, 0)
+    extended = np.pad(values, [(radius, radius)] + [(0, 0)] * (values.ndim - 1), mode="reflect")
+    result = sum(weight * extended[shift:shift + len(values)] for shift, weight in enumerate(kernel))
+    return np.moveaxis(result, 0, axis)
+
+
+class FourierFilterTest(unittest.TestCase):
+
+    def filter(self, data, kind, **params):
+        return operations.fourier_filter(operations.fourier_transform(data), data.shape, kind, **params)
+
+    def test_gaussian_against_convolution(self):
+        i, j = np.meshgrid(np.arange(128), np.arange(96), indexing="ij")
+        data = np.sin(i / 7) * np.cos(j / 5) + 0.01 * i + np.random.default_rng(5).normal(scale=0.1, size=i.shape)
+        expected = gaussian_convolution(gaussian_convolution(data, 2, 0), 1.5, 1)
+        np.testing.assert_allclose(self.filter(data, "gaussian", x=2, y=1.5), expected, atol=1e-6)
+
+    def test_no_wrap_around(self):
+        # bright rows and columns at the far edges of the matrix must not leak to the opposite edges
+        data = np.zeros((64, 48))
+        data[-4:, :] = 1
+        data[:, -4:] = 1
+        result = self.filter(data, "gaussian", x=1.5, y=1.5)
+        self.assertEqual(result.shape, data.shape)
+        self.assertLess(np.abs(result[:8, :8]).max(), 1e-6)
+
+        # without the mirrored edges the transform treats the matrix as periodic
+        spectrum = operations.fourier_transform(data, padding=0)
+        result = operations.fourier_filter(spectrum, data.shape, "gaussian", padding=0, x=1.5, y=1.5)
+        self.assertGreater(np.abs(result[:8, :8]).max(), 0.1)
+
+    def test_constant_matrix(self):
+        data = np.full((40, 30), 3.0)
+        for kind, params in [("gaussian", {"x": 3, "y": 1}), ("lorentzian", {"x": 2, "y": 2}),
+                             ("low_pass", {"cutoff": 0.1}), ("band_pass", {"low": 0, "high": 0.1}),
+                             ("notch", {"x": 0.2, "y": 0, "width": 0.02})]:
+            np.testing.assert_allclose(self.filter(data, kind, **params), data, err_msg=kind)
+        np.testing.assert_allclose(self.filter(data, "high_pass", cutoff=0), 0, atol=1e-12)
+
+    def test_notch(self):
+        i, j = np.meshgrid(np.arange(161), np.arange(120), indexing="ij")
+        smooth = np.exp(-((i - 80) ** 2 + (j - 60) ** 2) / 2000)
+        # symmetric around the first and the last row, so mirroring the edges does not change its frequency
+        data = smooth + 0.5 * np.cos(2 * np.pi * 0.2 * i)
+        result = self.filter(data, "notch", x=0.2, y=0, width=0.02)
+        # away from the edges the periodic noise is removed
+        self.assertLess(np.abs(result - smooth)[20:-20, 20:-20].max(), 0.05)
+
+    def test_nan_values(self):
+        data = np.ones((30, 20))
+        data[25:, :] = np.nan
+        result = self.filter(data, "gaussian", x=1, y=1)
+        np.testing.assert_allclose(result, 1)
+
+
+class BackgroundTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = np.random.default_rng(6)
+        self.i, self.j = np.meshgrid(np.arange(40, dtype=float), np.arange(30, dtype=float), indexing="ij")
+        # every line along the second axis has its own offset and slope
+        self.offsets = generator.normal(scale=5, size=(40, 1))
+        self.slopes = generator.normal(size=(40, 1))
+        self.lines = self.offsets + self.slopes * self.j
+        self.noise = generator.normal(scale=0.1, size=(40, 30))
+
+    def with_nan(self, data):
+        data = data.copy()
+        data[35:, 20:] = np.nan
+        data[3, 7] = np.nan
+        data[10, :29] = np.nan
+        return data
+
+    def test_linear_fit_is_removed(self):
+        for data in [self.lines, self.with_nan(self.lines)]:
+            result = operations.subtract_line_background(data, "linear", 1)
+            np.testing.assert_array_equal(np.isnan(result), np.isnan(data))
+            np.testing.assert_allclose(result[np.isfinite(data)], 0, atol=1e-10)
+            # along the other axis, lines go along the first axis of the transposed matrix
+            result = operations.subtract_line_background(data.T, "linear", 0)
+            np.testing.assert_allclose(result[np.isfinite(data.T)], 0, atol=1e-10)
+
+    def test_linear_fit_against_polyfit(self):
+        data = self.with_nan(self.lines + self.noise)
+        background = operations.line_background(data, "linear", 1)
+        for row in [0, 3, 20, 37]:
+            finite = np.isfinite(data[row])
+            coefficients = np.polyfit(self.j[row][finite], data[row][finite], 1)
+            np.testing.assert_allclose(background[row], np.polyval(coefficients, self.j[row]), atol=1e-10)
+        # a line with a single point has no slope
+        np.testing.assert_allclose(background[10], data[10, 29])
+
+    def test_offsets_are_removed(self):
+        pattern = self.noise - self.noise.mean(axis=1, keepdims=True)
+        result = operations.subtract_line_background(self.offsets + pattern, "mean", 1)
+        np.testing.assert_allclose(result, pattern, atol=1e-10)
+
+        data = self.with_nan(self.offsets + self.noise)
+        np.testing.assert_allclose(operations.line_background(data, "mean", 1),
+                                   np.nanmean(data, axis=1, keepdims=True), atol=1e-10)
+        np.testing.assert_allclose(operations.line_background(data, "median", 1),
+                                   np.nanmedian(data, axis=1, keepdims=True))
+        np.testing.assert_allclose(operations.line_background(data, "median", 0),
+                                   np.nanmedian(data, axis=0, keepdims=True))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            operations.line_background(self.lines, "cubic", 1)
+
+    def test_plane_is_removed(self):
+        plane = 2 + 0.3 * self.i - 0.7 * self.j
+        for data in [plane, self.with_nan(plane)]:
+            np.testing.assert_allclose(operations.plane_background(data), plane, atol=1e-10)
+            result = operations.subtract_plane(data)
+            np.testing.assert_allclose(result[np.isfinite(data)], 0, atol=1e-10)
+
+    def test_plane_against_least_squares(self):
+        data = self.with_nan(2 + 0.3 * self.i - 0.7 * self.j + self.noise)
+        finite = np.isfinite(data)
+        design = np.stack([np.ones(finite.sum()), self.i[finite], self.j[finite]], axis=1)
+        a, b, c = np.linalg.lstsq(design, data[finite], rcond=None)[0]
+        np.testing.assert_allclose(operations.plane_background(data), a + b * self.i + c * self.j, atol=1e-10)
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(7).normal(size=(20, 15)) * np.arange(1, 21)[:, None]
+        self.data[4, 4] = np.nan
+
+    def test_range(self):
+        result = operations.normalize(self.data, "range")
+        self.assertEqual(np.nanmin(result), 0)
+        self.assertEqual(np.nanmax(result), 1)
+        self.assertTrue(np.isnan(result[4, 4]))
+
+        result = operations.normalize(self.data, "range", 1)
+        np.testing.assert_allclose(np.nanmin(result, axis=1), 0)
+        np.testing.assert_allclose(np.nanmax(result, axis=1), 1)
+
+    def test_max(self):
+        result = operations.normalize(self.data, "max", 0)
+        np.testing.assert_allclose(np.nanmax(np.abs(result), axis=0), 1)
+        np.testing.assert_allclose(result * np.nanmax(np.abs(self.data), axis=0), self.data)
+
+    def test_std(self):
+        result = operations.normalize(self.data, "std", 1)
+        np.testing.assert_allclose(np.nanmean(result, axis=1), 0, atol=1e-12)
+        np.testing.assert_allclose(np.nanstd(result, axis=1), 1)
+        result = operations.normalize(self.data, "std")
+        self.assertAlmostEqual(np.nanmean(result), 0)
+        self.assertAlmostEqual(np.nanstd(result), 1)
+
+    def test_constant_lines(self):
+        data = self.data.copy()
+        data[2, :] = 5
+        result = operations.normalize(data, "range", 1)
+        np.testing.assert_array_equal(result[2], 0)
+        self.assertTrue(np.isfinite(result[np.isfinite(data)]).all())
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            operations.normalize(self.data, "log")
+
+
+class BatchedInterpTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = np.random.default_rng(1)
+        # every row of xp is increasing, rows have different ranges so that some x values are outside of them
+        self.xp = np.cumsum(generator.uniform(0.01, 0.1, size=(41, 60)), axis=1) + generator.uniform(-1, 1, (41, 1))
+        self.fp = generator.normal(size=(41, 60))
+        self.x = np.linspace(-1, 4, 75)
+
+    def naive_interp(self, x, left=0, right=0):
+        return np.array([np.interp(x, xp, fp, left=left, right=right) for xp, fp in zip(self.xp, self.fp)])
+
+    def test_against_np_interp(self):
+        for workers in [1, 3, None]:
+            np.testing.assert_array_equal(operations.batched_interp(self.x, self.xp, self.fp, workers=workers),
+                                          self.naive_interp(self.x))
+
+    def test_decreasing(self):
+        # setpoints swept from high to low, data points are sorted in the same direction
+        for workers in [1, 3]:
+            result = operations.batched_interp(self.x[::-1], self.xp[:, ::-1], self.fp[:, ::-1], workers=workers)
+            np.testing.assert_array_equal(result, self.naive_interp(self.x[::-1]))
+
+    def test_left_and_right(self):
+        np.testing.assert_array_equal(operations.batched_interp(self.x, self.xp, self.fp, left=-5, right=np.nan),
+                                      self.naive_interp(self.x, left=-5, right=np.nan))
+
+    def test_out(self):
+        out = np.empty((self.fp.shape[0], len(self.x)))
+        result = operations.batched_interp(self.x[::-1], self.xp[:, ::-1], self.fp[:, ::-1], out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, self.naive_interp(self.x[::-1]))
+
+    def test_single_point(self):
+        np.testing.assert_array_equal(operations.batched_interp(self.x[:1], self.xp, self.fp),
+                                      self.naive_interp(self.x[:1]))
+
+
+def loop_didv_correction(data, currents, y_data, resistance, dv, unit_correction=1):
+    """
+    Reference implementation of operations.didv_correction: the loop over rows that was used in the Heatmap window
+    before the correction was vectorized.
+    """
+    corrected_matrix = np.zeros(np.shape(data))
+    biases = [1 if voltage >= 0 else -1 for voltage in y_data]
+    for row in range(np.shape(data)[0]):
+        corrected_voltages = (abs(y_data) - abs(resistance * currents[row, :]) * unit_correction) * biases
+        fp = data[row, :]
+        if np.all(np.diff(y_data) > 0):
+            corrected_matrix[row, :] = np.interp(y_data, corrected_voltages, fp, left=0, right=0)
+        else:
+            corrected_matrix[row, :] = np.interp(y_data[::-1], corrected_voltages[::-1], fp[::-1],
+                                                 left=0, right=0)[::-1]
+    return corrected_matrix / (dv - corrected_matrix * resistance)
+
+
+class DidvCorrectionTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = np.random.default_rng(4)
+        self.y_data = np.linspace(-0.5, 0.5, 31)
+        self.currents = 1e-3 * self.y_data + generator.normal(scale=1e-5, size=(9, 31))
+        self.data = 1e-3 + generator.normal(scale=1e-5, size=(9, 31))
+
+    def test_against_loop(self):
+        for resistance, dv, unit_correction in [(20, 1e-3, 1), (0, 1e-3, 1), (0.05, 2e-3, 1e3)]:
+            np.testing.assert_allclose(
+                operations.didv_correction(self.data, self.currents, self.y_data, resistance, dv, unit_correction),
+                loop_didv_correction(self.data, self.currents, self.y_data, resistance, dv, unit_correction),
+                rtol=1e-12)
+
+    def test_decreasing_setpoints(self):
+        y_data = self.y_data[::-1]
+        currents = self.currents[:, ::-1]
+        data = self.data[:, ::-1]
+        np.testing.assert_allclose(operations.didv_correction(data, currents, y_data, 20, 1e-3),
+                                   loop_didv_correction(data, currents, y_data, 20, 1e-3), rtol=1e-12)
+
+    def test_inputs_are_not_modified(self):
+        data, currents = self.data.copy(), self.currents.copy()
+        operations.didv_correction(self.data, self.currents, self.y_data, 20, 1e-3)
+        np.testing.assert_array_equal(self.data, data)
+        np.testing.assert_array_equal(self.currents, currents)
+
+
+class RegridTest(unittest.TestCase):
+
+    def test_uniform_setpoints(self):
+        self.assertIsNone(operations.uniform_grid(np.linspace(-1, 1, 101)))
+        self.assertIsNone(operations.uniform_grid(np.linspace(1, -1, 101)))
+        # steps differ only by rounding errors of the instrument
+        setpoints = np.linspace(0, 1, 51) + np.random.default_rng(2).normal(scale=1e-7, size=51)
+        self.assertIsNone(operations.uniform_grid(setpoints))
+        self.assertIsNone(operations.uniform_grid([0, 1]))
+
+    def test_uneven_setpoints(self):
+        # coarse steps of 0.1 followed by fine steps of 0.01
+        setpoints = np.concatenate([np.linspace(0, 1, 11), np.linspace(1.01, 1.5, 50)])
+        grid = operations.uniform_grid(setpoints)
+        self.assertEqual(grid[0], 0)
+        self.assertEqual(grid[-1], 1.5)
+        np.testing.assert_allclose(np.diff(grid), 0.01)
+
+    def test_grid_size_is_limited(self):
+        setpoints = np.concatenate([[0, 1e-6], np.linspace(1, 10, 20)])
+        self.assertEqual(len(operations.uniform_grid(setpoints, max_factor=4)), 4 * len(setpoints))
+
+    def test_decreasing_setpoints(self):
+        setpoints = np.linspace(1, 0, 21) ** 2
+        grid = operations.uniform_grid(setpoints)
+        self.assertEqual(grid[0], 1)
+        self.assertEqual(grid[-1], 0)
+        self.assertTrue(np.all(np.diff(grid) < 0))
+
+    def test_regrid_linear_data(self):
+        # linear interpolation of data that is linear along both axes is exact
+        x_setpoints = np.linspace(0, 1, 31) ** 2
+        y_setpoints = np.linspace(2, -2, 17) ** 3
+        data = 3 * x_setpoints[:, None] - 2 * y_setpoints[None, :]
+        x_grid = operations.uniform_grid(x_setpoints)
+        y_grid = operations.uniform_grid(y_setpoints)
+
+        result = operations.regrid(data, x_setpoints, y_setpoints, x_grid, y_grid)
+        self.assertEqual(result.shape, (len(x_grid), len(y_grid)))
+        np.testing.assert_allclose(result, 3 * x_grid[:, None] - 2 * y_grid[None, :], atol=1e-12)
+
+        result = operations.regrid(data, x_setpoints, y_setpoints, x_grid, None)
+        np.testing.assert_allclose(result, 3 * x_grid[:, None] - 2 * y_setpoints[None, :], atol=1e-12)
+
+    def test_regrid_against_np_interp(self):
+        x_setpoints = np.linspace(0, 1, 25) ** 1.5
+        data = np.random.default_rng(3).normal(size=(25, 7))
+        x_grid = operations.uniform_grid(x_setpoints)
+        expected = np.array([np.interp(x_grid, x_setpoints, column) for column in data.T]).T
+        np.testing.assert_allclose(operations.regrid(data, x_setpoints, None, x_grid), expected)
+
+    def test_regrid_derivative(self):
+        # derivative has one point less, it is placed at the midpoints between the setpoints
+        x_setpoints = np.linspace(0, 1, 25) ** 2
+        x_grid = operations.uniform_grid(x_setpoints)
+        data = np.tile(x_setpoints[:, None] ** 2, (1, 3))
+        derivative = operations.x_derivative(data)
+        result = operations.regrid(derivative, x_setpoints, None, x_grid)
+        self.assertEqual(result.shape, (len(x_grid), 3))
+        midpoints = (x_setpoints[1:] + x_setpoints[:-1]) / 2
+        np.testing.assert_allclose(result[:, 0], np.interp(x_grid, midpoints, derivative[:, 0]))
+
+
+class PreviewTest(unittest.TestCase):
+    """
+    Previews of large matrices are calculated on a decimated matrix and stretched back, the same way as in
+    Heatmap.update_displayed_data. Stretched preview has to have the shape of the final result, so that the image does
+    not change its size when the result replaces the preview.
+    """
+
+    def setUp(self):
+        # unevenly spaced setpoints along x, regridding makes the matrix larger
+        x_setpoints = np.linspace(0, 1, 101) ** 2
+        y_setpoints = np.linspace(-1, 1, 67)
+        x_grid = operations.uniform_grid(x_setpoints)
+        self.assertIsNotNone(x_grid)
+
+        self.pipeline = ProcessingPipeline()
+        self.pipeline.register_operation("x_derivative", operations.x_derivative)
+        self.pipeline.register_operation("y_derivative", operations.y_derivative)
+        self.pipeline.register_operation("decimate", operations.decimate)
+        self.pipeline.register_operation(
+            "regrid", lambda data: operations.regrid(data, x_setpoints, y_setpoints, x_grid, None))
+        self.pipeline.add_source("matrix", np.random.default_rng(0).normal(size=(101, 67)))
+
+    def assert_preview_shape(self, regrid_operations, derivatives):
+        shape = list(self.pipeline.get("matrix", regrid_operations).shape)
+        for derivative in derivatives:
+            shape[0 if derivative == "x_derivative" else 1] -= 1
+        factor = operations.preview_factor(shape, 1000)
+        self.assertGreater(factor, 1)
+
+        applied_operations = [(derivative, {}) for derivative in derivatives]
+        preview = self.pipeline.get("matrix", regrid_operations + [("decimate", {"factor": factor})] +
+                                    applied_operations)
+        result = self.pipeline.get("matrix", regrid_operations + applied_operations)
+        self.assertEqual(operations.stretch(preview, factor, shape).shape, result.shape)
+
+    def test_preview_shape(self):
+        for regrid_operations in [[], [("regrid", {})]]:
+            for derivatives in [[], ["x_derivative"], ["y_derivative"], ["x_derivative", "y_derivative"]]:
+                with self.subTest(regrid=bool(regrid_operations), derivatives=derivatives):
+                    self.assert_preview_shape(regrid_operations, derivatives)
+
+    def test_preview_factor(self):
+        self.assertEqual(operations.preview_factor((100, 100), 10000), 1)
+        self.assertEqual(operations.preview_factor((101, 100), 10000), 2)
+        self.assertEqual(operations.preview_factor((1000, 1000), 10000), 16)
+
+    def test_stretch(self):
+        preview = np.array([[1, 2], [3, 4]])
+        np.testing.assert_array_equal(operations.stretch(preview, 2, (3, 4)),
+                                      [[1, 1, 2, 2], [1, 1, 2, 2], [3, 3, 4, 4]])
+        np.testing.assert_array_equal(operations.stretch(preview, 2, (5, 4)),
+                                      [[1, 1, 2, 2], [1, 1, 2, 2], [3, 3, 4, 4], [3, 3, 4, 4], [3, 3, 4, 4]])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import threading
+import unittest
+
+import numpy as np
+
+from processing.ProcessingPipeline import ArrayCache, ProcessingPipeline
+
+
+class ArrayCacheTest(unittest.TestCase):
+
+    def test_eviction_by_bytes(self):
+        array = np.zeros(100)
+        cache = ArrayCache(max_bytes=3 * array.nbytes)
+        for key in "abc":
+            cache.put(key, array.copy())
+        self.assertEqual(cache.size, 3 * array.nbytes)
+
+        # "a" becomes the most recently used, so "b" is dropped when "d" is added
+        cache.get("a")
+        cache.put("d", array.copy())
+        self.assertEqual(sorted(cache.keys()), ["a", "c", "d"])
+        self.assertEqual(cache.size, 3 * array.nbytes)
+
+        # one large array pushes out everything else
+        cache.put("e", np.zeros(250))
+        self.assertEqual(cache.keys(), ["e"])
+        self.assertEqual(cache.size, np.zeros(250).nbytes)
+
+    def test_array_larger_then_cache_is_not_cached(self):
+        cache = ArrayCache(max_bytes=100)
+        cache.put("a", np.zeros(1000))
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.size, 0)
+
+
+class ProcessingPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.pipeline = ProcessingPipeline()
+        self.pipeline.add_source("matrix0", np.arange(12.0).reshape(3, 4))
+        self.pipeline.register_operation("add", self.counted(lambda data, value: data + value, "add"))
+        self.pipeline.register_operation("scale", self.counted(lambda data, factor: data * factor, "scale"))
+
+    def counted(self, function, name):
+        def operation(data, **params):
+            self.calls.append(name)
+            return function(data, **params)
+        return operation
+
+    def test_result(self):
+        result = self.pipeline.get("matrix0", [("add", {"value": 1}), ("scale", {"factor": 2})])
+        np.testing.assert_array_equal(result, (np.arange(12.0).reshape(3, 4) + 1) * 2)
+
+    def test_prefix_reuse(self):
+        self.pipeline.get("matrix0", [("add", {"value": 1}), ("scale", {"factor": 2})])
+        self.assertEqual(self.calls, ["add", "scale"])
+
+        # same chain is not calculated again
+        self.pipeline.get("matrix0", [("add", {"value": 1}), ("scale", {"factor": 2})])
+        self.assertEqual(self.calls, ["add", "scale"])
+
+        # only the operation after the longest cached prefix is calculated
+        self.pipeline.get("matrix0", [("add", {"value": 1}), ("scale", {"factor": 3})])
+        self.assertEqual(self.calls, ["add", "scale", "scale"])
+
+        # different parameters of the first operation, nothing can be reused
+        self.pipeline.get("matrix0", [("add", {"value": 2})])
+        self.assertEqual(self.calls, ["add", "scale", "scale", "add"])
+
+        self.assertTrue(self.pipeline.is_cached("matrix0", [("add", {"value": 1})]))
+        self.assertFalse(self.pipeline.is_cached("matrix0", [("scale", {"factor": 2})]))
+
+    def test_cancel(self):
+        cancelled = threading.Event()
+
+        def cancel_after(data, **params):
+            cancelled.set()
+            return data + 1
+
+        self.pipeline.register_operation("cancel_after", cancel_after)
+        result = self.pipeline.get("matrix0", [("cancel_after", {}), ("scale", {"factor": 2})], cancelled)
+        self.assertIsNone(result)
+        self.assertEqual(self.calls, [])
+
+        # result of the operation that finished before the cancellation stays in the cache
+        self.assertTrue(self.pipeline.is_cached("matrix0", [("cancel_after", {})]))
+
+    def test_replacing_source_invalidates_results(self):
+        self.pipeline.get("matrix0", [("add", {"value": 1})])
+        self.pipeline.add_source("matrix0", np.zeros((3, 4)))
+        self.assertFalse(self.pipeline.is_cached("matrix0", [("add", {"value": 1})]))
+        np.testing.assert_array_equal(self.pipeline.get("matrix0", [("add", {"value": 1})]), np.ones((3, 4)))
+
+    def test_eviction_by_bytes(self):
+        source = np.zeros((10, 10))
+        pipeline = ProcessingPipeline(max_bytes=2 * source.nbytes)
+        pipeline.add_source("matrix0", source)
+        pipeline.register_operation("add", lambda data, value: data + value)
+        for value in range(3):
+            pipeline.get("matrix0", [("add", {"value": value})])
+        self.assertFalse(pipeline.is_cached("matrix0", [("add", {"value": 0})]))
+        self.assertTrue(pipeline.is_cached("matrix0", [("add", {"value": 2})]))
+        self.assertLessEqual(pipeline.cache.size, 2 * source.nbytes)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+import numpy as np
+
+from processing import operations
+from processing.ResistanceScan import ResistanceScan
+
+
+class ResistanceScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.y_data = np.linspace(-1, 1, 41)
+        self.data = np.random.default_rng(0).normal(scale=1e-3, size=(12, 41)) + 1e-2 * self.y_data
+        self.scan = ResistanceScan(self.data, self.y_data)
+
+    def test_corrected_matrix(self):
+        for resistance in [0, 5, 20.5]:
+            np.testing.assert_array_equal(
+                self.scan.get(resistance),
+                operations.series_resistance_correction(self.data, self.y_data, resistance))
+
+    def test_zero_resistance(self):
+        np.testing.assert_allclose(self.scan.get(0), self.data)
+
+    def test_unit_correction(self):
+        scan = ResistanceScan(self.data, self.y_data, unit_correction=1e3)
+        np.testing.assert_array_equal(
+            scan.get(0.01), operations.series_resistance_correction(self.data, self.y_data, 0.01, 1e3))
+
+    def test_results_are_cached(self):
+        self.assertFalse(self.scan.is_cached(10))
+        corrected = self.scan.get(10)
+        self.assertTrue(self.scan.is_cached(10))
+        self.assertIs(self.scan.get(10), corrected)
+
+    def test_cache_is_bounded(self):
+        # room for two corrected matrices
+        scan = ResistanceScan(self.data, self.y_data, max_bytes=2 * self.data.nbytes)
+        for resistance in [1, 2, 3]:
+            scan.get(resistance)
+        self.assertFalse(scan.is_cached(1))
+        self.assertTrue(scan.is_cached(2))
+        self.assertTrue(scan.is_cached(3))
+
+    def test_prefetch(self):
+        self.scan.get(2)
+        self.assertEqual(self.scan.prefetch([1, 2, 3]), 2)
+        for resistance in [1, 2, 3]:
+            self.assertTrue(self.scan.is_cached(resistance))
+        self.assertEqual(self.scan.prefetch([1, 2, 3]), 0)
+
+    def test_prefetch_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertEqual(self.scan.prefetch([1, 2, 3], cancelled), 0)
+        self.assertFalse(self.scan.is_cached(1))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
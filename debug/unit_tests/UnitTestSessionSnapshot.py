@@ -0,0 +1,155 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from data_handlers.SessionSnapshot import ARRAY_ALIGNMENT, SessionReader, SnapshotData, load_session, save_session
+
+
+def make_buffer_state():
+    """
+    State of a small data buffer with two measured parameters, in the format returned by DataBuffer.get_session_state.
+    """
+    x = np.linspace(0, 1, 30)
+    y = np.linspace(-1, 1, 20)
+    return {"location": os.path.join(tempfile.gettempdir(), "graphsaros_session_test", "data.dat"),
+            "name": "data",
+            "data": {"x": x, "y": [y], "matrix": [np.outer(x, y), np.outer(x, y) + x[:, None]]},
+            "axis_values": {"x": {"name": "gate", "unit": "V"},
+                            "y": {0: {"name": "bias", "unit": "V"}},
+                            "z": {0: {"name": "current", "unit": "A"}, 1: {"name": "conductance", "unit": "S"}}},
+            "matrix_dimensions": [30, 20],
+            "number_of_set_parameters": 2,
+            "number_of_measured_parameters": 2,
+            "textual": "",
+            "string_type": "Test"}
+
+
+class SessionFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, "session.gss")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        shared = np.arange(7, dtype=np.int16)
+        state = {"datasets": [make_buffer_state()],
+                 "values": {"float32": np.ones((3, 5), dtype=np.float32), "complex": np.array([1 + 2j, 3j]),
+                            "shared": shared, "again": shared, "empty": np.empty((0, 4))},
+                 "tuple": (1, "a", None),
+                 "scalar": np.float64(2.5)}
+        save_session(self.location, state)
+        loaded = load_session(self.location)
+
+        buffer_state = loaded["datasets"][0]
+        original = state["datasets"][0]
+        for index in range(2):
+            self.assertIsInstance(buffer_state["data"]["matrix"][index], np.memmap)
+            np.testing.assert_array_equal(buffer_state["data"]["matrix"][index], original["data"]["matrix"][index])
+        self.assertIsInstance(buffer_state["data"]["x"], np.memmap)
+        np.testing.assert_array_equal(buffer_state["data"]["x"], original["data"]["x"])
+        np.testing.assert_array_equal(buffer_state["data"]["y"][0], original["data"]["y"][0])
+        # integer keys of the axis values are kept
+        self.assertEqual(buffer_state["axis_values"], original["axis_values"])
+        self.assertEqual(buffer_state["matrix_dimensions"], [30, 20])
+
+        for name in ["float32", "complex", "shared", "empty"]:
+            self.assertEqual(loaded["values"][name].dtype, state["values"][name].dtype)
+            np.testing.assert_array_equal(loaded["values"][name], state["values"][name])
+        self.assertIs(loaded["values"]["shared"], loaded["values"]["again"])
+        self.assertEqual(loaded["tuple"], (1, "a", None))
+        self.assertEqual(loaded["scalar"], 2.5)
+
+    def test_arrays_are_aligned(self):
+        save_session(self.location, {"arrays": [np.ones(3, dtype=np.int8), np.ones((4, 3)), np.ones(5)]})
+        for array in SessionReader(self.location).arrays:
+            self.assertEqual(array.offset % ARRAY_ALIGNMENT, 0)
+
+    def test_changes_do_not_modify_the_file(self):
+        save_session(self.location, {"matrix": np.zeros((4, 4))})
+        matrix = load_session(self.location)["matrix"]
+        matrix[0, 0] = 1
+        del matrix
+        self.assertEqual(load_session(self.location)["matrix"][0, 0], 0)
+
+    def test_not_a_session_file(self):
+        with open(self.location, "wb") as file:
+            file.write(b"not a session")
+        with self.assertRaises(ValueError):
+            load_session(self.location)
+
+    def test_snapshot_data(self):
+        save_session(self.location, {"datasets": [make_buffer_state()]})
+        buffer = SnapshotData(load_session(self.location)["datasets"][0])
+        self.assertEqual(buffer.number_of_measured_parameters, 2)
+        self.assertEqual(buffer.get_axis_data()["z"][1]["name"], "conductance")
+        np.testing.assert_array_equal(buffer.data["matrix"][1], make_buffer_state()["data"]["matrix"][1])
+
+
+class HeatmapSessionTest(unittest.TestCase):
+    """
+    Saves the state of a Heatmap window with an offset, an axis transformation and derived matrices, and restores it
+    in a new window (same steps as MainWindow.save_session and MainWindow.load_session).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, "session.gss")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_heatmap_round_trip(self):
+        from graphs.Heatmap import Heatmap
+
+        buffer = SnapshotData(make_buffer_state())
+        heatmap = Heatmap(buffer)
+        heatmap.do_operation({"kind": "offset", "axis": "x", "value": 0.5})
+        heatmap.do_operation({"kind": "transformation", "axis": "y", "expression": "y * 1e3", "previous": None})
+        heatmap.do_operation({"kind": "formula", "name": "ratio", "expression": "m1 / (m0 + 2)"})
+        derivative = heatmap.pipeline.get("matrix0", [("x_derivative", {})])
+        ratio = heatmap.plt_data[2]
+
+        save_session(self.location, {"datasets": [buffer.get_session_state()], "heatmaps": [{
+            "dataset": "data", "state": heatmap.get_session_state()}]})
+        state = load_session(self.location)
+
+        restored = Heatmap(SnapshotData(state["datasets"][0]))
+        restored.restore_session_state(state["heatmaps"][0]["state"])
+
+        self.assertEqual(restored.offsets, {"horizontal": 0.5, "vertical": 0})
+        self.assertEqual(restored.transformations["y"], "y * 1e3")
+        self.assertIsNone(restored.transformations.get("x"))
+        self.assertEqual(restored.plot_elements["img"].transform(), heatmap.plot_elements["img"].transform())
+
+        self.assertEqual(restored.matrix_selection_combobox.findText("ratio"), 3)
+        self.assertIsInstance(restored.plt_data[2], np.memmap)
+        np.testing.assert_array_equal(restored.plt_data[2], ratio)
+
+        self.assertTrue(restored.pipeline.is_cached("matrix0", [("x_derivative", {})]))
+        cached = restored.pipeline.get("matrix0", [("x_derivative", {})])
+        self.assertIsInstance(cached, np.memmap)
+        np.testing.assert_array_equal(cached, derivative)
+
+        heatmap.close()
+        restored.close()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import unittest
+
+from debug.startup_report import measure_startup
+
+
+class StartupTest(unittest.TestCase):
+    """
+    Starts Graphsaros in a separate process and checks that the main window is displayed without importing any of the
+    modules that are slow to import (they should only be imported when they are needed).
+
+    """
+
+    def test_startup_report(self):
+        report = measure_startup()
+
+        self.assertEqual(report["heavy_modules"], [])
+        self.assertIsInstance(report["time_to_first_window"], float)
+        self.assertGreater(report["time_to_first_window"], 0)
+        self.assertGreater(report["total_import_time"], 0)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from graphs.Waterfall import waterfall_path
+
+
+def traces(x, y, connect):
+    """
+    Split the coordinates returned by waterfall_path into lists of connected points.
+    """
+    result = [[]]
+    for point in zip(x, y, connect):
+        result[-1].append(point[:2])
+        if not point[2]:
+            result.append([])
+    return [trace for trace in result if trace]
+
+
+class WaterfallPathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.arange(5 * 4, dtype=float).reshape(5, 4)
+        self.axis_values = np.array([0.0, 0.5, 1.0, 1.5])
+
+    def test_traces(self):
+        x, y, connect = waterfall_path(self.data, self.axis_values, 1, 10)
+        self.assertEqual(x.shape, (20,))
+        self.assertEqual(connect.dtype, np.int32)
+        result = traces(x, y, connect)
+        self.assertEqual(len(result), 5)
+        for index, trace in enumerate(result):
+            self.assertEqual([point[0] for point in trace], list(self.axis_values))
+            np.testing.assert_array_equal([point[1] for point in trace], self.data[index] + 10 * index)
+
+    def test_every(self):
+        x, y, connect = waterfall_path(self.data, self.axis_values, 2, 1)
+        result = traces(x, y, connect)
+        self.assertEqual(len(result), 3)
+        np.testing.assert_array_equal([point[1] for point in result[2]], self.data[4] + 2)
+
+        # values smaller then 1 are the same as 1, more then the number of rows gives only the first trace
+        self.assertEqual(len(traces(*waterfall_path(self.data, self.axis_values, 0, 1))), 5)
+        self.assertEqual(len(traces(*waterfall_path(self.data, self.axis_values, 10, 1))), 1)
+
+    def test_nan_values(self):
+        data = self.data.copy()
+        data[1, 2] = np.nan
+        data[3, :] = np.nan
+        x, y, connect = waterfall_path(data, self.axis_values, 1, 0)
+        self.assertTrue(np.isfinite(x).all() and np.isfinite(y).all())
+        self.assertEqual(len(x), 20 - 1 - 4)
+        # second row is interrupted at the NaN value, fourth row is not drawn
+        self.assertEqual([len(trace) for trace in traces(x, y, connect)], [4, 2, 1, 4, 4])
+        self.assertEqual(connect[-1], 0)
+
+    def test_empty(self):
+        x, y, connect = waterfall_path(np.empty((0, 4)), self.axis_values, 1, 1)
+        self.assertEqual((x.size, y.size, connect.size), (0, 0, 0))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,63 @@
 import pyqtgraph as pg
 import numpy as np
 from math import degrees, atan2, tan, sqrt
+import os
 import sys
 
-from PyQt5.QtWidgets import QAction, QApplication, QToolBar, QComboBox, QSpinBox
-from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QAction, QApplication, QToolBar, QComboBox, QSpinBox, QGraphicsPathItem, QFileDialog
+from PyQt5.QtGui import QIcon, QFont, QKeySequence
+from PyQt5.QtCore import Qt, QTimer, QThreadPool
 
-from helpers import get_location_path, get_location_basename, show_error_message, shift
-from widgets import DiDvCorrectionInputWidget, EditAxisWidget, InputDataWidget
+from ThreadWorker import LatestJobRunner, Worker
+from helpers import get_location_path, get_location_basename, show_error_message
+from widgets import DiDvCorrectionInputWidget, EditAxisWidget, InputDataWidget, ResistanceScanWidget, ProgressBarWidget
 from graphs.BaseGraph import BaseGraph
 from graphs.LineTrace import LineTrace
+from graphs.Waterfall import Waterfall
 from data_handlers.DataBuffer import DataBuffer
 from data_handlers.Dummy2D import DummyBuffer
 from data_handlers.QcodesDataBuffer import QcodesData
 from data_handlers.VipDataBuffer import VipData
+from data_handlers import MatrixExport
 from custom_pg.LineROI import LineROI
 from custom_pg.ColorBar import ColorBarItem
 from custom_pg.ImageItem import ImageItem
+from custom_pg.TiledImageItem import TiledImageItem
+from processing.ProcessingPipeline import ProcessingPipeline
+from processing.ResistanceScan import ResistanceScan
+from processing.LineCut import LineCutSampler
+from processing.IsoCurve import IsoCurve
+from processing.ArrayStatistics import get_statistics
+from processing.OperationHistory import OperationHistory
+from processing import operations, expressions
+
+
+# Matrices with more points then this are processed in the background, meanwhile a preview calculated on a decimated
+# version of the matrix (that has at most this many points) is displayed
+PREVIEW_SIZE = 512 * 512
+
+# Percentiles of the displayed data used as levels when percentile levels are turned on
+AUTO_LEVEL_PERCENTILES = (0.5, 99.5)
+
+# Background corrections offered by the background window: {description: (short name used in the name of the new
+# matrix, operation of the processing pipeline, parameters of the operation)}. Lines along y are rows of the matrix
+# (all y values at one x value), lines along x are its columns.
+BACKGROUND_CORRECTIONS = {
+    "Subtract mean of every line along y": ("mean_y", "subtract_line_background", {"method": "mean", "axis": 1}),
+    "Subtract median of every line along y": ("median_y", "subtract_line_background", {"method": "median", "axis": 1}),
+    "Subtract linear fit of every line along y": ("linear_y", "subtract_line_background",
+                                                  {"method": "linear", "axis": 1}),
+    "Subtract mean of every line along x": ("mean_x", "subtract_line_background", {"method": "mean", "axis": 0}),
+    "Subtract median of every line along x": ("median_x", "subtract_line_background", {"method": "median", "axis": 0}),
+    "Subtract linear fit of every line along x": ("linear_x", "subtract_line_background",
+                                                  {"method": "linear", "axis": 0}),
+    "Subtract plane fit": ("plane", "subtract_plane", {}),
+    "Normalize to 0 - 1": ("normalized", "normalize", {"method": "range"}),
+    "Normalize every line along y to 0 - 1": ("normalized_y", "normalize", {"method": "range", "axis": 1}),
+    "Normalize every line along x to 0 - 1": ("normalized_x", "normalize", {"method": "range", "axis": 0}),
+    "Divide by maximum absolute value": ("normalized_max", "normalize", {"method": "max"}),
+    "Standardize (subtract mean, divide by standard deviation)": ("standardized", "normalize", {"method": "std"}),
+}
 
 
 class Heatmap(BaseGraph):
@@ -51,18 +91,54 @@ class Heatmap(BaseGraph):
         # np.array, this is what pyqtgraph wants to draw stuff
         self.plt_data = self.data_buffer.get_matrix()
 
-        # saving transformations on main data buffer matrices, so that i dont need to recalculate them next time i need
-        # them, gotta save that 0.1 sec bro
-        self.plt_data_options = {}
+        # evenly spaced grids on which the matrices are displayed (matrices measured on unevenly spaced setpoints are
+        # resampled to them), None for axes that have evenly spaced setpoints
+        self.display_grid = {"x": operations.uniform_grid(self.data_buffer.get_x_axis_values()),
+                             "y": operations.uniform_grid(self.data_buffer.get_y_axis_values()[0])}
+
+        # for every point of the display grid, index of the closest setpoint (used to show measured values)
+        self.setpoint_indices = {}
+        for axis, setpoints in [("x", self.data_buffer.get_x_axis_values()),
+                                ("y", self.data_buffer.get_y_axis_values()[0])]:
+            if self.display_grid[axis] is not None:
+                self.setpoint_indices[axis] = operations.nearest_indices(setpoints, self.display_grid[axis])
+
+        # every matrix derived from the data (derivatives, smoothing, corrections, ...) is calculated by the pipeline
+        # and cached by the name of the source matrix and the list of operations applied to it, so going back to a
+        # previously displayed view never recalculates anything
+        self.pipeline = ProcessingPipeline()
         print("Loading matrices . . .")
         for i in range(len(self.plt_data)):
-            name = "matrix" + str(i)
-            self.plt_data_options[name] = {"xDer": None,
-                                           "yDer": None,
-                                           "xyDer": None,
-                                           "yxDer": None,
-                                           "corrected": None,
-                                           "gauss": None}
+            self.pipeline.add_source("matrix" + str(i), self.plt_data[i])
+        self.init_pipeline()
+
+        # names of the derivatives ("x_derivative", "y_derivative") applied to the active matrix in the order in which
+        # they were turned on
+        self.derivatives = []
+
+        # calculations on large matrices are done in the background, only for the latest selected operations
+        self.processing_runner = LatestJobRunner(parent=self)
+
+        # ResistanceScan of the active matrix while the resistance scan window is opened
+        self.resistance_scan = None
+
+        # calculates corrections for resistances next to the one selected in the resistance scan window
+        self.prefetch_runner = LatestJobRunner(parent=self)
+
+        # IsoCurve of the displayed data, and the runner that calculates iso curves in the background while the iso
+        # line is dragged
+        self.iso_curve = None
+        self.iso_runner = LatestJobRunner(delay=10, parent=self)
+
+        # {key of the formula: name of the matrix} for matrices calculated by formulas over the measured parameters, so
+        # the same formula is never evaluated twice
+        self.formula_results = {}
+
+        # progress bars of matrices that are being exported in the background
+        self.export_progress_bars = []
+
+        # recipes of derived matrices, offsets and transformations that can be undone and redone
+        self.history = OperationHistory()
 
         # to be able to switch between gauss, lorentz, normal, ...
         self.active_data = self.plt_data[0]
@@ -75,7 +151,7 @@ class Heatmap(BaseGraph):
         self.active_data_index = 0
 
         # by default, allways display the first measured parameter
-        self.displayed_data_set = self.active_data
+        self.displayed_data_set = self.pipeline.get(self.active_data_name, self.get_regrid_operations())
 
         # indicates currently displayed data
         self.display = "normal"
@@ -86,16 +162,31 @@ class Heatmap(BaseGraph):
         # references to all plots in side by side view
         self.side_by_side_plots = {}
 
+        # indices of matrices whose panels still have to be added to the side by side view, panels are added one at a
+        # time from the event loop, so the first panels are displayed right away
+        self.pending_side_by_side_panels = []
+
+        # if True, all panels in side by side view use the colormap and levels of the histogram of the first panel
+        self.share_side_by_side_lut = False
+
         # reference to ROI
         self.line_segment_roi = {"ROI": None}
 
+        # calculates values of the displayed data below the line ROI
+        self.line_cut_sampler = LineCutSampler()
+
+        # values of the line trace graph x axis at the first and the last point of the line trace, updated together with
+        # the line trace so that the crosshair does not need to look at the ROI
+        self.line_trace_range = (0, 1)
+
+        # transform of the image item for which the inverse was calculated, and the inverse (maps coordinates of the
+        # main subplot to matrix indices)
+        self.image_transform = None
+        self.inverse_image_transform = None
+
         # dictionary to keep track of options that have been turned on/off
         self.modes = {"ROI": False, "Side-by-side": False}
 
-        # if data correction has been called at least once, this will not be None
-        # need to move this to plt data options
-        self.corrected_data = None
-
         self.unit_correction = 1
 
         self.histogram_width = self.width() * 0.2
@@ -111,6 +202,9 @@ class Heatmap(BaseGraph):
                 for index in range(len(self.data_buffer.data[axis])):
                     self.transformations[axis].append(None)
 
+        # list of all changes made to the axes by EditAxisWidget, kept to be able to restore them with the session
+        self.axis_edits = []
+
         self.init_ui()
 
     """
@@ -140,25 +234,19 @@ class Heatmap(BaseGraph):
         main_subplot = frame_layout.addPlot(title=self.data_buffer.name)
         main_subplot.titleLabel.hide()
         # print(main_subplot.vb.menu.)
-        img = ImageItem()
+        img = TiledImageItem()
         # set the default data as the image data
         img.setImage(self.displayed_data_set, padding=0)
-        # reposition the data to correct starting position (x0, y0)
-        img.translate(self.data_buffer.get_x_axis_values()[0], self.data_buffer.get_y_axis_values()[0][0])
         # by default data is drawn on x axis: from 0 to number of points along x axis, also for y: 0 to num of points
         # on y axis (example: steping 1 param 100 to 110, and steping another 20 to 40 would result in in data being
         # drawn 0 to 10 on x axis, and 0 to 20 on y axis)
-        # This is way data needs to be scaled after selecting the initial point
-        (x_scale, y_scale) = self.data_buffer.get_scale()
-        img.scale(x_scale, y_scale)
+        # This is way data needs to be moved to the correct starting position and scaled
+        x_values, y_values = self.get_display_axis_values()
+        x_min, x_max, y_min, y_max = self.set_image_transform(img, x_values[0], x_values[-1], y_values[0], y_values[-1])
         main_subplot.addItem(img, padding=0)
 
         print("Determining graph limits . . .")
         # Seting the limits of the graph so that the user can not go out of the image range
-        x_min = min(self.data_buffer.get_x_axis_values())
-        x_max = max(self.data_buffer.get_x_axis_values())
-        y_min = min(self.data_buffer.get_y_axis_values()[0])
-        y_max = max(self.data_buffer.get_y_axis_values()[0])
         main_subplot.setLimits(xMin=x_min, xMax=x_max, yMin=y_min, yMax=y_max)
 
         print("Updating labels . . .")
@@ -181,10 +269,9 @@ class Heatmap(BaseGraph):
             ax.setLabel(axis_data["name"], axis_data["unit"], **label_style)
 
         # Add a controllable curve that shows values greater then selected value (similar to lines used to show
-        # mountains on geographical maps)
-        iso = pg.IsocurveItem(level=0.8, pen='g')
-        iso.setParentItem(img)
-        iso.setData(pg.gaussianFilter(self.active_data, (2, 2)))
+        # mountains on geographical maps), the curve is calculated in the background (see update_iso_curve)
+        iso = QGraphicsPathItem(img)
+        iso.setPen(pg.mkPen('g'))
 
         # Add a histogram to control the colors displayed on the image
         print("Building histogram . . .")
@@ -209,7 +296,7 @@ class Heatmap(BaseGraph):
         isoLine = pg.InfiniteLine(angle=0, movable=True, pen='g')
         histogram.vb.addItem(isoLine)
         histogram.vb.setMouseEnabled(y=False)  # makes user interaction a little easier
-        isoLine.setValue(self.active_data.mean())
+        isoLine.setValue(get_statistics(self.displayed_data_set).get_mean())
         isoLine.setZValue(1000)  # bring iso line above contrast controls
         isoLine.sigDragged.connect(self.update_iso_curve)
 
@@ -262,9 +349,13 @@ class Heatmap(BaseGraph):
         self.plot_elements = {"central_item": central_item, "frame": frame_layout, "main_subplot": main_subplot,
                               "img": img, "histogram": histogram, "line_trace_graph": line_trace_graph, "iso": iso,
                               "isoLine": isoLine, "extra_axis": extra_axis, "extra_view_box": extra_view_box,
-                              "v_line": v_line, "h_line": h_line, "line_trace_data": None, "color_bar": color_bar}
+                              "v_line": v_line, "h_line": h_line, "line_trace_data": None, "line_trace_curve": None,
+                              "color_bar": color_bar}
+        self.set_iso_curve_data(self.displayed_data_set)
 
-        main_subplot.scene().sigMouseMoved.connect(self.mouse_moved)
+        # mouse moves are delivered at most once per frame
+        self.mouse_move_proxy = pg.SignalProxy(main_subplot.scene().sigMouseMoved, rateLimit=60,
+                                               slot=self.mouse_moved)
 
         self.init_toolbar()
 
@@ -312,6 +403,14 @@ class Heatmap(BaseGraph):
         self.line_trace_btn.setCheckable(True)
         self.tools.addAction(self.line_trace_btn)
 
+        # Width of the line trace, every point of the line trace is the average of this many points perpendicular to
+        # the line
+        self.line_trace_width = QSpinBox()
+        self.line_trace_width.setRange(1, 1000)
+        self.line_trace_width.setToolTip("Width of the line trace in pixels. Data is averaged across the width")
+        self.line_trace_width.valueChanged.connect(self.update_line_trace_plot)
+        self.tools.addWidget(self.line_trace_width)
+
         # Add actions that allow user to derivate the data along x or y axis (toggleable)
         self.der_x = QAction(QIcon("img/xDer.png"), "xDerivative", self)
         self.der_x.setToolTip("Calculate and display x derivative of the displayed data")
@@ -325,7 +424,7 @@ class Heatmap(BaseGraph):
         # Add a dropdown that allows a user to select different kinds of data smoothening. Depending on the selected
         # option, changinh the spin boxes applies a different kind of smoothening to the active data set.
         self.smoothing_selection_combobox = QComboBox()
-        for smoothing_type in ["Naive", "Gaussian"]:
+        for smoothing_type in ["Naive", "Gaussian", "Lorentzian"]:
             self.smoothing_selection_combobox.addItem(smoothing_type)
         self.smoothing_selection_combobox.currentIndexChanged.connect(self.smoothing_action)
         self.tools.addWidget(self.smoothing_selection_combobox)
@@ -361,6 +460,13 @@ class Heatmap(BaseGraph):
                                                "R is user input.")
         self.matrix_manipulation_toolbar.addAction(self.data_correction_action)
 
+        # Add an action that opens a window with a slider that corrects the displayed data set for the selected
+        # resistance, used to find the correct value of the series resistance
+        self.resistance_scan_btn = QAction(QIcon("img/line-chart.png"), "Resistance_scan", self)
+        self.resistance_scan_btn.setToolTip("Scroll trough values of R in Y(real) = Y - (I * R) and display corrected\n"
+                                            "data. Only the selected correction is added to the matrices.")
+        self.matrix_manipulation_toolbar.addAction(self.resistance_scan_btn)
+
         # Add an action that when clicked prompts a user to input some data, and then uses that data to apply a data
         # correction to the displayed data set (dIdV)
         self.gm_didv = QAction(QIcon("img/dIdV.png"), "gm_didv_correction", self)
@@ -368,6 +474,26 @@ class Heatmap(BaseGraph):
                                 "dV, R are user input")
         self.matrix_manipulation_toolbar.addAction(self.gm_didv)
 
+        # Add an action that creates a new matrix from a formula that combines measured parameters (m0, m1, ...)
+        self.formula_btn = QAction(QIcon("img/sinusIcon.png"), "Formula", self)
+        self.formula_btn.setToolTip("Calculate a new matrix from measured parameters using a formula, for example:\n"
+                                    "m1 / m0 or hypot(m0, m1)")
+        self.matrix_manipulation_toolbar.addAction(self.formula_btn)
+
+        # Add an action that filters the displayed data set in the frequency domain (low/high/band pass, removal of
+        # periodic noise)
+        self.fourier_filter_btn = QAction(QIcon("img/sinusIcon.png"), "Fourier_filter", self)
+        self.fourier_filter_btn.setToolTip("Filter the data in the frequency domain (low, high or band pass filter, or\n"
+                                           "removal of periodic noise)")
+        self.matrix_manipulation_toolbar.addAction(self.fourier_filter_btn)
+
+        # Add an action that removes the background of the displayed data set (offsets or slopes of every line, global
+        # tilt) or normalizes it
+        self.background_btn = QAction(QIcon("img/linear_fit_icon.png"), "Background", self)
+        self.background_btn.setToolTip("Subtract the mean, median or linear fit of every line, subtract a plane fit,\n"
+                                       "or normalize the data")
+        self.matrix_manipulation_toolbar.addAction(self.background_btn)
+
         self.horizontal_offset = QAction(QIcon("img/horizontal_offset.png"), "Horizontal_offset", self)
         self.horizontal_offset.setToolTip("Apply horizontal offset to your data set")
         self.matrix_manipulation_toolbar.addAction(self.horizontal_offset)
@@ -384,6 +510,18 @@ class Heatmap(BaseGraph):
         self.y_transformation.setToolTip("Apply a function to y axis")
         self.matrix_manipulation_toolbar.addAction(self.y_transformation)
 
+        # Undo and redo derived matrices, offsets and transformations
+        self.undo_btn = QAction("Undo", self)
+        self.undo_btn.setToolTip("Undo the last correction, offset or transformation (Ctrl+Z)")
+        self.undo_btn.setShortcut(QKeySequence.Undo)
+        self.matrix_manipulation_toolbar.addAction(self.undo_btn)
+
+        self.redo_btn = QAction("Redo", self)
+        self.redo_btn.setToolTip("Redo the last undone correction, offset or transformation (Ctrl+Y)")
+        self.redo_btn.setShortcut(QKeySequence.Redo)
+        self.matrix_manipulation_toolbar.addAction(self.redo_btn)
+        self.update_history_actions()
+
         # ###############################
         # #### Window manipulations #####
         # ###############################
@@ -403,6 +541,12 @@ class Heatmap(BaseGraph):
         self.open_2D.setToolTip("Open a selected line trace in new window that allows manipulation and transformations")
         self.window_toolbar.addAction(self.open_2D)
 
+        # An action that opens a window with many line cuts of the displayed data drawn at the same time
+        self.waterfall_btn = QAction(QIcon("img/lineGraph.png"), "Waterfall", self)
+        self.waterfall_btn.setToolTip("Open a waterfall plot of line cuts taken at every n-th point of the displayed "
+                                      "data")
+        self.window_toolbar.addAction(self.waterfall_btn)
+
         # Allow a user to zoom in to a certain part of the matrix
         self.zoom_action_btn = QAction(QIcon("img/zoomin_icon.png"), "Zoom", self)
         self.zoom_action_btn.setToolTip("Select area of graph to zoom into")
@@ -414,6 +558,20 @@ class Heatmap(BaseGraph):
         self.toggle_color_bar_btn.setCheckable(True)
         self.window_toolbar.addAction(self.toggle_color_bar_btn)
 
+        # Set levels to percentiles of the data instead of the minimum and maximum, so a few extreme values (spikes) do
+        # not wash out the whole image
+        self.percentile_levels_btn = QAction(QIcon("img/settingsIcon.png"), "Percentile_levels", self)
+        self.percentile_levels_btn.setToolTip("Set levels automatically to {} - {} percentile of the displayed data "
+                                              "instead of the minimum and maximum".format(*AUTO_LEVEL_PERCENTILES))
+        self.percentile_levels_btn.setCheckable(True)
+        self.window_toolbar.addAction(self.percentile_levels_btn)
+
+        # Use the same colormap and levels for all matrices in side by side view
+        self.shared_colormap_btn = QAction(QIcon("img/colorPicker.png"), "Shared_colormap", self)
+        self.shared_colormap_btn.setToolTip("Use the same colormap and levels for all matrices in side by side view")
+        self.shared_colormap_btn.setCheckable(True)
+        self.window_toolbar.addAction(self.shared_colormap_btn)
+
         # Action that closes the current window
         self.exit_action_btn = QAction(QIcon("img/closeIcon.png"), "Exit", self)
         self.exit_action_btn.setToolTip("Close this heatmap window")
@@ -448,6 +606,171 @@ class Heatmap(BaseGraph):
     ######## Helper functions ########
     ##################################
     """
+    def init_pipeline(self):
+        """
+        Register all operations that can be applied to the matrices of this window, and add axis values as sources so
+        that offsets can be applied to them.
+
+        :return: NoneType
+        """
+        x_data = self.data_buffer.get_x_axis_values()
+        y_data = self.data_buffer.get_y_axis_values()[0]
+
+        self.pipeline.register_operation("x_derivative", operations.x_derivative)
+        self.pipeline.register_operation("y_derivative", operations.y_derivative)
+        self.pipeline.register_operation("naive_smoothing", operations.naive_smoothing)
+        self.pipeline.register_operation("decimate", operations.decimate)
+        self.pipeline.register_operation("offset", operations.offset)
+        self.pipeline.register_operation("fourier_transform", operations.fourier_transform)
+        self.pipeline.register_operation("fourier_filter", operations.fourier_filter)
+        self.pipeline.register_operation("subtract_line_background", operations.subtract_line_background)
+        self.pipeline.register_operation("subtract_plane", operations.subtract_plane)
+        self.pipeline.register_operation("normalize", operations.normalize)
+        self.pipeline.register_operation("transform", expressions.transform)
+        self.pipeline.register_operation(
+            "series_resistance_correction",
+            lambda data, **params: operations.series_resistance_correction(data, y_data, **params))
+
+        self.pipeline.register_operation(
+            "regrid",
+            lambda data: operations.regrid(data, x_data, y_data, self.display_grid["x"], self.display_grid["y"]))
+
+        x_values, y_values = self.get_display_axis_values()
+        self.pipeline.add_source("x_axis", np.asarray(x_values))
+        self.pipeline.add_source("y_axis", np.asarray(y_values))
+
+    def get_display_axis_values(self):
+        """
+        Get positions of the pixels of the displayed image along both axes. These are the setpoints, or the evenly
+        spaced grid if the setpoints are not evenly spaced.
+
+        :return: tuple (np.ndarray, np.ndarray): x values, y values
+        """
+        x_values = self.display_grid["x"]
+        if x_values is None:
+            x_values = np.asarray(self.data_buffer.get_x_axis_values())
+        y_values = self.display_grid["y"]
+        if y_values is None:
+            y_values = np.asarray(self.data_buffer.get_y_axis_values()[0])
+        return x_values, y_values
+
+    def get_regrid_operations(self):
+        """
+        Operations that have to be applied to matrices of this window before they can be displayed.
+
+        :return: list of (name, params) tuples: resampling to the display grid if setpoints are not evenly spaced,
+                 otherwise empty list
+        """
+        if self.display_grid["x"] is None and self.display_grid["y"] is None:
+            return []
+        return [("regrid", {})]
+
+    def regrid(self, data):
+        """
+        Resample a matrix that is not a source of the pipeline to the display grid (result is not cached).
+
+        :param data: np.ndarray: matrix with values at the setpoints
+        :return: np.ndarray: matrix with values at the display grid
+        """
+        if not self.get_regrid_operations():
+            return data
+        return operations.regrid(data, self.data_buffer.get_x_axis_values(), self.data_buffer.get_y_axis_values()[0],
+                                 self.display_grid["x"], self.display_grid["y"])
+
+    def set_image_transform(self, img, x_start, x_end, y_start, y_end, factor=1):
+        """
+        Position and scale the image so that the centers of its first and last pixels are at the given positions.
+
+        :param img: ImageItem: image displaying a matrix with values at the display grid
+        :param x_start: float: position of the first pixel along the x axis
+        :param x_end: float: position of the last pixel along the x axis
+        :param y_start: float: position of the first pixel along the y axis
+        :param y_end: float: position of the last pixel along the y axis
+        :param factor: int: the image displays a matrix decimated by this factor (every factor-th pixel)
+        :return: tuple: (x_min, x_max, y_min, y_max) bounds of the image
+        """
+        x_values, y_values = self.get_display_axis_values()
+        x_scale = factor * (x_end - x_start) / max(len(x_values) - 1, 1)
+        y_scale = factor * (y_end - y_start) / max(len(y_values) - 1, 1)
+        if x_scale == 0:
+            x_scale = 1
+        if y_scale == 0:
+            y_scale = 1
+
+        img.resetTransform()
+        img.translate(x_start - x_scale / 2, y_start - y_scale / 2)
+        img.scale(x_scale, y_scale)
+
+        return (min(x_start, x_end) - abs(x_scale) / 2, max(x_start, x_end) + abs(x_scale) / 2,
+                min(y_start, y_end) - abs(y_scale) / 2, max(y_start, y_end) + abs(y_scale) / 2)
+
+    def get_applied_operations(self, factor=1):
+        """
+        Create the chain of operations that is currently selected in the toolbar. Smoothing is always applied first,
+        derivatives are applied after it in the order in which they were turned on.
+
+        Naive smoothing is separable, so it is applied as two operations (one for each axis). This way changing the
+        smoothing along one axis reuses the result of smoothing along the other one. Gaussian and lorentzian smoothing
+        are done in the frequency domain, the Fourier transform of the matrix is cached, so changing the smoothing only
+        costs one multiplication and one inverse transform.
+
+        :param factor: int: the chain is applied to a matrix decimated by this factor, smoothing windows are shrunk
+                            accordingly
+        :return: list of (name, params) tuples
+        """
+        applied_operations = []
+        smoothing_type = self.smoothing_selection_combobox.currentText().lower()
+        x = self.smoothen_x.value()
+        y = self.smoothen_y.value()
+        if factor > 1:
+            x, y = round(x / factor), round(y / factor)
+        if smoothing_type == "naive":
+            if x:
+                applied_operations.append(("naive_smoothing", {"x": x, "y": 0}))
+            if y:
+                applied_operations.append(("naive_smoothing", {"x": 0, "y": y}))
+        elif x or y:
+            x_values, y_values = self.get_display_axis_values()
+            shape = (-(-len(x_values) // factor), -(-len(y_values) // factor))
+            applied_operations.append(("fourier_transform", {}))
+            applied_operations.append(("fourier_filter", {"kind": smoothing_type, "x": x, "y": y, "shape": shape}))
+        for derivative in self.derivatives:
+            applied_operations.append((derivative, {}))
+        return applied_operations
+
+    def update_displayed_data(self):
+        """
+        Display the active matrix with all operations selected in the toolbar applied to it.
+
+        Small matrices (and results that are already in the cache) are displayed right away. Large matrices are
+        processed in the background, while they are being processed a preview is displayed. Preview is calculated on
+        a decimated version of the matrix and then stretched back to the original size.
+
+        :return: NoneType
+        """
+        source = self.active_data_name
+        applied_operations = self.get_regrid_operations() + self.get_applied_operations()
+
+        self.processing_runner.cancel()
+
+        # shape of the displayed matrix is the shape after regridding, reduced by one along the axis of each derivative
+        shape = list(self.pipeline.get(source, self.get_regrid_operations()).shape)
+        for derivative in self.derivatives:
+            shape[0 if derivative == "x_derivative" else 1] -= 1
+        factor = operations.preview_factor(shape, PREVIEW_SIZE)
+
+        if factor == 1 or self.pipeline.is_cached(source, applied_operations):
+            self.change_displayed_data_set(self.pipeline.get(source, applied_operations))
+            return
+
+        preview_operations = self.get_regrid_operations() + [("decimate", {"factor": factor})] + \
+            self.get_applied_operations(factor)
+        preview = self.pipeline.get(source, preview_operations)
+        self.change_displayed_data_set(operations.stretch(preview, factor, shape))
+
+        self.processing_runner.submit(lambda cancelled: self.pipeline.get(source, applied_operations, cancelled),
+                                      self.change_displayed_data_set)
+
     def change_active_set(self, index):
         """
         A method that changes what matrix is displayed in the main subplot, also changes data on which the actions
@@ -466,44 +789,15 @@ class Heatmap(BaseGraph):
             self.plot_elements["histogram"].hide()
             self.modes["Side-by-side"] = True
             self.plot_elements["frame"].clear()
-            for i, matrix in enumerate(self.plt_data):
-                name = "matrix{}".format(i)
-                if name not in self.side_by_side_plots:
-                    img = pg.ImageItem()
-                    histogram = pg.HistogramLUTItem()
-                    plot = self.plot_elements["frame"].addPlot()
-
-                    img.setImage(matrix)
-                    (x_scale, y_scale) = self.data_buffer.get_scale()
-                    img.translate(self.data_buffer.get_x_axis_values()[0], self.data_buffer.get_y_axis_values()[0][0])
-                    img.scale(x_scale, y_scale)
-
-                    histogram.setImageItem(img)
-                    histogram.gradient.loadPreset("thermal")
-                    if i < self.data_buffer.number_of_measured_parameters:
-                        axis_data = self.data_buffer.axis_values["z"][i]
-                        label_style = {'font-size': '8pt'}
-                        histogram.axis.setLabel(axis_data["name"], axis_data["unit"], **label_style)
-                    plot.addItem(img)
-                    self.plot_elements["frame"].addItem(histogram)
-
-                    for axis in ["left", "bottom"]:
-                        ax = plot.getAxis(axis)
-                        ax.setPen((60, 60, 60))
-
-                    self.side_by_side_plots[name] = {"plot": plot, "img": img, "histogram": histogram}
-                else:
-                    # img = self.side_by_side_plots[name]["img"]
-                    histogram = self.side_by_side_plots[name]["histogram"]
-                    plot = self.side_by_side_plots[name]["plot"]
-                    self.plot_elements["frame"].addItem(plot)
-                    self.plot_elements["frame"].addItem(histogram)
+            self.pending_side_by_side_panels = list(range(len(self.plt_data)))
+            self.add_side_by_side_panels()
         else:
             if self.modes["Side-by-side"]:
                 self.plot_elements["histogram"].setFixedWidth(self.histogram_width)
                 self.plot_elements["histogram"].show()
                 self.plot_elements["frame"].clear()
                 self.modes["Side-by-side"] = False
+                self.pending_side_by_side_panels = []
                 self.plot_elements["frame"].addItem(self.plot_elements["main_subplot"])
             if index > self.data_buffer.number_of_measured_parameters:
                 index -= 1
@@ -512,7 +806,7 @@ class Heatmap(BaseGraph):
             name = self.matrix_selection_combobox.currentText()
             self.active_data_name = name
             self.active_data_index = index
-            self.change_displayed_data_set(self.active_data)
+            self.update_displayed_data()
 
             if index < self.data_buffer.number_of_measured_parameters:
                 axis_data = self.data_buffer.axis_values["z"][index]
@@ -522,6 +816,165 @@ class Heatmap(BaseGraph):
                 self.plot_elements["line_trace_graph"].getAxis("left").setLabel(axis_data["name"], axis_data["unit"], **label_style)
         self.reset_transformations()
 
+    def get_labels(self):
+        """
+        Get names and units of the axes of the active matrix. Derived matrices are labeled by their name.
+
+        :return: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}}
+        """
+        if self.active_data_index < self.data_buffer.number_of_measured_parameters:
+            return self.data_buffer.get_matrix_labels(self.active_data_index)
+        labels = self.data_buffer.get_matrix_labels(0)
+        labels["z"] = {"name": self.active_data_name, "unit": ""}
+        return labels
+
+    def get_matrix_name(self, index):
+        """
+        Get the name of the pipeline source of the matrix at the given index of self.plt_data.
+
+        :param index: int: index of the matrix in self.plt_data
+        :return: string: name of the matrix
+        """
+        if index < self.data_buffer.number_of_measured_parameters:
+            return "matrix{}".format(index)
+        # combobox has the "Side-by-side" item between measured and derived matrices
+        return self.matrix_selection_combobox.itemText(index + 1)
+
+    def get_side_by_side_factor(self, shape):
+        """
+        Calculate how much a matrix can be decimated so that it still has at least one pixel per screen pixel when it
+        is displayed in a panel of the side by side view.
+
+        :param shape: tuple: shape of the matrix
+        :return: int: decimation factor (power of 2)
+        """
+        panel_width = max(self.plt.width() // max(len(self.plt_data), 1), 1)
+        panel_height = max(self.plt.height(), 1)
+        factor = 1
+        while shape[0] / (2 * factor) >= panel_width and shape[1] / (2 * factor) >= panel_height:
+            factor *= 2
+        return factor
+
+    def create_side_by_side_panel(self, index):
+        """
+        Create a plot and a histogram that display one of the matrices in side by side view. Panels are small, so the
+        matrix is decimated to approximately the size of the panel before it is displayed.
+
+        :param index: int: index of the matrix in self.plt_data
+        :return: dict: {"plot": PlotItem, "img": ImageItem, "histogram": HistogramLUTItem}
+        """
+        source = self.get_matrix_name(index)
+        factor = self.get_side_by_side_factor(self.pipeline.get(source, self.get_regrid_operations()).shape)
+        applied_operations = self.get_regrid_operations()
+        if factor > 1:
+            applied_operations = applied_operations + [("decimate", {"factor": factor})]
+
+        img = ImageItem()
+        histogram = pg.HistogramLUTItem()
+        plot = pg.PlotItem()
+
+        img.setImage(self.pipeline.get(source, applied_operations))
+        x_values, y_values = self.get_display_axis_values()
+        self.set_image_transform(img, x_values[0], x_values[-1], y_values[0], y_values[-1], factor)
+
+        histogram.setImageItem(img)
+        histogram.gradient.loadPreset("thermal")
+        if index < self.data_buffer.number_of_measured_parameters:
+            axis_data = self.data_buffer.axis_values["z"][index]
+            label_style = {'font-size': '8pt'}
+            histogram.axis.setLabel(axis_data["name"], axis_data["unit"], **label_style)
+        if index == 0:
+            histogram.sigLookupTableChanged.connect(self.sync_side_by_side_lut)
+            histogram.sigLevelsChanged.connect(self.sync_side_by_side_lut)
+        plot.addItem(img)
+
+        for axis in ["left", "bottom"]:
+            ax = plot.getAxis(axis)
+            ax.setPen((60, 60, 60))
+
+        return {"plot": plot, "img": img, "histogram": histogram}
+
+    def add_side_by_side_panels(self):
+        """
+        Add panels of the side by side view to the window. Already created panels are added right away, then a single
+        new panel is created and the rest are added the next time the event loop is idle, so the window stays
+        responsive while the panels are created.
+
+        :return: NoneType
+        """
+        while self.pending_side_by_side_panels and self.modes["Side-by-side"]:
+            index = self.pending_side_by_side_panels.pop(0)
+            name = "matrix{}".format(index)
+            created = name not in self.side_by_side_plots
+            if created:
+                self.side_by_side_plots[name] = self.create_side_by_side_panel(index)
+            self.plot_elements["frame"].addItem(self.side_by_side_plots[name]["plot"])
+            if index == 0 or not self.share_side_by_side_lut:
+                self.plot_elements["frame"].addItem(self.side_by_side_plots[name]["histogram"])
+            if created:
+                break
+
+        if self.pending_side_by_side_panels and self.modes["Side-by-side"]:
+            QTimer.singleShot(0, self.add_side_by_side_panels)
+        elif self.share_side_by_side_lut:
+            self.share_side_by_side_levels()
+
+    def share_side_by_side_levels(self):
+        """
+        Set levels of the shared histogram so that they include values of all matrices in side by side view. Values
+        are taken from the decimated matrices displayed in the panels.
+
+        :return: NoneType
+        """
+        images = [panel["img"].image for panel in self.side_by_side_plots.values() if panel["img"].image is not None]
+        if not images or "matrix0" not in self.side_by_side_plots:
+            return
+        low = min(get_statistics(image).get_min_max()[0] for image in images)
+        high = max(get_statistics(image).get_min_max()[1] for image in images)
+        self.side_by_side_plots["matrix0"]["histogram"].setLevels(low, high)
+        self.sync_side_by_side_lut()
+
+    def sync_side_by_side_lut(self, *args):
+        """
+        Apply colormap and levels of the histogram of the first panel to all panels in side by side view if the
+        colormap is shared, otherwise apply the colormap and levels of every panels own histogram.
+
+        :return: NoneType
+        """
+        if "matrix0" not in self.side_by_side_plots:
+            return
+        shared = self.side_by_side_plots["matrix0"]["histogram"]
+        for panel in self.side_by_side_plots.values():
+            histogram = shared if self.share_side_by_side_lut else panel["histogram"]
+            panel["img"].setLookupTable(histogram.getLookupTable(img=panel["img"].image))
+            panel["img"].setLevels(histogram.getLevels())
+
+    def set_iso_curve_data(self, data):
+        """
+        Start showing iso curves of the data. Curves are calculated on the data decimated to approximately the size of
+        the window in pixels.
+
+        :param data: np.ndarray: displayed matrix
+        :return: NoneType
+        """
+        width, height = max(self.plt.width(), 1), max(self.plt.height(), 1)
+        factor = 1
+        while data.shape[0] / (2 * factor) >= width and data.shape[1] / (2 * factor) >= height:
+            factor *= 2
+        self.iso_curve = IsoCurve(data, factor)
+        self.update_iso_curve()
+
+    def show_iso_curve(self, iso_curve, path):
+        """
+        Display the calculated iso curve, unless the displayed data changed while it was being calculated.
+
+        :param iso_curve: IsoCurve: object that calculated the curve
+        :param path: QPainterPath: the curve
+        :return: NoneType
+        """
+        if iso_curve is self.iso_curve:
+            self.plot_elements["iso"].setPath(path)
+
     def change_displayed_data_set(self, data_set):
         """
         A helper method for changing active data set. Changes the item which is being displayed in the imgItem element
@@ -532,12 +985,30 @@ class Heatmap(BaseGraph):
         """
         self.displayed_data_set = data_set
         self.plot_elements["img"].setImage(self.displayed_data_set)
-        self.plot_elements["isoLine"].setValue(self.displayed_data_set.mean())
+        self.plot_elements["isoLine"].setValue(get_statistics(self.displayed_data_set).get_mean())
+        self.set_iso_curve_data(self.displayed_data_set)
         self.plot_elements["histogram"].setImageItem(self.plot_elements["img"])
         self.plot_elements["histogram"].gradient.loadPreset("thermal")
+        if self.plot_elements["img"].auto_percentiles is not None:
+            self.apply_auto_levels()
         if self.modes["ROI"]:
             self.update_line_trace_plot()
 
+    def apply_auto_levels(self):
+        """
+        Set levels of the displayed image to the levels the image uses when they are set automatically (minimum and
+        maximum, or percentiles if percentile levels are turned on), and update the color bar.
+
+        :return: NoneType
+        """
+        img = self.plot_elements["img"]
+        if img.image is None:
+            return
+        low, high = img.get_auto_levels()
+        self.plot_elements["histogram"].setLevels(low, high)
+        img.setLevels((low, high))
+        self.plot_elements["color_bar"].imageRangeChanged([img])
+
     def reset_transformations(self):
         """
         Reset values of all changeable actions in the menu bar (ones that are checkable, and also smoothing spin boxes)
@@ -583,36 +1054,68 @@ class Heatmap(BaseGraph):
         Manipulating crosshair is only posible on the x axis, the crosshair y axis gets updated automatically, and the
         calculation of the value where the horizontal line will be placed is done in this method.
 
+        Points of the line trace are evenly spaced between the values stored in line_trace_range, so the index of the
+        point below the mouse is calculated directly, and the value is linearly interpolated between it and the next
+        point.
+
         :param mouse_point: position of the mouse pointer
         :return: x, y positions where vertical and horizontal lines should be placed.
         """
         if self.plot_elements["line_trace_data"] is not None:
             x = mouse_point.x()
+            fp = self.plot_elements["line_trace_data"]
+            start, end = self.line_trace_range
 
-            num_of_point = len(self.plot_elements["line_trace_data"])
-            point1 = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-            _, scene_coords = point1
-            start_coords = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-            point2 = self.line_segment_roi["ROI"].getSceneHandlePositions(1)
-            _, scene_coords = point2
-            end_coords = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-            if (180 - abs(self.line_segment_roi["ROI"].get_angle_from_points())) < 0.0000001:
-                start, end = start_coords.x(), end_coords.x()
-            elif abs(self.line_segment_roi["ROI"].get_angle_from_points()) < 0.0000001:
-                start, end = start_coords.x(), end_coords.x()
-            elif abs(90 - abs(self.line_segment_roi["ROI"].get_angle_from_points())) < 0.0000001:
-                start, end = start_coords.y(), end_coords.y()
-            else:
-                start, end = start_coords.y(), end_coords.y()
-
-            step = (end - start) / (num_of_point - 1)
+            if len(fp) == 1 or start == end:
+                return x, fp[0]
 
-            xp = np.arange(start, end + step, step)
-            fp = self.plot_elements["line_trace_data"]
-            y = np.interp(x, xp, fp)
+            position = (x - start) / (end - start) * (len(fp) - 1)
+            position = min(max(position, 0), len(fp) - 1)
+            index = min(int(position), len(fp) - 2)
+            weight = position - index
+            y = fp[index] * (1 - weight) + fp[index + 1] * weight
 
             return x, y
 
+    def get_inverse_image_transform(self):
+        """
+        Get the transformation that maps coordinates of the main subplot to image coordinates (matrix indices). Image
+        transform changes only when offsets or axis transformations are applied, so the inverse is calculated only when
+        the transform is different from the one used last time.
+
+        :return: QTransform
+        """
+        transform = self.plot_elements["img"].transform()
+        if transform != self.image_transform:
+            self.image_transform = transform
+            self.inverse_image_transform, _ = transform.inverted()
+        return self.inverse_image_transform
+
+    def get_values_at(self, point):
+        """
+        Get values of the displayed data and all measured parameters at the point of the main subplot.
+
+        :param point: QPointF: point in the coordinates of the main subplot
+        :return: tuple (float, list): value of the displayed data (None if the point is outside of the image) and a list
+                 of (parameter name, value) tuples for all measured parameters
+        """
+        pixel = self.get_inverse_image_transform().map(point)
+        i, j = int(np.floor(pixel.x())), int(np.floor(pixel.y()))
+        rows, columns = self.displayed_data_set.shape[:2]
+        if not (0 <= i < rows and 0 <= j < columns):
+            return None, []
+
+        # measured values are shown for the setpoint closest to the mouse, not for the resampled point
+        setpoint_i = self.setpoint_indices["x"][i] if "x" in self.setpoint_indices else i
+        setpoint_j = self.setpoint_indices["y"][j] if "y" in self.setpoint_indices else j
+
+        values = []
+        for index in range(self.data_buffer.number_of_measured_parameters):
+            matrix = self.plt_data[index]
+            name = self.data_buffer.axis_values["z"][index]["name"]
+            values.append((name, matrix[min(setpoint_i, matrix.shape[0] - 1), min(setpoint_j, matrix.shape[1] - 1)]))
+        return self.displayed_data_set[i, j], values
+
     def change_crosshair_position(self, x, y):
         """
         This method updates the position of the crosshair by moving the vertical and horizontal line to the positions
@@ -627,6 +1130,211 @@ class Heatmap(BaseGraph):
 
         return
 
+    def add_matrix(self, display_member, value_member):
+        """
+        Add a new matrix (result of a correction, ...) to the list of matrices of this window and make it selectable
+        from the matrix selection combobox.
+
+        Names are also names of the sources of the processing pipeline, so they have to be unique. If a matrix with
+        the same name already exists, a number is added to the name of the new one.
+
+        :param display_member: string: name of the matrix shown in the combobox
+        :param value_member: np.array: the matrix
+        :return: string: name under which the matrix was added
+        """
+        name, number = display_member, 2
+        while self.matrix_selection_combobox.findText(name) != -1 or name in self.pipeline.sources:
+            name = "{}_{}".format(display_member, number)
+            number += 1
+        display_member = name
+
+        self.matrix_selection_combobox.addItem(display_member, value_member)
+        # ###########################################################
+        # ###########################################################
+        # #### THIS THING HERE ADDS EXTRA MATRIX TO DATA BUFFER #####
+        # ###########################################################
+        # ###########################################################
+
+        self.plt_data.append(value_member)
+        self.pipeline.add_source(display_member, value_member)
+        return display_member
+
+    def remove_matrix(self, name, fallback="matrix0"):
+        """
+        Remove a derived matrix (the most recently added one with this name) from the matrices of this window and drop
+        everything calculated from it, so that the memory it used is freed. Measured matrices can not be removed.
+
+        :param name: string: name of the matrix
+        :param fallback: string: name of the matrix that is displayed if the removed one was displayed
+        :return: NoneType
+        """
+        first_derived = self.data_buffer.number_of_measured_parameters + 1
+        indices = [index for index in range(first_derived, self.matrix_selection_combobox.count())
+                   if self.matrix_selection_combobox.itemText(index) == name]
+        if not indices:
+            return
+        index = indices[-1]
+
+        if self.matrix_selection_combobox.currentIndex() == index:
+            fallback_index = self.matrix_selection_combobox.findText(fallback)
+            self.matrix_selection_combobox.setCurrentIndex(max(fallback_index, 0))
+
+        self.matrix_selection_combobox.blockSignals(True)
+        self.matrix_selection_combobox.removeItem(index)
+        self.matrix_selection_combobox.blockSignals(False)
+        self.active_data_index = self.matrix_selection_combobox.currentIndex()
+
+        # combobox has the "Side-by-side" item between measured and derived matrices
+        removed = index - 1
+        # side by side panels are stored by index of the matrix, indices of the following matrices change
+        for panel_index in range(removed, len(self.plt_data)):
+            self.side_by_side_plots.pop("matrix{}".format(panel_index), None)
+        self.plt_data.pop(removed)
+        if name not in [self.get_matrix_name(i) for i in range(len(self.plt_data))]:
+            self.pipeline.remove_source(name)
+            self.formula_results = {key: value for key, value in self.formula_results.items() if value != name}
+
+        if self.modes["Side-by-side"]:
+            self.change_active_set(self.data_buffer.number_of_measured_parameters)
+
+    def compute_recipe(self, recipe):
+        """
+        Calculate the matrix described by the recipe of a derived matrix. Recipes that consist of operations of the
+        processing pipeline reuse cached intermediate results.
+
+        :param recipe: dict: recipe of the matrix ("kind" is "pipeline", "formula" or "didv")
+        :return: np.ndarray: the matrix
+        """
+        if recipe["kind"] == "pipeline":
+            return self.pipeline.get(recipe["source"], recipe["operations"])
+        elif recipe["kind"] == "formula":
+            variables = tuple("m{}".format(index) for index in range(self.data_buffer.number_of_measured_parameters))
+            expression = expressions.compile_expression(recipe["expression"], variables)
+            values = {"m{}".format(index): self.pipeline.sources["matrix{}".format(index)]
+                      for index in range(self.data_buffer.number_of_measured_parameters)}
+            return expressions.evaluate_in_chunks(expression, values)
+        elif recipe["kind"] == "didv":
+            return operations.didv_correction(self.pipeline.sources[recipe["source"]], recipe["currents"],
+                                              self.data_buffer.get_y_axis_values()[0], recipe["resistance"],
+                                              recipe["dv"], recipe["unit_correction"])
+        raise ValueError("Unknown recipe {}".format(recipe["kind"]))
+
+    def apply_recipe(self, recipe):
+        """
+        Do the operation described by the recipe: add the derived matrix, apply the offset or the transformation.
+
+        :param recipe: dict: recipe of the operation
+        :return: bool: True if the operation was done, False if it failed (the user is notified)
+        """
+        if recipe["kind"] == "offset":
+            self.apply_axis_offset(recipe["axis"], recipe["value"])
+            return True
+        elif recipe["kind"] == "transformation":
+            return self.apply_transformation([recipe["expression"]], recipe["axis"]) is not None
+
+        try:
+            matrix = self.compute_recipe(recipe)
+        except Exception as e:
+            show_error_message("Task failed successfully !", str(e))
+            return False
+        # name can change if a matrix with the same name was added in the meantime, undo removes it by this name
+        recipe["name"] = self.add_matrix(recipe["name"], matrix)
+        if recipe["kind"] == "formula":
+            variables = tuple("m{}".format(index) for index in range(self.data_buffer.number_of_measured_parameters))
+            self.formula_results[expressions.compile_expression(recipe["expression"], variables).key] = recipe["name"]
+        return True
+
+    def revert_recipe(self, recipe):
+        """
+        Undo the operation described by the recipe.
+
+        :param recipe: dict: recipe of the operation
+        :return: NoneType
+        """
+        if recipe["kind"] == "offset":
+            self.apply_axis_offset(recipe["axis"], -recipe["value"])
+        elif recipe["kind"] == "transformation":
+            self.apply_transformation([recipe["previous"]], recipe["axis"])
+        else:
+            self.remove_matrix(recipe["name"], recipe.get("source", "matrix0"))
+
+    def do_operation(self, recipe):
+        """
+        Do the operation described by the recipe and record it in the history, so that it can be undone.
+
+        :param recipe: dict: recipe of the operation
+        :return: bool: True if the operation was done
+        """
+        if not self.apply_recipe(recipe):
+            return False
+        self.history.record(recipe)
+        self.update_history_actions()
+        return True
+
+    def update_history_actions(self):
+        """
+        Enable undo and redo buttons only if there is something to undo or redo.
+
+        :return: NoneType
+        """
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
+
+    def get_session_state(self):
+        """
+        Collect everything that the user did in this window (derived matrices, offsets, transformations, axis edits)
+        so that it can be saved as a part of the session and restored later without recalculating anything.
+
+        :return: dict: state of this window
+        """
+        extra_matrices = []
+        for index in range(self.data_buffer.number_of_measured_parameters, len(self.plt_data)):
+            # combobox has the "Side-by-side" item between measured and derived matrices
+            name = self.matrix_selection_combobox.itemText(index + 1)
+            extra_matrices.append({"name": name, "matrix": self.plt_data[index]})
+
+        derived = []
+        for source, applied_operations, matrix in self.pipeline.cached_results():
+            # Fourier transforms are intermediate results that are quick to calculate again, and are large
+            if np.iscomplexobj(matrix):
+                continue
+            derived.append({"source": source, "operations": applied_operations, "matrix": matrix})
+
+        return {"extra_matrices": extra_matrices,
+                "derived": derived,
+                "offsets": dict(self.offsets),
+                "transformations": self.transformations,
+                "axis_edits": self.axis_edits,
+                "active_index": self.matrix_selection_combobox.currentIndex()}
+
+    def restore_session_state(self, state):
+        """
+        Restore the state of this window saved by get_session_state.
+
+        :param state: dict: state of the window loaded from the session file
+        :return: NoneType
+        """
+        for extra in state["extra_matrices"]:
+            self.add_matrix(extra["name"], extra["matrix"])
+
+        for derived in state["derived"]:
+            if derived["source"] in self.pipeline.sources:
+                self.pipeline.put(derived["source"], derived["operations"], derived["matrix"])
+
+        self.matrix_selection_combobox.setCurrentIndex(state["active_index"])
+
+        if state["offsets"]["horizontal"]:
+            self.apply_axis_offset("x", state["offsets"]["horizontal"])
+        if state["offsets"]["vertical"]:
+            self.apply_axis_offset("y", state["offsets"]["vertical"])
+
+        for axis in ["x", "y"]:
+            if state["transformations"][axis] is not None:
+                self.apply_transformation([state["transformations"][axis]], axis)
+
+        for axis_edit in state["axis_edits"]:
+            self.edit_axis_data(axis_edit)
+
     """
     #########################
     ######## Actions ########
@@ -669,8 +1377,10 @@ class Heatmap(BaseGraph):
                 self.label_b.setParentItem(line_segmet_roi)
                 self.label_b.setPos(x1, y1)
 
-                # connect signal to a slot
-                line_segmet_roi.sigRegionChanged.connect(self.update_line_trace_plot)
+                # connect signal to a slot, ROI emits this signal on every mouse move while it is being dragged, so
+                # the signal goes trough a proxy that limits the number of updates to one per frame
+                self.line_trace_proxy = pg.SignalProxy(line_segmet_roi.sigRegionChanged, rateLimit=60,
+                                                       slot=self.update_line_trace_plot)
                 # make a reference to this ROI so i can use it later
                 self.line_segment_roi["ROI"] = line_segmet_roi
                 # add the ROI to main subplot
@@ -689,6 +1399,7 @@ class Heatmap(BaseGraph):
         else:
             self.modes["ROI"] = False
             self.plot_elements["line_trace_graph"].clear()
+            self.plot_elements["line_trace_curve"] = None
             self.line_segment_roi["ROI"].hide()
             self.label_a.hide()
             self.label_b.hide()
@@ -716,49 +1427,95 @@ class Heatmap(BaseGraph):
 
     def smoothing_action(self):
         """
-        A method used to call a smoothing algorithm selected from the drop down menu in the toolbar.
+        A method used to apply a smoothing algorithm selected from the drop down menu in the toolbar. Naive smoothing
+        is a moving average (processing.operations.naive_smoothing), gaussian and lorentzian smoothing are filters
+        applied in the frequency domain (processing.operations.fourier_filter).
 
         :return: NoneType
         """
-        smoothing_type = self.smoothing_selection_combobox.currentText().lower()
-        method_name = smoothing_type + "_smoothing"
-        method = getattr(self, method_name)
-        method()
+        self.update_displayed_data()
 
     def lorentzian_filter_action(self):
         """
-        I dont think i will actually need this but whatever
+        Select lorentzian smoothing, the spin boxes then set half widths (in points) of the lorentzian along each axis.
 
-        :return:
+        :return: NoneType
         """
-        pass
+        self.smoothing_selection_combobox.setCurrentText("Lorentzian")
 
-    def matrix_action(self):
+    def fourier_filter_action(self):
         """
-        Creates the matrix file version of this data in the same folder where the original file is located.
+        Open a window in which the user selects a frequency domain filter (low, high or band pass, or removal of
+        periodic noise) that is applied to the active matrix. The filtered matrix is added to the matrices.
 
         :return: NoneType
         """
+        filters = {"Low pass (cutoff)": "low_pass", "High pass (cutoff)": "high_pass",
+                   "Band pass (low, high)": "band_pass", "Remove periodic noise (x, y, width)": "notch"}
+        self.fourier_filter_input = InputDataWidget.InputData(
+            "Frequencies are in cycles per point (0 - 0.5)", 3, default_value=["0.1", "0.2", "0.01"],
+            numeric=[True, True, True], placeholders=["Cutoff / low / x frequency", "High / y frequency", "Width"],
+            dropdown=True, dropdown_text="Filter", dropdown_options=filters)
+        self.fourier_filter_input.submitted.connect(self.apply_fourier_filter)
 
-        def save_matrix(data):
-            user_input_name = data
-            new_file_location = get_location_path(location) + "\\" + user_input_name + "_generated_correction"
-            file = open(new_file_location, "w")
-            raw_data = np.transpose(self.displayed_data_set)
-            np.savetxt(file, raw_data, delimiter="\t")
-            file.close()
+    def background_action(self):
+        """
+        Open a window in which the user selects a background correction (subtraction of the mean, median or linear fit
+        of every line, subtraction of a plane fit) or normalization that is applied to the active matrix. The result
+        is added to the matrices.
 
-        location = self.data_buffer.location
-        name = get_location_basename(location)
-        index = self.active_data_index
-        if index > self.data_buffer.number_of_measured_parameters:
-            self.select_file_name = InputDataWidget.InputData("Please select the name of the output file.", default_value=name)
-            self.select_file_name.submitted.connect(save_matrix)
-        elif self.modes["Side-by-side"]:
+        :return: NoneType
+        """
+        corrections = {description: description for description in BACKGROUND_CORRECTIONS}
+        self.background_input = InputDataWidget.InputData(
+            "Select the correction applied to the displayed matrix", 0, numeric=[], dropdown=True,
+            dropdown_text="Correction", dropdown_options=corrections)
+        self.background_input.submitted.connect(self.apply_background_correction)
+
+    def matrix_action(self):
+        """
+        Export the active matrix to a file. Measured matrices are exported as they were loaded, derived matrices as
+        they are displayed (with smoothing and derivatives applied). Format of the file (text, .npy, .npz or HDF5) is
+        selected in the file dialog, axis values and labels are saved together with the matrix.
+
+        The file is written in the background, while it is being written a progress bar is displayed.
+
+        :return: NoneType
+        """
+        if self.modes["Side-by-side"]:
             show_error_message("NO, U CANT DO THAT !",
                                "Creating a matrix file for side by side view is not possible.")
+            return
+
+        location = self.data_buffer.location
+        default_location = os.path.join(get_location_path(location),
+                                        "{}_{}".format(get_location_basename(location), self.active_data_name))
+        file_location, file_filter = QFileDialog.getSaveFileName(self, "Export matrix", default_location,
+                                                                 MatrixExport.get_file_filters())
+        if not file_location:
+            return
+        if not os.path.splitext(file_location)[1]:
+            # extension of the selected filter, for example ".npz" from "Compressed NumPy archive (*.npz)"
+            file_location += file_filter[file_filter.rfind("*") + 1:-1]
+
+        index = self.active_data_index
+        if index < self.data_buffer.number_of_measured_parameters:
+            worker = Worker(self.data_buffer.create_matrix_file, index, file_location)
         else:
-            self.data_buffer.create_matrix_file(index)
+            x_values, y_values = self.get_display_axis_values()
+            worker = Worker(MatrixExport.export_matrix, file_location, self.displayed_data_set, x_values, y_values,
+                            self.get_labels())
+
+        progress_bar = ProgressBarWidget.ProgressBarWidget(get_location_basename(file_location), action="Exporting")
+        worker.kwargs["progress"] = lambda fraction: worker.signals.progress.emit(int(fraction * 100))
+        worker.signals.progress.connect(progress_bar.setValue)
+        worker.signals.result.connect(lambda written: self.statusBar().showMessage("Exported to " + written, 5000))
+        worker.signals.error.connect(lambda error: show_error_message("Export failed", str(error[1])))
+        worker.signals.finished.connect(progress_bar.close)
+        # keep the progress bar alive until the export is finished
+        self.export_progress_bars.append(progress_bar)
+        worker.signals.finished.connect(lambda: self.export_progress_bars.remove(progress_bar))
+        QThreadPool.globalInstance().start(worker)
 
     def show_2d_action(self):
         """
@@ -769,29 +1526,10 @@ class Heatmap(BaseGraph):
         :return:
         """
         print("Preparing data for line trace window . . .")
-        data = self.displayed_data_set
-        img = self.plot_elements["img"]
-        selected = self.line_segment_roi["ROI"].getArrayRegion(data, img)
-        first_point = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-        _, scene_coords = first_point
-        start = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        start_x = start.y()
-        last_point = self.line_segment_roi["ROI"].getSceneHandlePositions(1)
-        _, scene_coords = last_point
-        end = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        end_x = end.y()
-
-        first_point = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-        _, scene_coords = first_point
-        start = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        start_y = start.x()
-        last_point = self.line_segment_roi["ROI"].getSceneHandlePositions(1)
-        _, scene_coords = last_point
-        end = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        end_y = end.x()
-
-        x = np.linspace(start_x, end_x, len(selected))
-        x2 = np.linspace(start_y, end_y, len(selected))
+        selected, start, end = self.sample_line_trace()
+
+        x = np.linspace(start.y(), end.y(), len(selected))
+        x2 = np.linspace(start.x(), end.x(), len(selected))
 
         label_x = self.data_buffer.axis_values["y"][0]
         label_y = self.data_buffer.axis_values["z"][self.active_data_index]
@@ -805,34 +1543,32 @@ class Heatmap(BaseGraph):
         dummy = DummyBuffer(title + "Line Trace", x_dict, y_dict, extra_axis=extra_axis_dict)
         self.line_trace_window = LineTrace(dummy, parent=self)
 
+    def waterfall_action(self):
+        """
+        Open a window that shows line cuts of the displayed data (with all operations selected in the toolbar applied)
+        taken at every n-th point along one of the axes.
+
+        :return: NoneType
+        """
+        if self.modes["Side-by-side"]:
+            show_error_message("Warning", "Select a matrix to display a waterfall plot of it")
+            return
+
+        x_values, y_values = self.get_display_axis_values()
+        self.waterfall_window = Waterfall(self.displayed_data_set, x_values, y_values, self.get_labels(),
+                                          title=self.data_buffer.name, parent=self)
+
     def xderivative_action(self):
         """
         Replace data by derivative of the data along x axis
 
         :return: NoneType
         """
-        if self.der_y.isChecked():
-            name = self.active_data_name
-            if self.der_x.isChecked():
-                if self.plt_data_options[name]["yxDer"] is None:
-                    der_yx_data = np.diff(self.plt_data_options[name]["yDer"], 1, 0)
-                    self.plt_data_options[name]["yxDer"] = der_yx_data
-                else:
-                    der_yx_data = self.plt_data_options[name]["yxDer"]
-                self.change_displayed_data_set(der_yx_data)
-            else:
-                self.change_displayed_data_set(self.plt_data_options[name]["yDer"])
-        else:
-            if self.der_x.isChecked():
-                name = self.active_data_name
-                if self.plt_data_options[name]["xDer"] is None:
-                    der_x_data = np.diff(self.active_data, 1, 0)
-                    self.plt_data_options[name]["xDer"] = der_x_data
-                else:
-                    der_x_data = self.plt_data_options[name]["xDer"]
-                self.change_displayed_data_set(der_x_data)
-            else:
-                self.change_displayed_data_set(self.active_data)
+        if self.der_x.isChecked():
+            self.derivatives.append("x_derivative")
+        elif "x_derivative" in self.derivatives:
+            self.derivatives.remove("x_derivative")
+        self.update_displayed_data()
 
     def yderivative_action(self):
         """
@@ -840,29 +1576,11 @@ class Heatmap(BaseGraph):
 
         :return: NoneType
         """
-        if self.der_x.isChecked():
-            name = self.active_data_name
-            if self.der_y.isChecked():
-                if self.plt_data_options[name]["xyDer"] is None:
-                    der_xy_data = np.diff(self.plt_data_options[name]["xDer"], 1, 1)
-                    self.plt_data_options[name]["xyDer"] = der_xy_data
-                else:
-                    der_xy_data = self.plt_data_options[name]["xyDer"]
-                self.change_displayed_data_set(der_xy_data)
-            else:
-                self.change_displayed_data_set(self.plt_data_options[name]["xDer"])
-
-        else:
-            if self.der_y.isChecked():
-                name = self.active_data_name
-                if self.plt_data_options[name]["yDer"] is None:
-                    der_y_data = np.diff(self.active_data, 1, 1)
-                    self.plt_data_options[name]["yDer"] = der_y_data
-                else:
-                    der_y_data = self.plt_data_options[name]["yDer"]
-                self.change_displayed_data_set(der_y_data)
-            else:
-                self.change_displayed_data_set(self.active_data)
+        if self.der_y.isChecked():
+            self.derivatives.append("y_derivative")
+        elif "y_derivative" in self.derivatives:
+            self.derivatives.remove("y_derivative")
+        self.update_displayed_data()
 
     def correct_data_action(self):
         """
@@ -875,71 +1593,22 @@ class Heatmap(BaseGraph):
                                                1, numeric=[True], placeholders=["Resistance [Ω]"])
         self.input.submitted.connect(self.apply_correction)
 
-    def naive_smoothing(self):
+    def resistance_scan_action(self):
         """
-        Method that smoothens the data by calculating the average of the n points to the left and right of point P,
-        and setting the value of P to the calculated value.
-
-        Example:
-
-        [[1, 4, 3],
-         [2, 8, 2],
-         [3, 5, 6]]
-
-         If this example matrix is smoothened in the x axis direction with a value 1 (1 to the left and 1 to the right
-          of the data point) the result matrix would be:
-
-         [[2.5, 2.66, 3.5], -> (1+4) / 2 = 2.5 \\\\ (1+4+3) / 3 = 2.66 \\\\ (4+3) / 2 = 3.5
-          [5, 4, 5]         -> (2+8) / 2 = 5 \\\\ (2+8+2) / 3 = 4 \\\\ (8+2) / 2 = 5
-          [4, 4.66, 5.5]]   -> (3+5) / 2 = 4 \\\\ (3+5+6) / 3 = 4.66 \\\\ (5+6) / 2 = 5.5
+        Open a window with a slider that selects series resistance. Data corrected for the selected resistance is
+        displayed until the window is closed, and only the correction that the user commits is added to the matrices.
 
-        :return:
-        """
-        x = self.smoothen_x.value()
-        y = self.smoothen_y.value()
-        data = self.active_data
-
-        vertical_shift = np.copy(data)
-        horizontal_shift = np.copy(np.transpose(data))
-        for i, axis in enumerate([x, y]):
-            for shift_value in range(-axis, axis + 1):
-                if shift_value != 0:
-                    if i:
-                        temp = shift(np.transpose(data), shift_value, 0)
-                        np.add(horizontal_shift, temp, horizontal_shift)
-                    else:
-                        temp = shift(data, shift_value, 0)
-                        np.add(vertical_shift, temp, vertical_shift)
-        limit_vertical = len(vertical_shift) - 1
-        limit_horizontal = len(horizontal_shift) - 1
-        for index, row in enumerate(vertical_shift):
-            low = index - y if index - y >= 0 else 0
-            high = index + y if index + y <= limit_vertical else limit_vertical
-            division_number = high - low + 1
-            row = row / division_number
-            vertical_shift[index] = row
-        for index, column in enumerate(horizontal_shift):
-            low = index - x if index - x >= 0 else 0
-            high = index + x if index + x <= limit_horizontal else limit_horizontal
-            division_number = high - low + 1
-            column = column / division_number
-            horizontal_shift[index] = column
-        result = (vertical_shift + np.transpose(horizontal_shift)) / 2
-
-        self.change_displayed_data_set(result)
-        return
-
-    def gaussian_smoothing(self):
-        """
-        Method that smoothens the data by using existing gaussianFilter function implemented in numpy python library.
-
-        :return:
+        :return: NoneType
         """
-        x = self.smoothen_x.value()
-        y = self.smoothen_y.value()  # apply this to displayed set, instead of this below
+        self.resistance_scan = ResistanceScan(self.pipeline.sources[self.active_data_name],
+                                              self.data_buffer.get_y_axis_values()[0], self.unit_correction)
+        self.resistance_scan_source = self.active_data_name
 
-        smoothened_data = pg.gaussianFilter(self.active_data, (x, y))
-        self.change_displayed_data_set(smoothened_data)
+        self.resistance_scan_widget = ResistanceScanWidget.ResistanceScanWidget(parent=self)
+        self.resistance_scan_widget.value_changed.connect(self.scan_resistance)
+        self.resistance_scan_widget.submitted.connect(self.commit_resistance_scan)
+        self.resistance_scan_widget.closed.connect(self.stop_resistance_scan)
+        self.scan_resistance(self.resistance_scan_widget.get_resistance())
 
     def gm_didv_correction_action(self):
         """
@@ -952,6 +1621,20 @@ class Heatmap(BaseGraph):
         self.didv_input = DiDvCorrectionInputWidget.DiDvCorrectionInputWidget(parent=self)
         self.didv_input.submitted.connect(self.apply_gm_didv_correction)
 
+    def formula_action(self):
+        """
+        Open a window in which the user inputs a formula that calculates a new matrix from the measured parameters.
+
+        :return: NoneType
+        """
+        names = ["m{} = {}".format(index, self.data_buffer.axis_values["z"][index]["name"])
+                 for index in range(self.data_buffer.number_of_measured_parameters)]
+        self.formula_input = InputDataWidget.InputData("Formula over measured parameters:\n" + "\n".join(names), 2,
+                                                       placeholders=["Formula, for example m1 / m0",
+                                                                     "Name of the new matrix (optional)"],
+                                                       numeric=[False, False])
+        self.formula_input.submitted.connect(self.apply_formula)
+
     def zoom_action(self):
         """
         Method that instantiates a helper widget (InputData) used to input data necessary to perform zoom action.
@@ -972,6 +1655,31 @@ class Heatmap(BaseGraph):
                                                              "End Y value [Currently {}]".format(current_y_max)])
         self.input.submitted.connect(self.zoom_to_range)
 
+    def percentile_levels_action(self):
+        """
+        Switch between automatic levels set to the minimum and maximum of the displayed data, and automatic levels set
+        to percentiles of the displayed data. Levels are updated right away, and every time the displayed data changes.
+
+        :return: NoneType
+        """
+        if self.percentile_levels_btn.isChecked():
+            self.plot_elements["img"].auto_percentiles = AUTO_LEVEL_PERCENTILES
+        else:
+            self.plot_elements["img"].auto_percentiles = None
+        self.apply_auto_levels()
+
+    def shared_colormap_action(self):
+        """
+        Switch between one colormap and levels for all panels in side by side view, and separate colormap and levels
+        for each panel.
+
+        :return: NoneType
+        """
+        self.share_side_by_side_lut = self.shared_colormap_btn.isChecked()
+        self.sync_side_by_side_lut()
+        if self.modes["Side-by-side"]:
+            self.change_active_set(self.data_buffer.number_of_measured_parameters)
+
     def toggle_color_bar_action(self):
         """
         Method that switches between showing histogram or matlab like color bar. If the button is "ON" histogram is
@@ -1034,6 +1742,29 @@ class Heatmap(BaseGraph):
         self.idw.submitted.connect(self.transform_y_axis)
         self.idw.show()
 
+    def undo_action(self):
+        """
+        Undo the last derived matrix, offset or transformation. Undone matrices are removed, and calculated again from
+        their recipe if the operation is redone.
+
+        :return: NoneType
+        """
+        recipe = self.history.undo()
+        if recipe is not None:
+            self.revert_recipe(recipe)
+        self.update_history_actions()
+
+    def redo_action(self):
+        """
+        Do the last undone operation again.
+
+        :return: NoneType
+        """
+        recipe = self.history.redo()
+        if recipe is not None and not self.apply_recipe(recipe):
+            self.history.undo()
+        self.update_history_actions()
+
     """
     ########################
     ######## Events ########
@@ -1042,27 +1773,42 @@ class Heatmap(BaseGraph):
     def update_iso_curve(self):
         """
         When iso line element of the histogram is moved update the data on the main plot according to the value of the
-        iso line on the histogram plot.
+        iso line on the histogram plot. Curves for recently used levels are displayed right away, others are calculated
+        in the background.
 
         :return: NoneType
         """
-        self.plot_elements["iso"].setLevel(self.plot_elements["isoLine"].value())
+        iso_curve = self.iso_curve
+        level = self.plot_elements["isoLine"].value()
+        if iso_curve.is_cached(level):
+            self.iso_runner.cancel()
+            self.show_iso_curve(iso_curve, iso_curve.get_path(level))
+        else:
+            self.iso_runner.submit(lambda cancelled: iso_curve.get_path(level, cancelled),
+                                   lambda path: self.show_iso_curve(iso_curve, path))
         return
 
     def mouse_moved(self, evt):
         """
         When moving a mouse check if the current mouse position is within the main plot of the Heatmap window. If it is
         then change the values in the status bar to the values of the point under the mouse cursor relative to the main
-        plot of the Heatmap window (basically coordinates of the mouse cursor in the main plot)
+        plot of the Heatmap window (basically coordinates of the mouse cursor in the main plot), the value of the
+        displayed data and the values of all measured parameters at that point.
 
-        :param evt: signal that gets emitted when mouse is moved passes position of the mouse to the slot that gets that
-        signal
+        :param evt: tuple: arguments of the signal that gets emitted when mouse is moved (passed trough SignalProxy),
+                    the first one is the position of the mouse
         :return: NoneType
         """
-        pos = evt
+        pos = evt[0]
         if self.plot_elements["main_subplot"].sceneBoundingRect().contains(pos):
             mouse_point = self.plot_elements["main_subplot"].vb.mapSceneToView(pos)
             string = "[Position: {}, {}]".format(round(mouse_point.x(), 3), round(mouse_point.y(), 3))
+            value, parameters = self.get_values_at(mouse_point)
+            if value is not None:
+                string += " [Value: {:.6g}]".format(value)
+                if parameters:
+                    string += " [{}]".format(", ".join("{}: {:.6g}".format(name, parameter_value)
+                                                       for name, parameter_value in parameters))
             self.statusBar().showMessage(string)
         elif self.plot_elements["line_trace_graph"].sceneBoundingRect().contains(pos):
             if self.plot_elements["line_trace_data"] is not None:
@@ -1073,65 +1819,77 @@ class Heatmap(BaseGraph):
                     string = "[Position: {}, {}]".format(round(x, 9), round(y, 9))
                     self.statusBar().showMessage(string)
 
-    def update_line_trace_plot(self):
+    def get_line_trace_end_points(self):
+        """
+        Get positions of the handles of the line ROI in the coordinates of the main subplot.
+
+        :return: tuple (QPointF, QPointF): positions of point A and point B
+        """
+        roi = self.line_segment_roi["ROI"]
+        _, scene_coords = roi.getSceneHandlePositions(0)
+        start_coords = roi.mapSceneToParent(scene_coords)
+        _, scene_coords = roi.getSceneHandlePositions(1)
+        end_coords = roi.mapSceneToParent(scene_coords)
+        return start_coords, end_coords
+
+    def sample_line_trace(self):
+        """
+        Get values of the displayed data below the line ROI, averaged across the width selected in the toolbar.
+
+        :return: tuple (np.ndarray, QPointF, QPointF): sampled values, positions of point A and point B
+        """
+        start_coords, end_coords = self.get_line_trace_end_points()
+
+        data = self.displayed_data_set
+        inverse = self.get_inverse_image_transform()
+        start_pixel = inverse.map(start_coords)
+        end_pixel = inverse.map(end_coords)
+        self.line_cut_sampler.set_line((start_pixel.x(), start_pixel.y()), (end_pixel.x(), end_pixel.y()), data.shape,
+                                       self.line_trace_width.value())
+        return self.line_cut_sampler.sample(data), start_coords, end_coords
+
+    def update_line_trace_plot(self, *args):
         """
         Each time a line trace is moved this method is called to update the line trace graph element of the Heatmap
-        widget.
+        widget. Values below the line are sampled by the LineCutSampler, and the curve that already exists in the line
+        trace graph gets the new data (nothing is removed from or added to the graph).
 
+        :param args: arguments of the signal that triggered the update (not used)
         :return: NoneType
         """
+        if self.line_segment_roi["ROI"] is None or not self.modes["ROI"]:
+            return
 
-        self.plot_elements["line_trace_graph"].clear()
-        self.update_point_label_positions()
+        selected, start_coords, end_coords = self.sample_line_trace()
+        self.update_point_label_positions(start_coords, end_coords)
+        self.plot_elements["line_trace_data"] = selected
 
-        data = self.displayed_data_set
-        img = self.plot_elements["img"]
-        selected = self.line_segment_roi["ROI"].getArrayRegion(data, img)
         line_trace_graph = self.plot_elements["line_trace_graph"]
-        new_plot = line_trace_graph.plot(selected, pen=(60, 60, 60), clear=True)
-        self.plot_elements["line_trace_data"] = selected
-        point = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-        _, scene_coords = point
-        coords = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-
-        point1 = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-        _, scene_coords = point1
-        start_coords = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        point2 = self.line_segment_roi["ROI"].getSceneHandlePositions(1)
-        _, scene_coords = point2
-        end_coords = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-
-        if (180 - abs(self.line_segment_roi["ROI"].get_angle_from_points())) < 0.0000001:
-            self.plot_elements["line_trace_graph"].getAxis("bottom").hide()
-            self.plot_elements["extra_axis"].show()
-            new_plot.translate(coords.x(), 0)
-            line_trace_graph.setXRange(start_coords.x(), end_coords.x())
-            scale = end_coords.x() - start_coords.x()
-        elif abs(self.line_segment_roi["ROI"].get_angle_from_points()) < 0.0000001:
-            self.plot_elements["line_trace_graph"].getAxis("bottom").hide()
+        angle = self.line_segment_roi["ROI"].get_angle_from_points()
+        if (180 - abs(angle)) < 0.0000001 or abs(angle) < 0.0000001:
+            line_trace_graph.getAxis("bottom").hide()
             self.plot_elements["extra_axis"].show()
-            new_plot.translate(coords.x(), 0)
-            line_trace_graph.setXRange(start_coords.x(), end_coords.x())
-            scale = end_coords.x() - start_coords.x()
-        elif abs(90 - abs(self.line_segment_roi["ROI"].get_angle_from_points())) < 0.0000001:
-            self.plot_elements["line_trace_graph"].getAxis("bottom").show()
+            start, end = start_coords.x(), end_coords.x()
+        elif abs(90 - abs(angle)) < 0.0000001:
+            line_trace_graph.getAxis("bottom").show()
             self.plot_elements["extra_axis"].hide()
-            new_plot.translate(coords.y(), 0)
-            line_trace_graph.setXRange(start_coords.y(), end_coords.y())
-            scale = end_coords.y() - start_coords.y()
+            start, end = start_coords.y(), end_coords.y()
         else:
-            self.plot_elements["line_trace_graph"].getAxis("bottom").show()
+            line_trace_graph.getAxis("bottom").show()
             self.plot_elements["extra_axis"].show()
-            new_plot.translate(coords.y(), 0)
-            line_trace_graph.setXRange(start_coords.y(), end_coords.y())
-            scale = end_coords.y() - start_coords.y()
-
-        num_of_points = len(selected) - 1
-        if num_of_points == 0:
-            num_of_points = 1
-        new_plot.scale(scale/num_of_points, 1)
-        line_trace_graph.addItem(self.plot_elements["v_line"], ignoreBounds=True)
-        line_trace_graph.addItem(self.plot_elements["h_line"], ignoreBounds=True)
+            start, end = start_coords.y(), end_coords.y()
+
+        self.line_trace_range = (start, end)
+        x = np.linspace(start, end, len(selected))
+        if self.plot_elements["line_trace_curve"] is None:
+            self.plot_elements["line_trace_curve"] = line_trace_graph.plot(x, selected, pen=(60, 60, 60))
+            for line in [self.plot_elements["v_line"], self.plot_elements["h_line"]]:
+                if line not in line_trace_graph.items:
+                    line_trace_graph.addItem(line, ignoreBounds=True)
+        else:
+            self.plot_elements["line_trace_curve"].setData(x, selected)
+        line_trace_graph.setXRange(start, end)
+
         self.change_crosshair_position(start_coords.x(), start_coords.y())
 
     def apply_correction(self, data):
@@ -1152,49 +1910,11 @@ class Heatmap(BaseGraph):
         print("Reading data from correction widget . . .")
         self.correction_resistance = float(data[0])
 
-        dimensions = self.data_buffer.get_matrix_dimensions()
-        matrix = self.active_data
-        y_data = self.data_buffer.get_y_axis_values()[0]
-        corrected_matrix = np.zeros((dimensions[0], dimensions[1]))
-
-        biases = [1 if voltage >= 0 else -1 for voltage in y_data]
-
-        for row in range(dimensions[0]):
-            column = matrix[row, :]
-            corrected_voltages = (abs(y_data) - abs(self.correction_resistance * column) * self.unit_correction) * biases
-
-            xp = corrected_voltages
-            fp = column
-
-            if np.all(np.diff(y_data) > 0):
-                corrected_matrix[row, :] = np.interp(y_data, xp, fp, left=0, right=0)
-            else:
-                reversed_y_data = y_data[::-1]
-                reversed_xp = xp[::-1]
-                reversed_fp = fp[::-1]
-
-                reversed_matrix_column = np.interp(reversed_y_data, reversed_xp, reversed_fp,
-                                                   left=0, right=0)
-                column = reversed_matrix_column[::-1]
-                corrected_matrix[row, :] = column
-
-        display_member = "corrected_" + self.active_data_name
-        value_member = corrected_matrix
-        self.matrix_selection_combobox.addItem(display_member, value_member)
-        # ###########################################################
-        # ###########################################################
-        # #### THIS THING HERE ADDS EXTRA MATRIX TO DATA BUFFER #####
-        # ###########################################################
-        # ###########################################################
-
-        self.plt_data.append(value_member)
-        self.plt_data_options[display_member] = {"xDer": None,
-                                                 "yDer": None,
-                                                 "xyDer": None,
-                                                 "yxDer": None,
-                                                 "corrected": None,
-                                                 "gauss": None}
-        # self.corrected_data = corrected_matrix
+        params = {"resistance": self.correction_resistance, "unit_correction": self.unit_correction}
+        self.do_operation({"kind": "pipeline",
+                           "name": "corrected_{}_R={:g}".format(self.active_data_name, self.correction_resistance),
+                           "source": self.active_data_name,
+                           "operations": [("series_resistance_correction", params)]})
 
     def apply_gm_didv_correction(self, data):
         """
@@ -1215,52 +1935,143 @@ class Heatmap(BaseGraph):
         self.didv_correction_resistance = float(data[0])
         self.didv_correction_dv = float(data[1])
 
-        dimensions = self.data_buffer.get_matrix_dimensions()
-        currents_matrix = data[2]
-        matrix = self.active_data
-        y_data = self.data_buffer.get_y_axis_values()[0]
-        corrected_matrix = np.zeros((dimensions[0], dimensions[1]))
-
-        biases = [1 if voltage >= 0 else -1 for voltage in y_data]
-
-        for row in range(dimensions[0]):
-            column = currents_matrix[row, :]
-            corrected_voltages = (abs(y_data) - abs(
-                self.didv_correction_resistance * column) * self.unit_correction) * biases
-            xp = corrected_voltages
-            fp = matrix[row, :]
-            if np.all(np.diff(y_data) > 0):
-                corrected_matrix[row, :] = np.interp(y_data, xp, fp, left=0, right=0)
-            else:
-                reversed_y_data = y_data[::-1]
-                reversed_xp = xp[::-1]
-                reversed_fp = fp[::-1]
+        # the recipe keeps a reference to the matrix of currents (a measured matrix), not a copy of it
+        name = "didv_{}_R={:g}_dV={:g}".format(self.active_data_name, self.didv_correction_resistance,
+                                               self.didv_correction_dv)
+        self.do_operation({"kind": "didv", "name": name, "source": self.active_data_name,
+                           "currents": data[2], "resistance": self.didv_correction_resistance,
+                           "dv": self.didv_correction_dv, "unit_correction": self.unit_correction})
 
-                reversed_matrix_column = np.interp(reversed_y_data, reversed_xp, reversed_fp,
-                                                   left=0, right=0)
-                column = reversed_matrix_column[::-1]
-                corrected_matrix[row, :] = column
+    def apply_formula(self, data):
+        """
+        Calculate a new matrix from the measured parameters using the formula submitted in the formula window, and add
+        it to the matrices. The formula is evaluated a block of rows at a time. If the same formula was already
+        evaluated, the existing matrix is selected instead.
 
-        didv_matrix = self.didv_correction_dv - (corrected_matrix * self.didv_correction_resistance)
-        corrected_didv_matrix = corrected_matrix / didv_matrix
+        :param data: list: [formula, name of the new matrix] emitted by the formula window
+        :return: NoneType
+        """
+        variables = tuple("m{}".format(index) for index in range(self.data_buffer.number_of_measured_parameters))
+        try:
+            expression = expressions.compile_expression(data[0], variables)
+        except expressions.ExpressionError as e:
+            show_error_message("Invalid formula", str(e))
+            return
+
+        if expression.key in self.formula_results:
+            index = self.matrix_selection_combobox.findText(self.formula_results[expression.key])
+            if index != -1:
+                self.matrix_selection_combobox.setCurrentIndex(index)
+                return
 
-        display_member = "didv_" + self.active_data_name
-        value_member = corrected_didv_matrix
-        self.matrix_selection_combobox.addItem(display_member, value_member)
-        # ###########################################################
-        # ###########################################################
-        # #### THIS THING HERE ADDS EXTRA MATRIX TO DATA BUFFER #####
-        # ###########################################################
-        # ###########################################################
+        name = data[1].strip() if len(data) > 1 and data[1].strip() else data[0].strip()
+        if self.matrix_selection_combobox.findText(name) != -1:
+            show_error_message("Warning", "Matrix with the name {} already exists".format(name))
+            return
 
-        self.plt_data.append(value_member)
-        self.plt_data_options[display_member] = {"xDer": None,
-                                                 "yDer": None,
-                                                 "xyDer": None,
-                                                 "yxDer": None,
-                                                 "corrected": None,
-                                                 "gauss": None}
-        # self.corrected_data = corrected_matrix
+        self.do_operation({"kind": "formula", "name": name, "expression": data[0]})
+
+    def apply_fourier_filter(self, data):
+        """
+        Filter the active matrix in the frequency domain and add the result to the matrices. Fourier transform of the
+        matrix is cached, so trying out different filters on the same matrix is fast.
+
+        :param data: list: [value 1, value 2, value 3, kind of the filter] emitted by the fourier filter window
+        :return: NoneType
+        """
+        first, second, third, kind = float(data[0]), float(data[1]), float(data[2]), data[3]
+        if kind in ["low_pass", "high_pass"]:
+            params = {"cutoff": first}
+        elif kind == "band_pass":
+            params = {"low": first, "high": second}
+        else:
+            params = {"x": first, "y": second, "width": third}
+
+        source = self.active_data_name
+        values = "_".join("{:g}".format(params[name]) for name in sorted(params))
+        params.update({"kind": kind, "shape": self.pipeline.sources[source].shape})
+        self.do_operation({"kind": "pipeline", "name": "{}_{}_{}".format(kind, source, values), "source": source,
+                           "operations": [("fourier_transform", {}), ("fourier_filter", params)]})
+
+    def apply_background_correction(self, data):
+        """
+        Apply the background correction selected in the background window to the active matrix and add the result to
+        the matrices. Corrections are operations of the processing pipeline, so applying the same correction again
+        reuses the cached result.
+
+        :param data: list: [description of the correction] emitted by the background window
+        :return: NoneType
+        """
+        short_name, operation, params = BACKGROUND_CORRECTIONS[data[-1]]
+        source = self.active_data_name
+        name = "{}_{}".format(short_name, source)
+        index = self.matrix_selection_combobox.findText(name)
+        if index != -1:
+            self.matrix_selection_combobox.setCurrentIndex(index)
+            return
+
+        self.do_operation({"kind": "pipeline", "name": name, "source": source, "operations": [(operation, params)]})
+
+    def scan_resistance(self, resistance):
+        """
+        Display the data corrected for the resistance selected in the resistance scan window. Corrections that are not
+        cached yet are calculated in the background.
+
+        :param resistance: float: series resistance
+        :return: NoneType
+        """
+        if self.resistance_scan is None:
+            return
+        self.prefetch_runner.cancel()
+        if self.resistance_scan.is_cached(resistance):
+            self.processing_runner.cancel()
+            self.show_resistance_scan(self.resistance_scan.get(resistance))
+        else:
+            scan = self.resistance_scan
+            self.processing_runner.submit(lambda cancelled: scan.get(resistance), self.show_resistance_scan)
+
+    def show_resistance_scan(self, data):
+        """
+        Display the corrected data and start calculating corrections for the neighbouring resistances.
+
+        :param data: np.ndarray: corrected matrix
+        :return: NoneType
+        """
+        if self.resistance_scan is None:
+            return
+        self.change_displayed_data_set(self.regrid(data))
+
+        scan = self.resistance_scan
+        resistances = self.resistance_scan_widget.get_neighbouring_resistances()
+        self.prefetch_runner.submit(lambda cancelled: scan.prefetch(resistances, cancelled), lambda calculated: None)
+
+    def commit_resistance_scan(self, data):
+        """
+        Add the data corrected for the resistance selected in the resistance scan window to the matrices.
+
+        :param data: list: [resistance] emitted by the resistance scan window
+        :return: NoneType
+        """
+        resistance = float(data[0])
+        self.correction_resistance = resistance
+        source = self.resistance_scan_source
+        applied_operations = [("series_resistance_correction",
+                               {"resistance": resistance, "unit_correction": self.resistance_scan.unit_correction})]
+        # the scan already calculated the correction, the pipeline reuses it instead of calculating it again
+        self.pipeline.put(source, applied_operations, self.resistance_scan.get(resistance))
+        self.do_operation({"kind": "pipeline", "name": "corrected_{}_R={:g}".format(source, resistance),
+                           "source": source, "operations": applied_operations})
+
+    def stop_resistance_scan(self):
+        """
+        Drop all corrections calculated by the resistance scan and display the active matrix again.
+
+        :return: NoneType
+        """
+        self.processing_runner.cancel()
+        self.prefetch_runner.cancel()
+        self.resistance_scan = None
+        self.update_displayed_data()
 
     def edit_axis_data(self, data):
         """
@@ -1270,6 +2081,7 @@ class Heatmap(BaseGraph):
         :param data: dictionary: contains user input specified in the EditAxisWidget
         :return: NoneType
         """
+        self.axis_edits.append(data)
         for element, sides in data.items():
             if element != "histogram":
                 for side, options in sides.items():
@@ -1410,18 +2222,16 @@ class Heatmap(BaseGraph):
         else:
             pass
 
-    def update_point_label_positions(self):
+    def update_point_label_positions(self, coords_a=None, coords_b=None):
         """
         Method that moves labels for point A and B of the LineROI when one of them (or both) get moved.
 
+        :param coords_a: QPointF: position of the point A, fetched from the ROI if None
+        :param coords_b: QPointF: position of the point B, fetched from the ROI if None
         :return: NoneType
         """
-        point1 = self.line_segment_roi["ROI"].getSceneHandlePositions(0)
-        _, scene_coords = point1
-        coords_a = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
-        point2 = self.line_segment_roi["ROI"].getSceneHandlePositions(1)
-        _, scene_coords = point2
-        coords_b = self.line_segment_roi["ROI"].mapSceneToParent(scene_coords)
+        if coords_a is None or coords_b is None:
+            coords_a, coords_b = self.get_line_trace_end_points()
 
         self.label_a.setPos(coords_a.x(), coords_a.y())
         self.label_b.setPos(coords_b.x(), coords_b.y())
@@ -1478,8 +2288,7 @@ class Heatmap(BaseGraph):
         :param data: array passed trough the signal. Contains user input values.
         :return: NoneType
         """
-        value = float(data[0])
-        self.apply_axis_offset("x", value)
+        self.do_operation({"kind": "offset", "axis": "x", "value": float(data[0])})
         return
 
     def y_axis_offset(self, data):
@@ -1490,8 +2299,7 @@ class Heatmap(BaseGraph):
         :param data: array passed trough the signal. Contains user input values.
         :return: NoneType
         """
-        value = float(data[0])
-        self.apply_axis_offset("y", value)
+        self.do_operation({"kind": "offset", "axis": "y", "value": float(data[0])})
         return
 
     def apply_axis_offset(self, axis, value):
@@ -1506,25 +2314,45 @@ class Heatmap(BaseGraph):
             self.offsets["horizontal"] += value
         else:
             self.offsets["vertical"] += value
-        self.plot_elements["img"].resetTransform()
-        self.plot_elements["img"].translate(self.data_buffer.get_x_axis_values()[0] + self.offsets["horizontal"],
-                                            self.data_buffer.get_y_axis_values()[0][0] + self.offsets["vertical"])
-        (x_scale, y_scale) = self.data_buffer.get_scale()
-        self.plot_elements["img"].scale(x_scale, y_scale)
-        x_min = min(self.data_buffer.get_x_axis_values() + self.offsets["horizontal"])
-        x_max = max(self.data_buffer.get_x_axis_values() + self.offsets["horizontal"])
-        y_min = min(self.data_buffer.get_y_axis_values()[0] + self.offsets["vertical"])
-        y_max = max(self.data_buffer.get_y_axis_values()[0] + self.offsets["vertical"])
-        self.plot_elements["main_subplot"].setLimits(xMin=x_min, xMax=x_max, yMin=y_min, yMax=y_max)
+        self.update_image_placement()
         return
 
+    def get_axis_operations(self, axis):
+        """
+        Operations of the processing pipeline that calculate the displayed values of an axis: the offset of the axis,
+        followed by its transformation (if there is one).
+
+        :param axis: string: "x" or "y"
+        :return: list of (name, params) tuples applied to the "x_axis" or "y_axis" source
+        """
+        offset = self.offsets["horizontal" if axis == "x" else "vertical"]
+        axis_operations = [("offset", {"value": offset})]
+        if self.transformations.get(axis) is not None:
+            axis_operations.append(("transform", {"expression": self.transformations[axis], "variable": axis}))
+        return axis_operations
+
+    def update_image_placement(self):
+        """
+        Position and scale the image and limit the main subplot according to the current offsets and transformations
+        of both axes.
+
+        :return: tuple (np.ndarray, np.ndarray): displayed x and y axis values
+        """
+        x_values = self.pipeline.get("x_axis", self.get_axis_operations("x"))
+        y_values = self.pipeline.get("y_axis", self.get_axis_operations("y"))
+        x_min, x_max, y_min, y_max = self.set_image_transform(self.plot_elements["img"], x_values[0], x_values[-1],
+                                                              y_values[0], y_values[-1])
+        self.plot_elements["main_subplot"].setLimits(xMin=x_min, xMax=x_max, yMin=y_min, yMax=y_max)
+        return x_values, y_values
+
     def transform_x_axis(self, data):
         """
 
         :param data:
         :return:
         """
-        self.apply_transformation(data, "x")
+        self.do_operation({"kind": "transformation", "axis": "x", "expression": data[0],
+                           "previous": self.transformations.get("x")})
 
     def transform_y_axis(self, data):
         """
@@ -1532,54 +2360,30 @@ class Heatmap(BaseGraph):
         :param data:
         :return:
         """
-        self.apply_transformation(data, "y")
+        self.do_operation({"kind": "transformation", "axis": "y", "expression": data[0],
+                           "previous": self.transformations.get("y")})
 
     def apply_transformation(self, expression, axis):
         """
-
-        :param expression:
-        :return:
-        """
-        data = []
-        for index, value in enumerate(self.data_buffer.data[axis]):
-            try:
-                if axis == "x":
-                    result = eval(expression[0], globals(), {axis: self.data_buffer.data[axis][index]})
-                    data.append(result)
-                else:
-                    print(value)
-                    for y_index, val in enumerate(value):
-                        result = eval(expression[0], globals(), {axis: self.data_buffer.data[axis][0][y_index]})
-                        data.append(result)
-                    print(data)
-            except Exception as e:
-                 show_error_message("Task failed successfully !", str(e))
-                 return
-
-        (x_scale, y_scale) = self.data_buffer.get_scale()
-        self.plot_elements["img"].resetTransform()
-        if axis == "x":
-            self.plot_elements["img"].translate(data[0], self.data_buffer.get_y_axis_values()[0][0])
-            x_min = min(self.data_buffer.get_x_axis_values())
-            x_max = max(self.data_buffer.get_x_axis_values())
-            new_x_min = min(data)
-            new_x_max = max(data)
-            y_min = min(self.data_buffer.get_y_axis_values()[0])
-            y_max = max(self.data_buffer.get_y_axis_values()[0])
-            self.plot_elements["img"].scale(((new_x_max - new_x_min) / (x_max - x_min)) * x_scale, y_scale)
-            self.plot_elements["main_subplot"].setLimits(xMin=new_x_min, xMax=new_x_max, yMin=y_min, yMax=y_max)
-        else:
-            self.plot_elements["img"].translate(self.data_buffer.get_x_axis_values()[0], data[0])
-            new_y_min = min(data)
-            new_y_max = max(data)
-            y_min = min(self.data_buffer.get_y_axis_values()[0])
-            y_max = max(self.data_buffer.get_y_axis_values()[0])
-            x_min = min(self.data_buffer.get_x_axis_values())
-            x_max = max(self.data_buffer.get_x_axis_values())
-            self.plot_elements["img"].scale(x_scale, ((new_y_max - new_y_min) / (y_max - y_min)) * y_scale)
-            self.plot_elements["main_subplot"].setLimits(xMin=x_min, xMax=x_max, yMin=new_y_min, yMax=new_y_max)
-
-        return data
+        Apply a formula (for example "x * 1e3" or "log10(y)") to the values of one of the axes (after the offset of the
+        axis is applied). The formula is compiled once and evaluated on the whole axis at the same time, transformed
+        axes are cached in the pipeline.
+
+        :param expression: list: formula as the first element (as returned by the InputData widget), or [None] to
+                                 remove the transformation
+        :param axis: string: "x" or "y", name of the axis, which is also the name of the variable used in the formula
+        :return: np.ndarray: transformed axis values, None if the formula could not be applied
+        """
+        previous = self.transformations.get(axis)
+        self.transformations[axis] = expression[0]
+        try:
+            x_values, y_values = self.update_image_placement()
+        except Exception as e:
+            self.transformations[axis] = previous
+            show_error_message("Task failed successfully !", str(e))
+            return
+
+        return x_values if axis == "x" else y_values
 
 
 def main():
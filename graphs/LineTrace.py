@@ -7,9 +7,6 @@ from PyQt5.QtWidgets import QAction, QApplication, QToolBar, QComboBox
 from PyQt5.QtGui import QIcon, QFont
 from PyQt5.QtCore import Qt
 
-from scipy.optimize import curve_fit
-from scipy import array
-from scipy import exp
 from graphs.BaseGraph import BaseGraph
 from data_handlers.QcodesDataBuffer import QcodesData
 from data_handlers.DataBuffer import DataBuffer
@@ -366,15 +363,17 @@ class LineTrace(BaseGraph):
             :param sigma:
             :return:
             """
-            return a * exp(-(x - x0) ** 2 / (2 * sigma ** 2))
+            return a * np.exp(-(x - x0) ** 2 / (2 * sigma ** 2))
 
         if self.gauss.isChecked():
+            # scipy takes a long time to import, so it is imported only when fitting is actually used
+            from scipy.optimize import curve_fit
             try:
                 x, y = self.get_selection_area()
                 mean = sum(x*y)/sum(y)  # https://en.wikipedia.org/wiki/Weighted_arithmetic_mean
                 sigma = np.sqrt(sum(y * (x - mean) ** 2) / sum(y))
 
-                p0 = array([max(y), mean, sigma])
+                p0 = np.array([max(y), mean, sigma])
                 popt, pcov = curve_fit(gauss, x, y, p0=p0)
                 plot_item = pg.PlotDataItem(x, gauss(x, *popt))
                 plot_item.setPen(255, 0, 0)
@@ -409,12 +408,13 @@ class LineTrace(BaseGraph):
             return np.sin(x * freq + phase) * amplitude + offset
 
         if self.sinus.isChecked():
+            from scipy.optimize import curve_fit
             x, y = self.get_selection_area()
             guess_freq = 1
             guess_amplitude = 3 * np.std(y)/(2**0.5)
             guess_phase = 0
             guess_offset = np.mean(y)
-            p0 = array([guess_freq, guess_amplitude, guess_phase, guess_offset])
+            p0 = np.array([guess_freq, guess_amplitude, guess_phase, guess_offset])
             fit = curve_fit(sin, x, y, p0=p0)
             fit_data = sin(x, *fit[0])
             plot_item = pg.PlotDataItem(x, fit_data)
@@ -442,6 +442,7 @@ class LineTrace(BaseGraph):
             return a*k + b
 
         if self.linear.isChecked():
+            from scipy.optimize import curve_fit
             x, y = self.get_selection_area()
             initial_guess = np.polyfit(x, y, 1)
             fit = curve_fit(linear, x, y, initial_guess)
@@ -0,0 +1,159 @@
+import pyqtgraph as pg
+import numpy as np
+
+from PyQt5.QtWidgets import QAction, QComboBox, QSpinBox, QDoubleSpinBox, QLabel
+from PyQt5.QtGui import QIcon
+
+from graphs.BaseGraph import BaseGraph
+from processing.ArrayStatistics import get_statistics
+
+
+def waterfall_path(data, axis_values, every, offset):
+    """
+    Create coordinates of a waterfall plot: every n-th row of the matrix drawn as a separate trace, shifted up by the
+    offset times the index of the trace. All traces are returned as one set of coordinates with an array that tells
+    which consecutive points are connected, so they can be drawn by a single curve item.
+
+    :param data: np.ndarray: matrix, traces are taken along the second axis (data[i, :])
+    :param axis_values: np.ndarray: values of the horizontal axis of the traces (length data.shape[1])
+    :param every: int: every n-th row is used as a trace
+    :param offset: float: vertical distance between neighbouring traces
+    :return: tuple: (x, y, connect) arrays for PlotCurveItem, connect[i] is 1 if point i is connected to point i + 1
+    """
+    cuts = np.asarray(data[::max(int(every), 1)], dtype=float)
+    number_of_cuts, length = cuts.shape
+
+    x = np.tile(np.asarray(axis_values, dtype=float), number_of_cuts)
+    y = (cuts + offset * np.arange(number_of_cuts)[:, None]).ravel()
+
+    connect = np.ones(x.size, dtype=np.int32)
+    connect[length - 1::length] = 0
+
+    # points with NaN values are not drawn, and the curve is interrupted around them
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        connect[:-1] &= finite[1:]
+        x, y, connect = x[finite], y[finite], connect[finite]
+    return x, y, connect
+
+
+class Waterfall(BaseGraph):
+    """
+    Window that displays many line cuts of a matrix at the same time (waterfall plot). Cuts are taken along one of the
+    axes at every n-th point of the other axis, and are shifted vertically so that they do not overlap.
+
+    """
+
+    def __init__(self, data, x_values, y_values, labels, title="", parent=None):
+        """
+        Inherits: BaseGraph()
+
+        :param data: np.ndarray: matrix, first axis is the x axis
+        :param x_values: np.ndarray: values of the x axis (one per row of the matrix)
+        :param y_values: np.ndarray: values of the y axis (one per column of the matrix)
+        :param labels: dict: {"x": {"name": str, "unit": str}, "y": {...}, "z": {...}} axis labels
+        :param title: string: title of the window
+        :param parent: Heatmap: window that opened this window
+        """
+        super().__init__(parent=parent)
+
+        self.data = data
+        self.axis_values = {"x": np.asarray(x_values), "y": np.asarray(y_values)}
+        self.labels = labels
+        self.title = title
+
+        # range of values of the matrix, default offset between traces is a fraction of it
+        low, high = get_statistics(self.data).get_min_max()
+        self.data_range = high - low if np.isfinite(high - low) and high > low else 1
+
+        self.init_ui()
+
+    def init_ui(self):
+        """
+        Build the user interface of the window.
+
+        :return: NoneType
+        """
+        self.setGeometry(80, 80, 800, 600)
+        self.setWindowTitle("Waterfall " + self.title)
+        self.setWindowIcon(QIcon("img/lineGraph.png"))
+
+        self.plt = pg.GraphicsView()
+        self.setCentralWidget(self.plt)
+        self.plt.setBackground("w")
+
+        self.main_subplot = pg.PlotItem(title=self.title)
+        self.plt.setCentralItem(self.main_subplot)
+        for axis in ["left", "bottom"]:
+            self.main_subplot.getAxis(axis).setPen((60, 60, 60))
+
+        # all traces are drawn by one curve item
+        self.curve = pg.PlotCurveItem(pen=pg.mkPen((60, 60, 60)))
+        self.main_subplot.addItem(self.curve)
+
+        self.init_toolbar()
+        self.update_waterfall()
+
+        self.show()
+
+    def init_toolbar(self):
+        """
+        Create the toolbar with controls that select which cuts are displayed.
+
+        :return: NoneType
+        """
+        self.tools = self.addToolBar("Tools")
+        self.tools.actionTriggered[QAction].connect(self.perform_action)
+
+        # select the axis along which the cuts are taken
+        self.direction_combobox = QComboBox()
+        self.direction_combobox.addItem("Cuts along y", "y")
+        self.direction_combobox.addItem("Cuts along x", "x")
+        self.direction_combobox.currentIndexChanged.connect(self.update_waterfall)
+        self.tools.addWidget(self.direction_combobox)
+
+        # every n-th cut is displayed
+        self.tools.addWidget(QLabel(" Every: "))
+        self.every_spinbox = QSpinBox()
+        self.every_spinbox.setMinimum(1)
+        self.every_spinbox.setMaximum(max(self.data.shape))
+        self.every_spinbox.setValue(max(1, min(self.data.shape) // 50))
+        self.every_spinbox.valueChanged.connect(self.update_waterfall)
+        self.tools.addWidget(self.every_spinbox)
+
+        # distance between neighbouring cuts, as a fraction of the range of the data
+        self.tools.addWidget(QLabel(" Offset: "))
+        self.offset_spinbox = QDoubleSpinBox()
+        self.offset_spinbox.setDecimals(3)
+        self.offset_spinbox.setSingleStep(0.01)
+        self.offset_spinbox.setMaximum(100)
+        self.offset_spinbox.setValue(0.1)
+        self.offset_spinbox.valueChanged.connect(self.update_waterfall)
+        self.tools.addWidget(self.offset_spinbox)
+
+        self.exit_action_btn = QAction(QIcon("img/closeIcon.png"), "Exit", self)
+        self.exit_action_btn.setToolTip("Close this window")
+        self.tools.addAction(self.exit_action_btn)
+
+    def update_waterfall(self):
+        """
+        Extract the cuts selected in the toolbar and draw them.
+
+        :return: NoneType
+        """
+        along = self.direction_combobox.currentData()
+        if along == "y":
+            # cuts at fixed x values (rows of the matrix) as a function of y
+            data, across = self.data, "x"
+        else:
+            data, across = self.data.T, "y"
+
+        x, y, connect = waterfall_path(data, self.axis_values[along], self.every_spinbox.value(),
+                                       self.offset_spinbox.value() * self.data_range)
+        self.curve.setData(x=x, y=y, connect=connect)
+
+        label_style = {'font-size': '10pt'}
+        self.main_subplot.setLabel("bottom", self.labels[along]["name"], self.labels[along]["unit"], **label_style)
+        self.main_subplot.setLabel("left", self.labels["z"]["name"], self.labels["z"]["unit"], **label_style)
+        self.main_subplot.setTitle("{} (cuts at every {}. {} value)".format(self.title, self.every_spinbox.value(),
+                                                                            self.labels[across]["name"]))
@@ -1,21 +1,27 @@
+import time
+
+# time at which the program started, used to measure how long it takes until the main window is displayed. Needs to be
+# taken before importing anything else so that the import time is included
+STARTUP_TIME = time.perf_counter()
+
 from PyQt5.QtWidgets import QApplication, QMainWindow, QGridLayout, QDesktopWidget, QPushButton, QWidget, QTableWidget,\
     QTextBrowser, QAction, QMenu, QFileDialog, QHeaderView, QTableWidgetItem, QSizePolicy, QVBoxLayout, QMessageBox
 from PyQt5 import QtCore, QtGui
 
-from data_handlers import LabberDataBuffer, QcodesDataBuffer, QtLabDataBuffer, MatrixFileDataBuffer, QttDataBuffer, VipDataBuffer
+from data_handlers.SessionSnapshot import SnapshotData, save_session, load_session
 from widgets import ProgressBarWidget
-from widgets.BufferExplorer import BufferExplorer
-from graphs.Heatmap import Heatmap
-from graphs.LineTrace import LineTrace
 from ThreadWorker import Worker
-from helpers import get_location_basename
+from helpers import get_location_basename, show_error_message
 from debug.errors import ErrorHandler
 
-import pyqtgraph as pg
-
+import json
 import sys
 import os
 
+# NOTE: Data buffers, graph windows and pyqtgraph (and through them pandas, scipy, ...) are imported inside of the
+# methods that use them. Most of them are not needed to display the main window, and importing all of them at the start
+# takes a few seconds.
+
 
 def trap_exc_during_debug(*args):
     # when app raises uncaught exception, print info
@@ -51,6 +57,10 @@ class MainWindow(QMainWindow):
         # dict of data sets that have been loaded into the main program
         self.datasets = {}
 
+        # dict of heatmap windows opened from the main program (name of the data set: Heatmap window), used to save
+        # the state of the windows when saving a session
+        self.heatmaps = {}
+
         self.thread_pool = QtCore.QThreadPool()
 
         # call to a method that builds user interface
@@ -109,26 +119,17 @@ class MainWindow(QMainWindow):
         self.selected_dataset_textbrowser.setMinimumSize(600, 200)
         self.selected_dataset_textbrowser.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
-        print("Building mini plot . . .")
-        # miniature plot that displays data of the selected buffer
-        preview_plt = pg.GraphicsView()
-        mini_plot = pg.GraphicsLayout()
-        main_subplot = mini_plot.addPlot()
-        for axis in ["left", "bottom"]:
-            ax = main_subplot.getAxis(axis)
-            ax.setPen((60, 60, 60))
-
-        preview_plt.setCentralItem(mini_plot)
-        preview_plt.setBackground('w')
-
-        self.mini_plot_items = {"main_subplot": main_subplot}
+        # miniature plot that displays data of the selected buffer, it is built the first time that it is needed (see
+        # init_mini_plot) to avoid importing pyqtgraph before showing the main window
+        self.preview_layout = QVBoxLayout()
+        self.mini_plot_items = None
 
         self.loading_bars_layout = QVBoxLayout()
 
         # position the elements within the grid layout
         self.grid_layout.addWidget(self.opened_datasets_tablewidget, 0, 0, 1, 3)
         self.grid_layout.addWidget(self.selected_dataset_textbrowser, 1, 0, 3, 1)
-        self.grid_layout.addWidget(preview_plt, 1, 1, 1, 2)
+        self.grid_layout.addLayout(self.preview_layout, 1, 1, 1, 2)
         self.grid_layout.addWidget(self.add_to_list_btn, 2, 1, 1, 2)
         self.grid_layout.addWidget(self.open_dataset_btn, 3, 1, 1, 1)
         self.grid_layout.addWidget(self.exit_btn, 3, 2, 1, 1)
@@ -143,6 +144,29 @@ class MainWindow(QMainWindow):
         # set central widget to be THE CENTRAL WIDGET (QMainWindow predefined element)
         self.setCentralWidget(self.centralWidget)
 
+    def init_mini_plot(self):
+        """
+        Build the miniature plot that displays the data of the selected buffer. Called the first time when some data
+        needs to be displayed in it.
+
+        :return: NoneType
+        """
+        import pyqtgraph as pg
+
+        print("Building mini plot . . .")
+        preview_plt = pg.GraphicsView()
+        mini_plot = pg.GraphicsLayout()
+        main_subplot = mini_plot.addPlot()
+        for axis in ["left", "bottom"]:
+            ax = main_subplot.getAxis(axis)
+            ax.setPen((60, 60, 60))
+
+        preview_plt.setCentralItem(mini_plot)
+        preview_plt.setBackground('w')
+        self.preview_layout.addWidget(preview_plt)
+
+        self.mini_plot_items = {"main_subplot": main_subplot}
+
     def init_manu_bar(self):
         """
         Initialize menu bar of main window.
@@ -177,6 +201,16 @@ class MainWindow(QMainWindow):
         open_folder_explorer = QAction("&Folder explorer", self)
         open_folder_explorer.triggered.connect(self.open_folder_explorer)
 
+        # actions that save all opened data sets (and what was done with them) to a file, and load them back
+        save_session_action = QAction("&Save session", self)
+        save_session_action.setShortcut("Ctrl+S")
+        save_session_action.setStatusTip("Save all opened data sets to a session file")
+        save_session_action.triggered.connect(self.save_session_dialog)
+        load_session_action = QAction("&Load session", self)
+        load_session_action.setShortcut("Ctrl+L")
+        load_session_action.setStatusTip("Restore data sets from a session file")
+        load_session_action.triggered.connect(self.load_session_dialog)
+
         # create menu bar
         menu_bar = self.menuBar()
         # add submenu
@@ -185,6 +219,9 @@ class MainWindow(QMainWindow):
         file_menu.addAction(open_folder_explorer)
         file_menu.addMenu(open_action)
         file_menu.addSeparator()
+        file_menu.addAction(save_session_action)
+        file_menu.addAction(load_session_action)
+        file_menu.addSeparator()
         file_menu.addAction(exit_action)
 
     def exit(self):
@@ -233,8 +270,13 @@ class MainWindow(QMainWindow):
             name = get_location_basename(os.path.dirname(file))
             with open(file, "r") as current_file:
                 if file.lower().endswith(".hdf5"):
+                    from data_handlers.LabberDataBuffer import LabberData
                     type_item = QTableWidgetItem("Labber")
-                    buffer = LabberDataBuffer.LabberData(file)
+                    try:
+                        buffer = LabberData(file)
+                    except ImportError as e:
+                        show_error_message("Warning", str(e))
+                        continue
                     worker = Worker(buffer.prepare_data)
                     progress_bar = self.add_progress_widget(buffer)
                     buffer.progress.connect(lambda progress: self.get_progress(progress, progress_bar))
@@ -244,8 +286,9 @@ class MainWindow(QMainWindow):
                                                                                      type_item))
                     self.thread_pool.start(worker)
                 elif file.lower().endswith(".txt"):
+                    from data_handlers.VipDataBuffer import VipData
                     type_item = QTableWidgetItem("VIP")
-                    buffer = VipDataBuffer.VipData(file)
+                    buffer = VipData(file)
                     worker = Worker(buffer.prepare_data)
                     progress_bar = self.add_progress_widget(buffer)
                     buffer.progress.connect(lambda progress: self.get_progress(progress, progress_bar))
@@ -257,8 +300,9 @@ class MainWindow(QMainWindow):
                     for i, line in enumerate(current_file):
                         if i == 2:
                             if line.strip(" \n") == "":
+                                from data_handlers.QtLabDataBuffer import QtLabData
                                 type_item = QTableWidgetItem("QtLab")
-                                buffer = QtLabDataBuffer.QtLabData(file)
+                                buffer = QtLabData(file)
                                 worker = Worker(buffer.prepare_data)
                             elif line.startswith("#"):
 
@@ -273,16 +317,19 @@ class MainWindow(QMainWindow):
                                 msg_box.exec_()
 
                                 if msg_box.clickedButton() == qc:
+                                    from data_handlers.QcodesDataBuffer import QcodesData
                                     type_item = QTableWidgetItem("QCoDeS")
-                                    buffer = QcodesDataBuffer.QcodesData(file)
+                                    buffer = QcodesData(file)
                                 elif msg_box.clickedButton() == qtt:
+                                    from data_handlers.QttDataBuffer import QttData
                                     type_item = QTableWidgetItem("Qtt")
-                                    buffer = QttDataBuffer.QttData(file)
+                                    buffer = QttData(file)
 
                                 worker = Worker(buffer.prepare_data)
                             else:
+                                from data_handlers.MatrixFileDataBuffer import MatrixData
                                 type_item = QTableWidgetItem("Matrix")
-                                buffer = MatrixFileDataBuffer.MatrixData(file)
+                                buffer = MatrixData(file)
                                 worker = Worker(buffer.prepare_data)
 
                             progress_bar = self.add_progress_widget(buffer)
@@ -385,9 +432,12 @@ class MainWindow(QMainWindow):
             dataset = self.datasets[name]
 
             if dataset.get_number_of_dimension() == 3:
+                from graphs.Heatmap import Heatmap
                 self.hm = Heatmap(dataset, self)
                 self.hm.show()
+                self.heatmaps[name] = self.hm
             else:
+                from graphs.LineTrace import LineTrace
                 self.lt = LineTrace(dataset, None)
                 self.lt.show()
 
@@ -431,9 +481,14 @@ class MainWindow(QMainWindow):
 
         :return: NoneType
         """
+        import pyqtgraph as pg
+        from custom_pg.ImageItem import ImageItem
+
         print("Updating mini graph . . .")
         row = self.opened_datasets_tablewidget.currentRow()
         if row != -1:
+            if self.mini_plot_items is None:
+                self.init_mini_plot()
             item = self.opened_datasets_tablewidget.item(row, 1)
             location = item.text()
             name = get_location_basename(os.path.dirname(location))
@@ -449,11 +504,17 @@ class MainWindow(QMainWindow):
                 print(" Drawing 3d plot . . .")
                 self.mini_plot_items["main_subplot"].clear()
                 print(" Fetching image data . . .")
-                img = pg.ImageItem()
+                # custom ImageItem takes levels and the histogram from the statistics cached for the matrix, so
+                # selecting the same data set again does not scan the matrix
+                img = ImageItem()
                 img.setImage(dataset.get_matrix(index=0))
                 (x_scale, y_scale) = dataset.get_scale()
-                img.transform().translate(dataset.get_x_axis_values()[0], dataset.get_y_axis_values()[0][0])
-                img.transform().scale(x_scale, y_scale)
+                # transform() returns a copy, the new transform has to be set on the image
+                transform = QtGui.QTransform()
+                transform.translate(dataset.get_x_axis_values()[0] - x_scale / 2,
+                                    dataset.get_y_axis_values()[0][0] - y_scale / 2)
+                transform.scale(x_scale, y_scale)
+                img.setTransform(transform)
                 print(" Drawing histogram . . .")
                 histogram = pg.HistogramLUTItem()
                 histogram.setImageItem(img)
@@ -498,6 +559,75 @@ class MainWindow(QMainWindow):
                 (dataset.get_y_axis_values()[0][-1] - dataset.get_y_axis_values()[0][0]) / len(dataset.get_y_axis_values()[0]) - 1))
             self.selected_dataset_textbrowser.append("Matrix:\n {}".format(dataset.textual_data_representation()))
 
+    def save_session_dialog(self):
+        """
+        Opens a file dialog for selecting the location of the session file, and saves the current session to it.
+
+        :return: NoneType
+        """
+        location, _ = QFileDialog.getSaveFileName(self, "Save session", "", "Graphsaros session (*.gss)")
+        if location:
+            self.save_session(location)
+
+    def load_session_dialog(self):
+        """
+        Opens a file dialog for selecting a session file, and restores the session saved in it.
+
+        :return: NoneType
+        """
+        location, _ = QFileDialog.getOpenFileName(self, "Load session", "", "Graphsaros session (*.gss)")
+        if location:
+            try:
+                self.load_session(location)
+            except ValueError as e:
+                show_error_message("Warning", str(e))
+
+    def save_session(self, location):
+        """
+        Saves all data sets loaded in the main window, together with matrices derived from them, offsets, axis
+        transformations and axis edits done in opened heatmap windows, to one binary file.
+
+        :param location: string: location of the session file
+        :return: NoneType
+        """
+        print("Saving session . . .")
+        datasets = []
+        for name, buffer in self.datasets.items():
+            if buffer.is_data_ready():
+                datasets.append(buffer.get_session_state())
+
+        heatmaps = []
+        for name, heatmap in self.heatmaps.items():
+            if heatmap.isVisible() and name in self.datasets:
+                heatmaps.append({"dataset": name, "state": heatmap.get_session_state()})
+
+        save_session(location, {"datasets": datasets, "heatmaps": heatmaps})
+
+    def load_session(self, location):
+        """
+        Restores the session saved by save_session. Arrays are memory mapped from the session file so none of the
+        original files need to be opened or parsed again.
+
+        :param location: string: location of the session file
+        :return: NoneType
+        """
+        from graphs.Heatmap import Heatmap
+
+        print("Loading session . . .")
+        state = load_session(location)
+        for buffer_state in state["datasets"]:
+            buffer = SnapshotData(buffer_state)
+            name = get_location_basename(os.path.dirname(buffer.get_location()))
+            self.datasets[name] = buffer
+            self.add_buffer_to_table(buffer, QTableWidgetItem(buffer.string_type))
+
+        for heatmap_state in state["heatmaps"]:
+            name = heatmap_state["dataset"]
+            self.hm = Heatmap(self.datasets[name], self)
+            self.hm.restore_session_state(heatmap_state["state"])
+            self.hm.show()
+            self.heatmaps[name] = self.hm
+
     def open_folder_explorer(self):
         """
         Method that opens a file explorer widget and lets you select one folder from it. It instantiates a
@@ -507,6 +637,7 @@ class MainWindow(QMainWindow):
         """
         folder = str(QFileDialog.getExistingDirectory(self, "Select Directory"))
         if folder:
+            from widgets.BufferExplorer import BufferExplorer
             self.be = BufferExplorer(folder)
             self.be.submitted.connect(self.get_buffers_from_signal)
             self.be.add_requested.connect(self.get_buffers_from_signal)
@@ -525,10 +656,27 @@ class MainWindow(QMainWindow):
             self.datasets[name] = buffer
 
 
+def get_startup_report():
+    """
+    Collects data about the startup of the application: time from the start of the program until the main window was
+    displayed, and a list of modules that were imported up to that point. Used by debug/startup_report.py which runs the
+    program with "--startup-report" argument and combines this with the import time breakdown reported by python.
+
+    :return: dict: {"time_to_first_window": float (seconds), "modules": list of imported module names}
+    """
+    return {"time_to_first_window": time.perf_counter() - STARTUP_TIME,
+            "modules": sorted(sys.modules)}
+
+
 def main():
 
     app = QApplication(sys.argv)
     ex = MainWindow()
+    if "--startup-report" in sys.argv:
+        # process pending events so that the window actually gets drawn before measuring the time
+        app.processEvents()
+        print("STARTUP_REPORT " + json.dumps(get_startup_report()))
+        return
     sys.exit(app.exec_())
 
 
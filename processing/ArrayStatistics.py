@@ -0,0 +1,170 @@
+from math import ceil
+import threading
+import weakref
+
+import numpy as np
+
+
+# Maximum number of values used to calculate percentiles and histograms, larger arrays are subsampled
+MAX_SAMPLES = 2 ** 16
+
+# Number of bins of the histogram (same as the number pyqtgraph uses for histograms of float images)
+HISTOGRAM_BINS = 500
+
+
+class ArrayStatistics:
+    """
+    Statistics of an array (minimum, maximum, mean, percentiles, histogram), calculated the first time they are needed
+    and then kept, so histograms, color bars and auto levels that display the same array never scan it again.
+
+    Minimum, maximum and mean are calculated from all values. Percentiles and the histogram are calculated from a
+    strided subsample of at most max_samples values, which is plenty for displaying them.
+
+    Statistics are only valid as long as the array does not change, arrays displayed in Graphsaros are never modified
+    after they are displayed (new results are always new arrays).
+
+    """
+
+    def __init__(self, data, max_samples=MAX_SAMPLES):
+        """
+        :param data: np.ndarray: array
+        :param max_samples: int: maximum number of values used to calculate percentiles and the histogram
+        """
+        # statistics are kept as long as the array exists, so they must not keep the array alive
+        try:
+            self.reference = weakref.ref(data)
+        except TypeError:
+            self.reference = lambda: data
+        self.max_samples = max_samples
+
+        self.min_max = None
+        self.mean = None
+
+        # finite values of the subsample, sorted
+        self.sorted_sample = None
+
+        # {number of bins: (bin edges, counts)}
+        self.histograms = {}
+
+        self.lock = threading.RLock()
+
+    @property
+    def data(self):
+        return self.reference()
+
+    def get_min_max(self):
+        """
+        :return: tuple (float, float): minimum and maximum of the finite values of the array, ignoring NaN and infinite
+                 values (NaN if there are no finite values)
+        """
+        with self.lock:
+            if self.min_max is None:
+                low, high = np.min(self.data), np.max(self.data)
+                if not (np.isfinite(low) and np.isfinite(high)):
+                    # slower masked versions are only needed if there are NaN or infinite values
+                    finite = self.data[np.isfinite(self.data)]
+                    low, high = (finite.min(), finite.max()) if finite.size else (np.nan, np.nan)
+                self.min_max = (float(low), float(high))
+            return self.min_max
+
+    def get_mean(self):
+        """
+        :return: float: mean of the array, ignoring NaN values
+        """
+        with self.lock:
+            if self.mean is None:
+                finite = np.isfinite(self.data)
+                self.mean = float(self.data[finite].mean()) if finite.any() else np.nan
+            return self.mean
+
+    def get_sample(self):
+        """
+        Get finite values of the array subsampled by taking every n-th point along each axis, sorted.
+
+        :return: np.ndarray: sorted values (1D)
+        """
+        with self.lock:
+            if self.sorted_sample is None:
+                data = np.asarray(self.data)
+                if data.size > self.max_samples:
+                    dimensions = min(data.ndim, 2)
+                    step = int(ceil((data.size / self.max_samples) ** (1 / dimensions)))
+                    data = data[(slice(None, None, step),) * dimensions]
+                sample = data.ravel()
+                self.sorted_sample = np.sort(sample[np.isfinite(sample)])
+            return self.sorted_sample
+
+    def get_percentiles(self, *percentiles):
+        """
+        Approximate percentiles of the array, calculated from the sorted subsample.
+
+        :param percentiles: floats: percentiles (0 - 100)
+        :return: list of floats: values of the percentiles (NaN if the array has no finite values)
+        """
+        sample = self.get_sample()
+        if sample.size == 0:
+            return [np.nan for _ in percentiles]
+        return [float(value) for value in np.percentile(sample, percentiles)]
+
+    def get_histogram(self, bins=HISTOGRAM_BINS):
+        """
+        Histogram of the values of the array (calculated from the subsample) with evenly spaced bins from the minimum
+        to the maximum of the array.
+
+        :param bins: int: number of bins
+        :return: tuple (np.ndarray, np.ndarray): left edges of the bins and number of values in each bin, or
+                 (None, None) if the array has no finite values
+        """
+        with self.lock:
+            if bins not in self.histograms:
+                low, high = self.get_min_max()
+                if np.isnan(low) or np.isnan(high):
+                    return None, None
+                if low == high:
+                    high = low + 1
+                counts, edges = np.histogram(self.get_sample(), bins=np.linspace(low, high, bins))
+                self.histograms[bins] = (edges[:-1], counts)
+            return self.histograms[bins]
+
+
+# {id of the array: (weak reference to the array, ArrayStatistics)}, entries are removed when arrays are deleted
+_statistics = {}
+_statistics_lock = threading.RLock()
+
+
+def get_statistics(data):
+    """
+    Get statistics of the array. Statistics are attached to the array object, so they are calculated only once for
+    every array no matter how many times and where it is displayed.
+
+    :param data: np.ndarray: array
+    :return: ArrayStatistics: statistics of the array
+    """
+    key = id(data)
+    with _statistics_lock:
+        entry = _statistics.get(key)
+        if entry is not None and entry[0]() is data:
+            return entry[1]
+
+        statistics = ArrayStatistics(data)
+        try:
+            reference = weakref.ref(data, lambda reference, key=key: _forget(key, reference))
+        except TypeError:
+            # objects that can not be referenced weakly can not be cached
+            return statistics
+        _statistics[key] = (reference, statistics)
+        return statistics
+
+
+def _forget(key, reference):
+    """
+    Remove statistics of a deleted array.
+
+    :param key: int: id of the deleted array
+    :param reference: weakref.ref: reference to the deleted array
+    :return: NoneType
+    """
+    with _statistics_lock:
+        entry = _statistics.get(key)
+        if entry is not None and entry[0] is reference:
+            del _statistics[key]
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+from PyQt5.QtGui import QPainterPath
+
+from processing import operations
+
+
+# Maximum number of iso curves (one per level) kept in memory
+MAX_CACHED_PATHS = 64
+
+# Levels are rounded to this fraction of the range of the data, so dragging the iso line back and forth over the same
+# values reuses already calculated curves
+LEVEL_STEPS = 1024
+
+
+def iso_segments(data, level):
+    """
+    Find the iso curve of the matrix by marching squares, vectorized over all cells of the grid. The curve is returned
+    as a set of line segments that are not joined into longer lines.
+
+    Points of the matrix are the corners of the cells. For every edge of a cell whose corners are on the different
+    sides of the level, the point where the curve crosses the edge is linearly interpolated. Cells with two crossings
+    have one segment, saddle cells (four crossings) have two, paired according to the mean value of the cell.
+
+    :param data: np.ndarray: matrix
+    :param level: float: value of the iso curve
+    :return: tuple (np.ndarray, np.ndarray): x and y (matrix index) coordinates of the segments, shape (N, 2), with
+             the first and the last point of every segment
+    """
+    data = np.asarray(data, dtype=float)
+    if data.ndim != 2 or min(data.shape) < 2:
+        return np.empty((0, 2)), np.empty((0, 2))
+    above = data >= level
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # crossings on edges along the first axis ((i, j) - (i + 1, j)) and along the second axis ((i, j) - (i, j + 1))
+        t_first = (level - data[:-1, :]) / (data[1:, :] - data[:-1, :])
+        t_second = (level - data[:, :-1]) / (data[:, 1:] - data[:, :-1])
+    crosses_first = above[:-1, :] != above[1:, :]
+    crosses_second = above[:, :-1] != above[:, 1:]
+
+    rows, columns = data.shape[0] - 1, data.shape[1] - 1
+    i, j = np.meshgrid(np.arange(rows), np.arange(columns), indexing="ij")
+    # edges of every cell in the order: bottom (j), right (i + 1), top (j + 1), left (i)
+    x = np.stack([i + t_first[:, :-1], i + 1.0, i + t_first[:, 1:], i + 0.0], axis=-1)
+    y = np.stack([j + 0.0, j + t_second[1:, :], j + 1.0, j + t_second[:-1, :]], axis=-1)
+    crosses = np.stack([crosses_first[:, :-1], crosses_second[1:, :], crosses_first[:, 1:], crosses_second[:-1, :]],
+                       axis=-1)
+    count = crosses.sum(axis=-1)
+
+    segments_x, segments_y = [], []
+
+    # cells crossed by a single segment, it connects the two crossed edges
+    single = count == 2
+    edges = np.argsort(~crosses[single], axis=-1, kind="stable")[:, :2]
+    segments_x.append(np.take_along_axis(x[single], edges, axis=-1))
+    segments_y.append(np.take_along_axis(y[single], edges, axis=-1))
+
+    # saddle cells, if the center is on the same side as the bottom left corner the segments cut off the other two
+    # corners (bottom-right and top-left), otherwise they cut off the bottom-left and top-right corners
+    saddle = count == 4
+    if saddle.any():
+        center = (data[:-1, :-1] + data[1:, :-1] + data[:-1, 1:] + data[1:, 1:])[saddle] / 4
+        same = (center >= level) == above[:-1, :-1][saddle]
+        pairs = np.where(same[:, None, None], [[0, 1], [2, 3]], [[3, 0], [1, 2]])
+        for pair in range(2):
+            segments_x.append(np.take_along_axis(x[saddle], pairs[:, pair], axis=-1))
+            segments_y.append(np.take_along_axis(y[saddle], pairs[:, pair], axis=-1))
+
+    segments_x, segments_y = np.concatenate(segments_x), np.concatenate(segments_y)
+    finite = np.isfinite(segments_x).all(axis=-1) & np.isfinite(segments_y).all(axis=-1)
+    return segments_x[finite], segments_y[finite]
+
+
+def segments_to_path(x, y):
+    """
+    Create a path that draws line segments.
+
+    :param x: np.ndarray: x coordinates of the first and the last point of every segment, shape (N, 2)
+    :param y: np.ndarray: y coordinates of the first and the last point of every segment, shape (N, 2)
+    :return: QPainterPath: path
+    """
+    import pyqtgraph as pg
+
+    if len(x) == 0:
+        return QPainterPath()
+    # connect every first point of a segment to the next point, but not the last point to the next segment
+    connect = np.zeros(x.size, dtype=np.int32)
+    connect[::2] = 1
+    return pg.arrayToQPath(x.ravel(), y.ravel(), connect=connect)
+
+
+class IsoCurve:
+    """
+    Calculates iso curves (lines that connect points with the same value) of a matrix. Curves are calculated on a
+    decimated and smoothened (box filter) version of the matrix, so that calculation is fast and the curve has about as
+    much detail as can be seen on the screen. Curves for recently used levels are cached.
+
+    Paths are in image coordinates of the full matrix (point (i, j) is the corner of the pixel that displays
+    matrix[i, j]), so they can be drawn by an item that is a child of the image item that displays the matrix.
+
+    Methods can be called from a worker thread.
+
+    """
+
+    def __init__(self, data, factor=1, smoothing=2, max_paths=MAX_CACHED_PATHS):
+        """
+        :param data: np.ndarray: matrix
+        :param factor: int: curves are calculated on every factor-th point of the matrix along both axes
+        :param smoothing: int: number of neighbouring points (of the full matrix) averaged by the box filter applied
+                               before calculating the curves
+        :param max_paths: int: maximum number of cached curves
+        """
+        self.data = data
+        self.factor = max(int(factor), 1)
+        self.smoothing = smoothing
+        self.max_paths = max_paths
+
+        # decimated and smoothened matrix, calculated when the first curve is requested
+        self.grid = None
+        self.step = None
+
+        # {rounded level: QPainterPath}, ordered from least recently used to most recently used
+        self.paths = OrderedDict()
+
+        self.lock = threading.RLock()
+
+    def get_grid(self):
+        """
+        Get the decimated and smoothened matrix on which the curves are calculated.
+
+        :return: np.ndarray: matrix
+        """
+        with self.lock:
+            if self.grid is None:
+                grid = operations.decimate(np.asarray(self.data, dtype=float), self.factor)
+                window = int(round(self.smoothing / self.factor))
+                if window > 0:
+                    grid = operations.naive_smoothing(grid, window, window)
+                finite = grid[np.isfinite(grid)]
+                span = finite.max() - finite.min() if finite.size else 0
+                self.step = span / LEVEL_STEPS if span > 0 else None
+                self.grid = grid
+            return self.grid
+
+    def round_level(self, level):
+        """
+        Round the level to the closest of the levels for which curves are cached.
+
+        :param level: float: value of the iso curve
+        :return: float: rounded level
+        """
+        self.get_grid()
+        if self.step is None:
+            return float(level)
+        return round(level / self.step) * self.step
+
+    def is_cached(self, level):
+        """
+        :param level: float: value of the iso curve
+        :return: bool: True if the curve for this level is already calculated
+        """
+        with self.lock:
+            return self.grid is not None and self.round_level(level) in self.paths
+
+    def get_path(self, level, cancelled=None):
+        """
+        Get the curve for the level, from the cache or by calculating it.
+
+        :param level: float: value of the iso curve
+        :param cancelled: threading.Event: if set before the calculation is finished, None is returned
+        :return: QPainterPath: the curve, or None if cancelled
+        """
+        with self.lock:
+            key = self.round_level(level)
+            if key in self.paths:
+                self.paths.move_to_end(key)
+                return self.paths[key]
+            grid = self.grid
+
+        x, y = iso_segments(grid, key)
+        if cancelled is not None and cancelled.is_set():
+            return None
+
+        path = segments_to_path(x * self.factor + 0.5, y * self.factor + 0.5)
+
+        with self.lock:
+            self.paths[key] = path
+            while len(self.paths) > self.max_paths:
+                self.paths.popitem(last=False)
+        return path
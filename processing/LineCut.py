@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class LineCutSampler:
+    """
+    Samples values of a matrix along a line (line cut). Positions of the samples and interpolation weights are
+    calculated only when the line moves, sampling itself is a few vectorized gathers from the matrix, so the same line
+    can be quickly sampled from many matrices, and moving the line over large matrices stays responsive.
+
+    Coordinates used by the sampler are image coordinates: point (i, j) is the corner of the pixel that displays
+    matrix[i, j], centers of the pixels are at (i + 0.5, j + 0.5).
+
+    """
+
+    def __init__(self):
+        # (start, end, shape, width) for which the coordinates were calculated
+        self.geometry = None
+
+        # for both axes: indices of the lower and upper neighbour of every sample, and weights of the upper neighbours
+        self.indices = None
+        self.weights = None
+
+        # for wide cuts: which perpendicular samples are inside of the matrix, and how many of them there are for every
+        # point of the cut
+        self.inside = None
+        self.counts = None
+
+        # number of points on the line
+        self.number_of_points = 0
+
+    def set_line(self, start, end, shape, width=1):
+        """
+        Calculate sample positions for a line from start to end. One sample is taken per pixel of the length of the
+        line (same as pyqtgraph getArrayRegion). Nothing is recalculated if the line did not change.
+
+        If width is larger then 1, every point of the cut is the average of width samples taken on a line perpendicular
+        to the cut, spaced one pixel apart and centered on the cut. Samples that fall outside of the matrix are left out
+        of the average (points of the cut with no samples inside of the matrix are NaN).
+
+        :param start: tuple (x, y): starting point of the line in image coordinates
+        :param end: tuple (x, y): ending point of the line in image coordinates
+        :param shape: tuple: shape of the matrix that will be sampled
+        :param width: int: number of perpendicular samples averaged for every point of the cut
+        :return: NoneType
+        """
+        width = max(int(width), 1)
+        geometry = (tuple(start), tuple(end), tuple(shape[:2]), width)
+        if geometry == self.geometry:
+            return
+        self.geometry = geometry
+
+        start = np.asarray(start, dtype=float)
+        end = np.asarray(end, dtype=float)
+        length = np.hypot(*(end - start))
+        self.number_of_points = max(int(length), 1)
+
+        fraction = np.linspace(0, 1, self.number_of_points)
+        # subtract 0.5 to go from image coordinates to indices of the pixels that have their centers there
+        coordinates = start[:, None] + (end - start)[:, None] * fraction[None, :] - 0.5
+
+        if width > 1:
+            direction = (end - start) / length if length else np.array([1.0, 0.0])
+            normal = np.array([-direction[1], direction[0]])
+            offsets = np.linspace(-(width - 1) / 2, (width - 1) / 2, width)
+            # shape (2, width, number_of_points): every row is the cut moved by one offset along the normal
+            coordinates = coordinates[:, None, :] + normal[:, None, None] * offsets[None, :, None]
+
+        self.set_coordinates(coordinates, shape)
+
+    def set_coordinates(self, coordinates, shape):
+        """
+        Precompute indices and weights for bilinear interpolation at the coordinates.
+
+        :param coordinates: np.ndarray: array with shape (2, ...), fractional matrix indices along both axes
+        :param shape: tuple: shape of the matrix that will be sampled
+        :return: NoneType
+        """
+        indices = []
+        weights = []
+        inside = np.ones(coordinates.shape[1:], dtype=bool)
+        for axis in range(2):
+            size = shape[axis]
+            # pixels extend half a pixel beyond their centers
+            inside &= (coordinates[axis] >= -0.5) & (coordinates[axis] <= size - 0.5)
+            position = np.clip(coordinates[axis], 0, size - 1)
+            lower = np.minimum(np.floor(position).astype(np.intp), max(size - 2, 0))
+            weights.append(position - lower if size > 1 else np.zeros_like(position))
+            indices.append((lower, np.minimum(lower + 1, size - 1)))
+        self.indices = indices
+        self.weights = weights
+        if coordinates.ndim > 2:
+            self.inside = inside
+            self.counts = inside.sum(axis=0)
+        else:
+            self.inside = self.counts = None
+
+    def sample(self, data):
+        """
+        Bilinear interpolation of the data at the precomputed positions.
+
+        :param data: np.ndarray: matrix with the shape passed to set_line
+        :return: np.ndarray: sampled values (averaged over the width of the cut)
+        """
+        (i, i_next), (j, j_next) = self.indices
+        wi, wj = self.weights
+
+        top = data[i, j] * (1 - wj)
+        top += data[i, j_next] * wj
+        bottom = data[i_next, j] * (1 - wj)
+        bottom += data[i_next, j_next] * wj
+        top *= 1 - wi
+        bottom *= wi
+        top += bottom
+        if top.ndim > 1:
+            # samples outside of the matrix are clipped to its edge, count them out instead of weighting the edge more
+            top[~self.inside] = 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return top.sum(axis=0) / self.counts
+        return top
@@ -0,0 +1,71 @@
+from collections import deque
+
+
+# Maximum number of operations that can be undone
+MAX_HISTORY_LENGTH = 100
+
+
+class OperationHistory:
+    """
+    Undo and redo history of the operations done in a Heatmap window (derived matrices, offsets, transformations).
+
+    Operations are stored as recipes: dictionaries with the kind of the operation, its parameters and names of the
+    matrices it uses, but never the resulting arrays. Undoing an operation throws its result away, redoing it
+    calculates the result again from the recipe (usually from intermediate results that are still in the cache of the
+    processing pipeline). This way memory used by the history does not grow with the number of operations.
+
+    """
+
+    def __init__(self, max_length=MAX_HISTORY_LENGTH):
+        """
+        :param max_length: int: maximum number of operations that can be undone, oldest ones are forgotten
+        """
+        # recipes of operations that were done, most recent one last
+        self.done = deque(maxlen=max_length)
+
+        # recipes of operations that were undone, most recently undone one last
+        self.undone = []
+
+    def record(self, recipe):
+        """
+        Add a new operation to the history. Operations that were undone can not be redone anymore.
+
+        :param recipe: dict: description of the operation, contains at least its "kind"
+        :return: NoneType
+        """
+        self.done.append(recipe)
+        self.undone.clear()
+
+    def can_undo(self):
+        return len(self.done) > 0
+
+    def can_redo(self):
+        return len(self.undone) > 0
+
+    def undo(self):
+        """
+        Move the most recent operation to the list of undone operations.
+
+        :return: dict: recipe of the operation that has to be undone, or None if there is nothing to undo
+        """
+        if not self.done:
+            return None
+        recipe = self.done.pop()
+        self.undone.append(recipe)
+        return recipe
+
+    def redo(self):
+        """
+        Move the most recently undone operation back to the list of done operations.
+
+        :return: dict: recipe of the operation that has to be done again, or None if there is nothing to redo
+        """
+        if not self.undone:
+            return None
+        recipe = self.undone.pop()
+        self.done.append(recipe)
+        return recipe
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
@@ -0,0 +1,234 @@
+from collections import OrderedDict
+import threading
+
+
+# Default amount of memory (in bytes) that the cache of the processing pipeline is allowed to use
+DEFAULT_CACHE_SIZE = 512 * 1024 ** 2
+
+
+class ArrayCache:
+    """
+    Least recently used cache for numpy arrays, limited by the total number of bytes of the cached arrays instead of
+    the number of cached items. Access is thread safe so that arrays can be computed and cached from worker threads.
+
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        """
+        :param max_bytes: int: maximum number of bytes that cached arrays can take up together
+        """
+        self.max_bytes = max_bytes
+
+        # key: array, ordered from least recently used to most recently used
+        self.items = OrderedDict()
+
+        # total number of bytes of all cached arrays
+        self.size = 0
+
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def __len__(self):
+        with self.lock:
+            return len(self.items)
+
+    def get(self, key, default=None):
+        """
+        Return the cached array and mark it as the most recently used one.
+
+        :param key: hashable key of the array
+        :param default: returned if the key is not in the cache
+        :return: np.ndarray or default
+        """
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, array):
+        """
+        Add the array to the cache. Least recently used arrays are dropped until everything fits into max_bytes. An
+        array that is larger then max_bytes on its own is not cached at all.
+
+        :param key: hashable key of the array
+        :param array: np.ndarray: array to cache
+        :return: NoneType
+        """
+        with self.lock:
+            self.pop(key)
+            if array.nbytes > self.max_bytes:
+                return
+            self.items[key] = array
+            self.size += array.nbytes
+            while self.size > self.max_bytes:
+                _, dropped = self.items.popitem(last=False)
+                self.size -= dropped.nbytes
+
+    def pop(self, key):
+        """
+        Remove the array from the cache.
+
+        :param key: hashable key of the array
+        :return: np.ndarray or None if there was no such array
+        """
+        with self.lock:
+            array = self.items.pop(key, None)
+            if array is not None:
+                self.size -= array.nbytes
+            return array
+
+    def keys(self):
+        with self.lock:
+            return list(self.items.keys())
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+
+class ProcessingPipeline:
+    """
+    Computes and remembers arrays derived from source matrices by applying a chain of operations (derivatives,
+    smoothing, corrections, offsets, ...).
+
+    Every derived array is identified by the name of its source and the ordered list of operations (name and parameters
+    of each operation) that were applied to it. All intermediate results are cached in an ArrayCache, so going back to
+    a previously displayed view, or adding one more operation at the end of the chain, never recalculates anything that
+    is still in the cache.
+
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        """
+        :param max_bytes: int: maximum number of bytes that cached results can use (source arrays are not counted)
+        """
+        # name: np.ndarray, arrays to which operations are applied
+        self.sources = {}
+
+        # name: function(array, **params) -> array
+        self.operations = {}
+
+        self.cache = ArrayCache(max_bytes)
+
+    def add_source(self, name, array):
+        """
+        Add (or replace) a source array. Results previously derived from a source with the same name are dropped.
+
+        :param name: string: name of the source (for example "matrix0")
+        :param array: np.ndarray: source data
+        :return: NoneType
+        """
+        if name in self.sources:
+            self.invalidate(name)
+        self.sources[name] = array
+
+    def remove_source(self, name):
+        """
+        Remove the source and all results derived from it.
+
+        :param name: string: name of the source
+        :return: NoneType
+        """
+        self.invalidate(name)
+        self.sources.pop(name, None)
+
+    def register_operation(self, name, function):
+        """
+        Make an operation available to the pipeline.
+
+        :param name: string: name used to refer to the operation in chains of operations
+        :param function: callable(array, **params) that returns a new array, it must not modify the input array
+        :return: NoneType
+        """
+        self.operations[name] = function
+
+    @staticmethod
+    def make_key(source, operations):
+        """
+        Create a hashable key from the name of the source and the list of operations.
+
+        :param source: string: name of the source
+        :param operations: list of (name, params) tuples where params is a dict of parameters of the operation
+        :return: tuple: key used for the cache
+        """
+        return source, tuple((name, tuple(sorted(params.items()))) for name, params in operations)
+
+    def get(self, source, operations=(), cancelled=None):
+        """
+        Get the result of applying the operations (in order) to the source. Cached results of the longest matching
+        beginning of the chain are reused, and only the remaining operations are calculated.
+
+        :param source: string: name of the source
+        :param operations: list of (name, params) tuples
+        :param cancelled: threading.Event: if it gets set while the result is being calculated (from another thread),
+                          calculation stops after the operation that is currently running and None is returned. Results
+                          of operations that finished before that stay in the cache.
+        :return: np.ndarray: result, or None if the calculation was cancelled
+        """
+        operations = list(operations)
+        result = self.sources[source]
+        start = 0
+        for length in range(len(operations), 0, -1):
+            cached = self.cache.get(self.make_key(source, operations[:length]))
+            if cached is not None:
+                result = cached
+                start = length
+                break
+
+        for index in range(start, len(operations)):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            name, params = operations[index]
+            result = self.operations[name](result, **params)
+            self.cache.put(self.make_key(source, operations[:index + 1]), result)
+
+        return result
+
+    def is_cached(self, source, operations):
+        """
+        Check if the result of applying operations to the source is available without calculating anything.
+
+        :param source: string: name of the source
+        :param operations: list of (name, params) tuples
+        :return: bool
+        """
+        return not operations or self.make_key(source, operations) in self.cache
+
+    def put(self, source, operations, array):
+        """
+        Store an already calculated result (used when restoring a session).
+
+        :param source: string: name of the source
+        :param operations: list of (name, params) tuples
+        :param array: np.ndarray: result of applying the operations to the source
+        :return: NoneType
+        """
+        self.cache.put(self.make_key(source, operations), array)
+
+    def invalidate(self, source):
+        """
+        Drop all cached results derived from the source.
+
+        :param source: string: name of the source
+        :return: NoneType
+        """
+        for key in self.cache.keys():
+            if key[0] == source:
+                self.cache.pop(key)
+
+    def cached_results(self):
+        """
+        Return all results that are currently in the cache.
+
+        :return: list of (source, operations, array) tuples, operations is a list of (name, params) tuples
+        """
+        results = []
+        with self.cache.lock:
+            for (source, operations), array in self.cache.items.items():
+                results.append((source, [(name, dict(params)) for name, params in operations], array))
+        return results
@@ -0,0 +1,74 @@
+import numpy as np
+
+from processing.ProcessingPipeline import ArrayCache
+from processing import operations
+
+
+# Amount of memory (in bytes) that corrected matrices of one resistance scan are allowed to use
+DEFAULT_SCAN_CACHE_SIZE = 256 * 1024 ** 2
+
+
+class ResistanceScan:
+    """
+    Calculates series resistance corrections of one matrix for many different resistances. Used to find the value of
+    the series resistance by scrolling trough the values and looking at the corrected data.
+
+    Recently calculated matrices are kept in their own bounded cache (so scanning does not push results of other
+    operations out of the cache of the processing pipeline), and matrices for neighbouring resistances can be
+    calculated in advance in the background.
+
+    """
+
+    def __init__(self, data, y_data, unit_correction=1, max_bytes=DEFAULT_SCAN_CACHE_SIZE):
+        """
+        :param data: np.ndarray: matrix of measured currents
+        :param y_data: np.ndarray: setpoints (voltages) along the y axis of the matrix
+        :param unit_correction: float: factor used to convert the units of the current to the units of the voltage
+        :param max_bytes: int: maximum number of bytes that cached corrected matrices can use
+        """
+        self.data = data
+        self.y_data = np.asarray(y_data)
+        self.unit_correction = unit_correction
+
+        self.cache = ArrayCache(max_bytes)
+
+    def is_cached(self, resistance):
+        """
+        Check if the corrected matrix for this resistance can be returned without calculating anything.
+
+        :param resistance: float: series resistance
+        :return: bool
+        """
+        return resistance in self.cache
+
+    def get(self, resistance):
+        """
+        Return the data corrected for the series resistance. Safe to call from multiple threads.
+
+        :param resistance: float: series resistance
+        :return: np.ndarray: corrected matrix
+        """
+        corrected = self.cache.get(resistance)
+        if corrected is None:
+            corrected = operations.series_resistance_correction(self.data, self.y_data, resistance,
+                                                                self.unit_correction)
+            self.cache.put(resistance, corrected)
+        return corrected
+
+    def prefetch(self, resistances, cancelled=None):
+        """
+        Calculate corrected matrices for the resistances that are not in the cache yet, in the order in which they were
+        passed (pass the most likely next values first).
+
+        :param resistances: list of floats: resistances to calculate
+        :param cancelled: threading.Event: stop calculating as soon as this is set
+        :return: int: number of calculated matrices
+        """
+        calculated = 0
+        for resistance in resistances:
+            if cancelled is not None and cancelled.is_set():
+                break
+            if not self.is_cached(resistance):
+                self.get(resistance)
+                calculated += 1
+        return calculated
@@ -0,0 +1,190 @@
+"""
+Safe evaluation of formulas entered by the user (axis transformations, formulas combining matrices, ...).
+
+Formulas are parsed once into an abstract syntax tree, checked against a whitelist (numbers, variables, arithmetic and
+numpy functions), and compiled. Evaluation is vectorized: variables are whole numpy arrays and the formula is evaluated
+once for all elements.
+
+"""
+import ast
+from functools import lru_cache
+
+import numpy as np
+
+
+# Functions that can be called in formulas, available both by their name (sqrt(x)) and as members of numpy (np.sqrt(x))
+ALLOWED_FUNCTIONS = {name: getattr(np, name) for name in [
+    "abs", "absolute", "sign", "sqrt", "cbrt", "square", "exp", "exp2", "expm1", "log", "log2", "log10", "log1p",
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2", "sinh", "cosh", "tanh", "arcsinh", "arccosh",
+    "arctanh", "hypot", "degrees", "radians", "deg2rad", "rad2deg", "power", "minimum", "maximum", "fmin", "fmax",
+    "floor", "ceil", "trunc", "rint", "real", "imag", "conj", "angle", "reciprocal", "clip", "where", "isnan",
+    "nan_to_num"]}
+# names used by the math module
+ALLOWED_FUNCTIONS.update({"asin": np.arcsin, "acos": np.arccos, "atan": np.arctan, "atan2": np.arctan2,
+                          "pow": np.power})
+
+ALLOWED_CONSTANTS = {"pi": np.pi, "e": np.e, "inf": np.inf, "nan": np.nan}
+
+# Number of elements of every variable that are evaluated at the same time by evaluate_in_chunks (temporary arrays of
+# all sub-expressions are this big instead of the size of the whole matrix)
+CHUNK_SIZE = 2 ** 18
+
+# Names under which numpy can be referenced in formulas
+NUMPY_NAMES = ["np", "numpy"]
+
+# Numbers are parsed into ast.Constant nodes since Python 3.8 (older versions used ast.Num, they are not supported)
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Attribute,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+                 ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq, ast.Constant)
+
+
+class ExpressionError(ValueError):
+    """
+    Raised when the formula can not be parsed, uses something that is not allowed, or references unknown variables.
+
+    """
+    pass
+
+
+class CompiledExpression:
+    """
+    A formula that has been checked and compiled, and can be evaluated on numpy arrays.
+
+    """
+
+    def __init__(self, source, variables):
+        """
+        :param source: string: the formula, for example "2 * x + sqrt(x)"
+        :param variables: tuple of strings: names of the variables that can be used in the formula
+        """
+        self.source = source
+        self.allowed_variables = tuple(variables)
+
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError("Invalid formula {}: {}".format(source, e.msg))
+
+        # names of the variables that are actually used in the formula
+        self.variables = []
+        for node in ast.walk(tree):
+            self.check_node(node)
+            if isinstance(node, ast.Name) and node.id in self.allowed_variables and node.id not in self.variables:
+                self.variables.append(node.id)
+            # python integers have unlimited size, calculating 9**9**9 with them would freeze the program for hours,
+            # with floats it overflows right away
+            if isinstance(node, ast.Constant) and type(node.value) is int:
+                try:
+                    node.value = float(node.value)
+                except OverflowError:
+                    raise ExpressionError("Number {} is too large".format(node.value))
+
+        # formulas that differ only in formatting ("m1/m0" and "m1 / m0") have the same key
+        self.key = ast.dump(tree)
+
+        self.code = compile(tree, "<formula>", "eval")
+
+        self.namespace = {"__builtins__": {}}
+        self.namespace.update(ALLOWED_FUNCTIONS)
+        self.namespace.update(ALLOWED_CONSTANTS)
+        for name in NUMPY_NAMES:
+            self.namespace[name] = np
+
+    def check_node(self, node):
+        """
+        Raise ExpressionError if the node of the syntax tree is not allowed in formulas.
+
+        :param node: ast.AST: node of the syntax tree
+        :return: NoneType
+        """
+        if not isinstance(node, ALLOWED_NODES):
+            raise ExpressionError("{} is not allowed in formulas".format(type(node).__name__))
+
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)):
+            raise ExpressionError("Only numbers can be used as constants in formulas")
+        elif isinstance(node, ast.Name):
+            if node.id in NUMPY_NAMES or node.id in ALLOWED_FUNCTIONS or node.id in ALLOWED_CONSTANTS:
+                return
+            if node.id not in self.allowed_variables:
+                raise ExpressionError("Unknown name {}, available variables are: {}".format(
+                    node.id, ", ".join(self.allowed_variables)))
+        elif isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id in NUMPY_NAMES):
+                raise ExpressionError("Only numpy functions can be accessed as attributes")
+            if node.attr not in ALLOWED_FUNCTIONS and node.attr not in ALLOWED_CONSTANTS:
+                raise ExpressionError("Function {} is not allowed in formulas".format(node.attr))
+        elif isinstance(node, ast.Call):
+            if node.keywords:
+                raise ExpressionError("Keyword arguments are not allowed in formulas")
+            if not isinstance(node.func, (ast.Name, ast.Attribute)) or \
+                    (isinstance(node.func, ast.Name) and node.func.id not in ALLOWED_FUNCTIONS):
+                raise ExpressionError("Only functions can be called in formulas")
+
+    def __call__(self, **values):
+        """
+        Evaluate the formula.
+
+        :param values: arrays (or numbers) for the variables used in the formula
+        :return: result of the formula
+        """
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise ExpressionError("No values for variables: {}".format(", ".join(missing)))
+
+        with np.errstate(all="ignore"):
+            try:
+                return eval(self.code, self.namespace, {name: values[name] for name in self.variables})
+            except OverflowError:
+                raise ExpressionError("Result of the formula {} is too large".format(self.source))
+
+
+@lru_cache(maxsize=256)
+def compile_expression(source, variables):
+    """
+    Parse, check and compile the formula. Compiled formulas are cached, so using the same formula again is free.
+
+    :param source: string: the formula
+    :param variables: tuple of strings: names of the variables that can be used in the formula
+    :return: CompiledExpression
+    """
+    return CompiledExpression(source, tuple(variables))
+
+
+def transform(data, expression, variable):
+    """
+    Apply a formula to all values of an array (used as an operation of the ProcessingPipeline to transform axes).
+
+    :param data: np.ndarray: values
+    :param expression: string: formula, for example "x * 1e3"
+    :param variable: string: name under which the values are referenced in the formula
+    :return: np.ndarray: array with the same shape as data
+    """
+    data = np.asarray(data)
+    result = compile_expression(expression, (variable,))(**{variable: data})
+    return np.array(np.broadcast_to(result, data.shape), dtype=float)
+
+
+def evaluate_in_chunks(expression, values, chunk_size=CHUNK_SIZE):
+    """
+    Evaluate a formula over matrices of the same shape, a block of rows at a time, and write results into one output
+    matrix. Memory used for intermediate results does not depend on the size of the matrices.
+
+    :param expression: CompiledExpression: formula to evaluate
+    :param values: dict: {variable name: np.ndarray}, all arrays have to have the same shape
+    :param chunk_size: int: approximate number of elements evaluated at the same time
+    :return: np.ndarray: result of the formula
+    """
+    arrays = {name: values[name] for name in expression.variables}
+    shapes = set(np.shape(array) for array in arrays.values())
+    if len(shapes) != 1:
+        raise ExpressionError("Formula {} has to use at least one matrix, and all used matrices need to have the same "
+                              "shape".format(expression.source))
+    shape = shapes.pop()
+    if len(shape) == 0:
+        return np.asarray(expression(**arrays), dtype=float)
+
+    rows = max(1, chunk_size // max(1, int(np.prod(shape[1:]))))
+    result = np.empty(shape, dtype=float)
+    for start in range(0, shape[0], rows):
+        result[start:start + rows] = expression(**{name: array[start:start + rows] for name, array in arrays.items()})
+    return result
@@ -0,0 +1,652 @@
+"""
+Operations that can be applied to matrices by the ProcessingPipeline. Every operation takes an array as the first
+argument and parameters of the operation as keyword arguments, and returns a new array without modifying the input.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+
+# Matrices are extended by mirroring this fraction of their size on every side before they are Fourier transformed,
+# so filters do not mix values from opposite edges of the matrix
+FFT_PADDING = 0.125
+
+
+def x_derivative(data):
+    """
+    Derivative of the data along the x axis (first axis of the matrix).
+
+    :param data: np.ndarray: matrix
+    :return: np.ndarray: matrix with one row less then the input
+    """
+    return np.diff(data, 1, 0)
+
+
+def y_derivative(data):
+    """
+    Derivative of the data along the y axis (second axis of the matrix).
+
+    :param data: np.ndarray: matrix
+    :return: np.ndarray: matrix with one column less then the input
+    """
+    return np.diff(data, 1, 1)
+
+
+def moving_average(data, window, axis):
+    """
+    Replace every point by the average of the points within window points of it along the axis. Near the edges of the
+    data the window shrinks, only the points that exist are averaged. NaN values (unfinished measurements) are ignored.
+
+    Sums over the windows are calculated as differences of the cumulative sum, so the time needed does not depend on the
+    size of the window.
+
+    :param data: np.ndarray: matrix
+    :param window: int: number of points to the left and right of the point that are included in the average
+    :param axis: int: axis along which the average is calculated
+    :return: np.ndarray: averaged matrix
+    """
+    if window <= 0:
+        return data
+
+    values = np.moveaxis(np.asarray(data, dtype=float), axis, 0)
+    length = values.shape[0]
+
+    valid = ~np.isnan(values)
+    has_nan = not valid.all()
+
+    # subtracting the mean keeps the cumulative sum small, otherwise precision is lost on large data sets
+    if has_nan:
+        mean = values[valid].mean() if valid.any() else 0
+        centered = np.where(valid, values - mean, 0)
+    else:
+        mean = values.mean()
+        centered = values - mean
+    cumulative = np.zeros((length + 1,) + values.shape[1:])
+    np.cumsum(centered, axis=0, out=cumulative[1:])
+
+    index = np.arange(length)
+    low = np.maximum(index - window, 0)
+    high = np.minimum(index + window + 1, length)
+    result = cumulative[high]
+    result -= cumulative[low]
+
+    if has_nan:
+        counts = np.zeros((length + 1,) + values.shape[1:])
+        np.cumsum(valid, axis=0, out=counts[1:])
+        counts = counts[high] - counts[low]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result /= counts
+            result += mean * counts / counts
+    else:
+        counts = (high - low).reshape((length,) + (1,) * (values.ndim - 1))
+        result /= counts
+        result += mean
+
+    return np.moveaxis(result, 0, axis)
+
+
+def naive_smoothing(data, x, y):
+    """
+    Smoothen the data by replacing every point P by the average of the points in the rectangle of 2x+1 by 2y+1 points
+    around it (box filter). The filter is applied separately along each axis, near the edges the rectangle shrinks.
+
+    Example:
+
+    [[1, 4, 3],
+     [2, 8, 2],
+     [3, 5, 6]]
+
+     If this example matrix is smoothened along the second axis with a value 1 (1 to the left and 1 to the right
+     of the data point) the result matrix would be:
+
+     [[2.5, 2.66, 3.5], -> (1+4) / 2 = 2.5 \\\\ (1+4+3) / 3 = 2.66 \\\\ (4+3) / 2 = 3.5
+      [5, 4, 5]         -> (2+8) / 2 = 5 \\\\ (2+8+2) / 3 = 4 \\\\ (8+2) / 2 = 5
+      [4, 4.66, 5.5]]   -> (3+5) / 2 = 4 \\\\ (3+5+6) / 3 = 4.66 \\\\ (5+6) / 2 = 5.5
+
+    :param data: np.ndarray: matrix
+    :param x: int: number of neighbouring points taken into account along the x axis (first axis of the matrix)
+    :param y: int: number of neighbouring points taken into account along the y axis (second axis of the matrix)
+    :return: np.ndarray: smoothened matrix
+    """
+    return moving_average(moving_average(data, x, 0), y, 1)
+
+
+def decimate(data, factor):
+    """
+    Take every n-th point of the matrix along both axes. Used to create smaller versions of large matrices that are
+    fast to process, for example to show a preview while the full matrix is being processed.
+
+    :param data: np.ndarray: matrix
+    :param factor: int: n
+    :return: np.ndarray: matrix with approximately factor^2 times less points
+    """
+    return np.ascontiguousarray(data[::factor, ::factor])
+
+
+def preview_factor(shape, max_size):
+    """
+    Calculate how much a matrix has to be decimated so that its preview has at most max_size points.
+
+    :param shape: tuple: shape of the matrix
+    :param max_size: int: maximum number of points of the preview
+    :return: int: decimation factor (power of 2)
+    """
+    size = np.prod(shape)
+    factor = 1
+    while size / factor ** 2 > max_size:
+        factor *= 2
+    return factor
+
+
+def stretch(preview, factor, shape):
+    """
+    Stretch a preview (calculated on a matrix decimated by factor) back to the shape of the full result. Every point
+    of the preview is repeated factor times along both axes, the result is then cut to the shape, or extended by
+    repeating its last row and column if it is too small (operations that shrink the matrix, like derivatives, remove
+    one point of the decimated matrix, that is factor points of the full one).
+
+    :param preview: np.ndarray: matrix calculated from the decimated matrix
+    :param factor: int: decimation factor
+    :param shape: tuple: shape of the full result
+    :return: np.ndarray: matrix with the given shape
+    """
+    stretched = np.repeat(np.repeat(preview, factor, 0), factor, 1)[:shape[0], :shape[1]]
+    missing = [(0, max(shape[0] - stretched.shape[0], 0)), (0, max(shape[1] - stretched.shape[1], 0))]
+    if any(after for _, after in missing) and stretched.size:
+        stretched = np.pad(stretched, missing, mode="edge")
+    return stretched
+
+
+def get_fft_module():
+    """
+    Get the module used to calculate Fourier transforms: scipy.fft (faster, and uses all processor cores) if scipy is
+    installed, otherwise numpy.fft.
+
+    :return: tuple: (module, dict of keyword arguments passed to transform functions)
+    """
+    try:
+        import scipy.fft
+    except ImportError:
+        return np.fft, {}
+    return scipy.fft, {"workers": os.cpu_count()}
+
+
+def fft_padding(shape, padding=FFT_PADDING):
+    """
+    Calculate how many points are added to each side of a matrix before it is Fourier transformed.
+
+    :param shape: tuple: shape of the matrix
+    :param padding: float: fraction of the size of the matrix added on each side
+    :return: tuple: (rows added on each side, columns added on each side, extra column added at the end so that the
+             number of columns is even)
+    """
+    rows = min(int(shape[0] * padding), shape[0] - 1)
+    columns = min(int(shape[1] * padding), shape[1] - 1)
+    extra = (shape[1] + 2 * columns) % 2
+    return rows, columns, extra
+
+
+def fourier_transform(data, padding=FFT_PADDING):
+    """
+    Calculate the 2D Fourier transform (of real values) of a matrix extended by mirroring its edges. NaN values are
+    replaced by the mean of the matrix. Result is used by fourier_filter, transform is cached by the pipeline, so
+    trying different filters on the same matrix only costs one multiplication and one inverse transform per filter.
+
+    :param data: np.ndarray: matrix
+    :param padding: float: fraction of the size of the matrix added by mirroring on each side
+    :return: np.ndarray: complex spectrum (as returned by numpy.fft.rfft2) of the extended matrix
+    """
+    data = np.asarray(data, dtype=float)
+    finite = np.isfinite(data)
+    if not finite.all():
+        data = np.where(finite, data, data[finite].mean() if finite.any() else 0)
+    rows, columns, extra = fft_padding(data.shape, padding)
+    extended = np.pad(data, ((rows, rows), (columns, columns + extra)), mode="reflect")
+    fft, kwargs = get_fft_module()
+    return fft.rfft2(extended, **kwargs)
+
+
+def gaussian_response(fx, fy, x=0, y=0):
+    """
+    Gaussian smoothing, same as convolution with a gaussian with standard deviations x and y (in points).
+    """
+    # separable, product of two 1D responses is much cheaper then evaluating the exponential on the whole grid
+    return np.exp(-2 * np.pi ** 2 * (x * fx) ** 2) * np.exp(-2 * np.pi ** 2 * (y * fy) ** 2)
+
+
+def lorentzian_response(fx, fy, x=0, y=0):
+    """
+    Lorentzian smoothing, same as convolution with a lorentzian with half widths at half maximum x and y (in points).
+    """
+    return np.exp(-2 * np.pi * np.sqrt((x * fx) ** 2 + (y * fy) ** 2))
+
+
+def low_pass_response(fx, fy, cutoff=0.5):
+    """
+    Keep frequencies (in cycles per point, 0 - 0.5) lower then the cutoff.
+    """
+    return np.hypot(fx, fy) <= cutoff
+
+
+def high_pass_response(fx, fy, cutoff=0):
+    """
+    Keep frequencies (in cycles per point, 0 - 0.5) higher then the cutoff.
+    """
+    return np.hypot(fx, fy) > cutoff
+
+
+def band_pass_response(fx, fy, low=0, high=0.5):
+    """
+    Keep frequencies (in cycles per point, 0 - 0.5) between low and high.
+    """
+    frequency = np.hypot(fx, fy)
+    return (frequency >= low) & (frequency <= high)
+
+
+def notch_response(fx, fy, x=0, y=0, width=0.01):
+    """
+    Remove periodic noise with frequency x along the first axis and y along the second axis (in cycles per point), by
+    removing all frequencies closer then width to it.
+    """
+    return (np.hypot(fx - x, fy - y) > width) & (np.hypot(fx + x, fy + y) > width)
+
+
+# kind of the filter: function that calculates the response of the filter for given frequencies
+FOURIER_FILTERS = {"gaussian": gaussian_response,
+                   "lorentzian": lorentzian_response,
+                   "low_pass": low_pass_response,
+                   "high_pass": high_pass_response,
+                   "band_pass": band_pass_response,
+                   "notch": notch_response}
+
+
+def fourier_filter(spectrum, shape, kind, padding=FFT_PADDING, **params):
+    """
+    Filter a matrix in the frequency domain: multiply its spectrum by the response of the filter and transform it back.
+
+    :param spectrum: np.ndarray: spectrum of the matrix calculated by fourier_transform
+    :param shape: tuple: shape of the original matrix
+    :param kind: string: kind of the filter, one of the keys of FOURIER_FILTERS
+    :param padding: float: padding that was used by fourier_transform
+    :param params: parameters of the filter (see functions in FOURIER_FILTERS)
+    :return: np.ndarray: filtered matrix
+    """
+    rows, columns, extra = fft_padding(shape, padding)
+    extended_shape = (shape[0] + 2 * rows, shape[1] + 2 * columns + extra)
+    fx = np.fft.fftfreq(extended_shape[0])[:, None]
+    fy = np.fft.rfftfreq(extended_shape[1])[None, :]
+    response = FOURIER_FILTERS[kind](fx, fy, **params)
+    fft, kwargs = get_fft_module()
+    filtered = fft.irfft2(spectrum * response, s=extended_shape, **kwargs)
+    return np.ascontiguousarray(filtered[rows:rows + shape[0], columns:columns + shape[1]])
+
+
+def uniform_grid(setpoints, tolerance=1e-3, max_factor=4):
+    """
+    Check if the setpoints are evenly spaced, and if they are not create an evenly spaced grid on which the data can be
+    displayed. Spacing of the grid is the smallest spacing of the setpoints (so no detail is lost), but the grid has at
+    most max_factor times more points then there are setpoints.
+
+    :param setpoints: np.ndarray: values of the setpoints along one axis
+    :param tolerance: float: relative difference between steps up to which the setpoints are considered evenly spaced
+    :param max_factor: int: maximum ratio between the number of points of the grid and the number of setpoints
+    :return: np.ndarray: evenly spaced grid from the first to the last setpoint, or None if setpoints are already evenly
+                         spaced
+    """
+    setpoints = np.asarray(setpoints, dtype=float)
+    if len(setpoints) < 3:
+        return None
+
+    steps = np.diff(setpoints)
+    step = (setpoints[-1] - setpoints[0]) / (len(setpoints) - 1)
+    if step == 0 or np.all(np.abs(steps - step) <= tolerance * abs(step)):
+        return None
+
+    smallest = np.min(np.abs(steps[steps != 0]))
+    count = int(min(abs(setpoints[-1] - setpoints[0]) / smallest + 1, max_factor * len(setpoints)))
+    return np.linspace(setpoints[0], setpoints[-1], max(count, len(setpoints)))
+
+
+def resample_axis(data, setpoints, grid, axis):
+    """
+    Linearly interpolate the data from the setpoints to the grid along one axis of the matrix. Setpoints do not need to
+    be sorted. If the data has one point less then there are setpoints (derivative of the data), midpoints between the
+    setpoints are used.
+
+    :param data: np.ndarray: matrix
+    :param setpoints: np.ndarray: positions of the data points along the axis
+    :param grid: np.ndarray: positions at which the data is evaluated
+    :param axis: int: axis of the matrix that is resampled
+    :return: np.ndarray: matrix with len(grid) points along the axis
+    """
+    setpoints = np.asarray(setpoints, dtype=float)
+    if data.shape[axis] == len(setpoints) - 1:
+        setpoints = (setpoints[1:] + setpoints[:-1]) / 2
+
+    order = np.argsort(setpoints, kind="stable")
+    sorted_setpoints = setpoints[order]
+
+    upper = np.clip(np.searchsorted(sorted_setpoints, grid, side="right"), 1, len(setpoints) - 1)
+    lower = upper - 1
+    span = sorted_setpoints[upper] - sorted_setpoints[lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(span != 0, (grid - sorted_setpoints[lower]) / span, 0)
+    weight = np.clip(weight, 0, 1)
+
+    shape = [1] * data.ndim
+    shape[axis] = len(grid)
+    weight = weight.reshape(shape)
+
+    result = np.take(data, order[lower], axis=axis) * (1 - weight)
+    result += np.take(data, order[upper], axis=axis) * weight
+    return result
+
+
+def nearest_indices(setpoints, values):
+    """
+    For every value find the index of the setpoint closest to it. Setpoints do not need to be sorted.
+
+    :param setpoints: np.ndarray: values of the setpoints
+    :param values: np.ndarray: values for which the closest setpoints are searched
+    :return: np.ndarray: indices of the closest setpoints (same shape as values)
+    """
+    setpoints = np.asarray(setpoints, dtype=float)
+    order = np.argsort(setpoints, kind="stable")
+    sorted_setpoints = setpoints[order]
+
+    upper = np.clip(np.searchsorted(sorted_setpoints, values), 1, len(setpoints) - 1) if len(setpoints) > 1 else \
+        np.zeros(np.shape(values), dtype=np.intp)
+    lower = np.maximum(upper - 1, 0)
+    closer_to_lower = np.abs(values - sorted_setpoints[lower]) <= np.abs(sorted_setpoints[upper] - values)
+    return order[np.where(closer_to_lower, lower, upper)]
+
+
+def regrid(data, x_setpoints, y_setpoints, x_grid=None, y_grid=None):
+    """
+    Resample the matrix measured on unevenly spaced setpoints to evenly spaced grids (see uniform_grid), so that it
+    can be displayed as an image.
+
+    :param data: np.ndarray: matrix
+    :param x_setpoints: np.ndarray: setpoints along the first axis of the matrix
+    :param y_setpoints: np.ndarray: setpoints along the second axis of the matrix
+    :param x_grid: np.ndarray: evenly spaced grid along the first axis, or None if the axis does not need resampling
+    :param y_grid: np.ndarray: evenly spaced grid along the second axis, or None if the axis does not need resampling
+    :return: np.ndarray: resampled matrix
+    """
+    if x_grid is not None:
+        data = resample_axis(data, x_setpoints, x_grid, 0)
+    if y_grid is not None:
+        data = resample_axis(data, y_setpoints, y_grid, 1)
+    return data
+
+
+def offset(data, value):
+    """
+    Shift all values of the data by a constant (used to apply offsets to axes).
+
+    :param data: np.ndarray: values
+    :param value: float: offset
+    :return: np.ndarray: data + value
+    """
+    return data + value
+
+
+def line_sums(data, vector, axis):
+    """
+    Calculate sums of the values of every line of the matrix weighted by the vector (matrix vector product).
+
+    :param data: np.ndarray: matrix
+    :param vector: np.ndarray: weights, one for every point of the line
+    :param axis: int: lines go along this axis
+    :return: np.ndarray: sums, shape of the matrix with the length along the axis reduced to 1
+    """
+    if axis == 1:
+        return (data @ vector)[:, None]
+    return (vector @ data)[None, :]
+
+
+def line_background(data, method, axis):
+    """
+    Calculate the background of every line of the matrix (offset of the line, or offset and slope), used to remove
+    offsets between lines that were measured one after another. Background of all lines is calculated at once by
+    reductions along the axis, NaN values are ignored.
+
+    :param data: np.ndarray: matrix
+    :param method: string: "mean", "median" or "linear" (least squares line through the points of the line)
+    :param axis: int: lines go along this axis (axis=1: lines are data[i, :])
+    :return: np.ndarray: background, can be broadcast to the shape of the matrix
+    """
+    data = np.asarray(data, dtype=float)
+    finite = np.isfinite(data)
+    all_finite = finite.all()
+
+    if method == "median":
+        with np.errstate(all="ignore"):
+            if all_finite:
+                return np.median(data, axis=axis, keepdims=True)
+            return np.nanmedian(data, axis=axis, keepdims=True)
+    if method not in ["mean", "linear"]:
+        raise ValueError("Unknown background method {}".format(method))
+
+    # t is the position of the point in the line, centered so that sums of its powers stay small
+    length = data.shape[axis]
+    t = np.arange(length, dtype=float) - (length - 1) / 2
+    ones = np.ones(length)
+    if all_finite:
+        values = data
+        count, t_sum, t_squared_sum = length, 0.0, float(t @ t)
+    else:
+        values = np.where(finite, data, 0)
+        weights = finite.astype(float)
+        count, t_sum, t_squared_sum = [line_sums(weights, vector, axis) for vector in [ones, t, t * t]]
+
+    with np.errstate(all="ignore"):
+        values_sum = line_sums(values, ones, axis)
+        if method == "mean":
+            return values_sum / count
+
+        # least squares line a + b * t through every line, closed form solution with sums of (weighted) values
+        values_t_sum = line_sums(values, t, axis)
+        slope = (count * values_t_sum - t_sum * values_sum) / (count * t_squared_sum - t_sum * t_sum)
+        # lines with a single point have no slope
+        slope = np.where(np.isfinite(slope), slope, 0)
+        intercept = (values_sum - slope * t_sum) / count
+
+    shape = [1, 1]
+    shape[axis] = length
+    return intercept + slope * t.reshape(shape)
+
+
+def subtract_line_background(data, method, axis):
+    """
+    Subtract the mean, median or linear fit of every line from the line.
+
+    :param data: np.ndarray: matrix
+    :param method: string: "mean", "median" or "linear"
+    :param axis: int: lines go along this axis (axis=1: lines are data[i, :])
+    :return: np.ndarray: matrix without the background
+    """
+    return np.asarray(data, dtype=float) - line_background(data, method, axis)
+
+
+def plane_background(data):
+    """
+    Fit a plane a + b * i + c * j (i, j are indices of the matrix) through all finite values of the matrix by least
+    squares. The normal equations only need sums of the values weighted by i and j, which are calculated with matrix
+    vector products instead of building the (size x 3) design matrix.
+
+    :param data: np.ndarray: matrix
+    :return: np.ndarray: values of the plane at every point of the matrix
+    """
+    data = np.asarray(data, dtype=float)
+    finite = np.isfinite(data)
+    i = np.arange(data.shape[0], dtype=float)
+    j = np.arange(data.shape[1], dtype=float)
+
+    # sums over rows and columns (number of finite values and sums of the values), the rest is calculated from these
+    if finite.all():
+        values = data
+        weights = None
+        weight_rows, weight_columns = np.full(data.shape[0], data.shape[1]), np.full(data.shape[1], data.shape[0])
+    else:
+        values = np.where(finite, data, 0)
+        weights = finite.astype(float)
+        weight_rows, weight_columns = weights.sum(axis=1), weights.sum(axis=0)
+    value_rows, value_columns = values.sum(axis=1), values.sum(axis=0)
+
+    n = weight_rows.sum()
+    si, sj = i @ weight_rows, j @ weight_columns
+    sii, sjj = (i * i) @ weight_rows, (j * j) @ weight_columns
+    sij = i.sum() * j.sum() if weights is None else i @ weights @ j
+    normal = np.array([[n, si, sj], [si, sii, sij], [sj, sij, sjj]])
+    right = np.array([value_rows.sum(), i @ value_rows, j @ value_columns])
+
+    coefficients = np.linalg.lstsq(normal, right, rcond=None)[0]
+    return coefficients[0] + coefficients[1] * i[:, None] + coefficients[2] * j[None, :]
+
+
+def subtract_plane(data):
+    """
+    Subtract the least squares plane from the matrix (removes a global tilt of the data).
+
+    :param data: np.ndarray: matrix
+    :return: np.ndarray: matrix without the plane
+    """
+    return np.asarray(data, dtype=float) - plane_background(data)
+
+
+def normalize(data, method, axis=None):
+    """
+    Normalize the matrix, or every line of the matrix separately. NaN values are ignored.
+
+    :param data: np.ndarray: matrix
+    :param method: string: "range" (scale values to 0 - 1), "max" (divide by the maximum absolute value) or "std"
+                           (subtract the mean and divide by the standard deviation)
+    :param axis: int: if given, every line along this axis is normalized separately, otherwise the whole matrix
+    :return: np.ndarray: normalized matrix
+    """
+    data = np.asarray(data, dtype=float)
+    keepdims = axis is not None
+    with np.errstate(all="ignore"):
+        if method == "range":
+            low = np.nanmin(data, axis=axis, keepdims=keepdims)
+            high = np.nanmax(data, axis=axis, keepdims=keepdims)
+            shift, scale = low, high - low
+        elif method == "max":
+            shift, scale = 0, np.nanmax(np.abs(data), axis=axis, keepdims=keepdims)
+        elif method == "std":
+            shift = line_background(data, "mean", axis) if keepdims else np.nanmean(data)
+            scale = np.nanstd(data, axis=axis, keepdims=keepdims)
+        else:
+            raise ValueError("Unknown normalization method {}".format(method))
+        # constant lines can not be scaled, they are only shifted
+        scale = np.where(scale > 0, scale, 1)
+        return (data - shift) / scale
+
+
+def batched_interp(x, xp, fp, left=0, right=0, workers=None, out=None):
+    """
+    One dimensional linear interpolation of every row of a matrix, result[i] = np.interp(x, xp[i], fp[i]). Rows are
+    split between multiple threads (np.interp releases the GIL, so they really run in parallel).
+
+    Every row of xp has to be sorted in the same direction as x. Like np.interp, rows of xp have to be increasing, so
+    if x is decreasing all arrays are reversed before the interpolation and the result is reversed back (measurements
+    swept from high to low setpoints can be interpolated without reordering them).
+
+    :param x: np.ndarray: 1D array of coordinates at which the rows are evaluated
+    :param xp: np.ndarray: matrix of x coordinates of the data points, one row for every row of fp, sorted in the
+                           same direction as x
+    :param fp: np.ndarray: matrix of y coordinates of the data points
+    :param left: float: value returned for x < xp[i][0]
+    :param right: float: value returned for x > xp[i][-1]
+    :param workers: int: number of threads to use, number of CPUs by default
+    :param out: np.ndarray: matrix in which the result is written, new matrix is created if None (out can not be the
+                same array as xp or fp)
+    :return: np.ndarray: matrix with shape (number of rows in fp, length of x)
+    """
+    x = np.asarray(x)
+    result = np.empty((fp.shape[0], x.shape[0])) if out is None else out
+
+    reverse = len(x) > 1 and not np.all(np.diff(x) > 0)
+    if reverse:
+        x, xp, fp = x[::-1], xp[:, ::-1], fp[:, ::-1]
+        target = result[:, ::-1]
+    else:
+        target = result
+
+    def interpolate_rows(rows):
+        for row in rows:
+            target[row] = np.interp(x, xp[row], fp[row], left=left, right=right)
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [rows for rows in np.array_split(np.arange(fp.shape[0]), workers) if len(rows)]
+    if len(chunks) > 1:
+        with ThreadPoolExecutor(len(chunks)) as executor:
+            list(executor.map(interpolate_rows, chunks))
+    else:
+        for rows in chunks:
+            interpolate_rows(rows)
+
+    return result
+
+
+def series_resistance_voltages(currents, y_data, resistance, unit_correction=1):
+    """
+    Voltages on the sample when there is a resistance in series with it: (|V| - |R * I| * unit_correction) * sign(V).
+    Calculated for all rows at once, with only one matrix allocated.
+
+    :param currents: np.ndarray: matrix of measured currents
+    :param y_data: np.ndarray: setpoints (voltages) along the y axis of the matrix
+    :param resistance: float: series resistance
+    :param unit_correction: float: factor used to convert the units of the current to the units of the voltage
+    :return: np.ndarray: matrix of corrected voltages
+    """
+    y_data = np.asarray(y_data, dtype=float)
+
+    corrected_voltages = np.abs(currents, dtype=float)
+    corrected_voltages *= -abs(resistance) * unit_correction
+    corrected_voltages += np.abs(y_data)
+    corrected_voltages *= np.where(y_data >= 0, 1.0, -1.0)
+    return corrected_voltages
+
+
+def series_resistance_correction(data, y_data, resistance, unit_correction=1):
+    """
+    Correct the data for the voltage drop on a resistance in series with the sample: Y(real) = Y - (I * R). Data is
+    interpolated back onto the original setpoints (y_data) so that the result has the same shape as the input.
+
+    :param data: np.ndarray: matrix of measured currents
+    :param y_data: np.ndarray: setpoints (voltages) along the y axis of the matrix
+    :param resistance: float: series resistance
+    :param unit_correction: float: factor used to convert the units of the current to the units of the voltage
+    :return: np.ndarray: corrected matrix
+    """
+    corrected_voltages = series_resistance_voltages(data, y_data, resistance, unit_correction)
+    return batched_interp(np.asarray(y_data, dtype=float), corrected_voltages, data, left=0, right=0)
+
+
+def didv_correction(data, currents, y_data, resistance, dv, unit_correction=1):
+    """
+    Correct differential conductance for the series resistance: dV(real) = dV - (dI * R).
+
+    Measured dI is first interpolated onto the corrected voltages (calculated from the currents), and then divided by
+    dV(real). Arithmetic is done in place, apart from the result only the matrix of corrected voltages is allocated.
+
+    :param data: np.ndarray: matrix of measured dI
+    :param currents: np.ndarray: matrix of measured currents (same shape as data)
+    :param y_data: np.ndarray: setpoints (voltages) along the y axis of the matrix
+    :param resistance: float: series resistance
+    :param dv: float: amplitude of the voltage excitation
+    :param unit_correction: float: factor used to convert the units of the current to the units of the voltage
+    :return: np.ndarray: corrected dI/dV matrix
+    """
+    buffer = series_resistance_voltages(currents, y_data, resistance, unit_correction)
+    result = batched_interp(np.asarray(y_data, dtype=float), buffer, data, left=0, right=0)
+
+    # buffer is not needed anymore, reuse it for dV(real)
+    np.multiply(result, -resistance, out=buffer)
+    buffer += dv
+    result /= buffer
+    return result
@@ -115,8 +115,9 @@ class BufferExplorer(QWidget):
                     img = pg.ImageItem()
                     img.setImage(self.buffers[candidate].get_matrix(index=0))
                     (x_scale, y_scale) = self.buffers[candidate].get_scale()
-                    img.translate(self.buffers[candidate].get_x_axis_values()[0],
-                                  self.buffers[candidate].get_y_axis_values()[0][0])
+                    # centers of the first and the last pixel are at the first and the last setpoint
+                    img.translate(self.buffers[candidate].get_x_axis_values()[0] - x_scale / 2,
+                                  self.buffers[candidate].get_y_axis_values()[0][0] - y_scale / 2)
                     img.scale(x_scale, y_scale)
                     histogram = pg.HistogramLUTItem()
                     histogram.setImageItem(img)
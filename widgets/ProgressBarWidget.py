@@ -7,17 +7,18 @@ class ProgressBarWidget(QWidget):
 
     finished = pyqtSignal(object)
 
-    def __init__(self, title):
+    def __init__(self, title, action="Loading"):
         super().__init__()
 
         self.title = title
+        self.action = action
 
         self.init_ui()
         self.show()
 
     def init_ui(self):
 
-        self.setWindowTitle("Loading {}".format(self.title))
+        self.setWindowTitle("{} {}".format(self.action, self.title))
         self.setGeometry(200, 200, 200, 50)
         self.grid_layout = QGridLayout()
         self.progressBar = QProgressBar()
@@ -0,0 +1,142 @@
+from PyQt5.QtWidgets import QWidget, QDesktopWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, \
+    QSlider
+from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtGui import QIcon
+from helpers import show_error_message, is_numeric
+
+
+class ResistanceScanWidget(QWidget):
+    """
+    Widget with a slider used to scroll trough values of series resistance. Every time the slider is moved the new
+    resistance is emitted trough value_changed signal, and when the user decides which resistance is correct, it is
+    emitted trough submitted signal.
+
+    """
+
+    # emits the resistance selected with the slider
+    value_changed = pyqtSignal(float)
+
+    # emits [resistance] when the user commits the selected resistance
+    submitted = pyqtSignal(object)
+
+    # emitted when the window is closed
+    closed = pyqtSignal()
+
+    def __init__(self, minimum=0, maximum=1000, steps=100, parent=None):
+        """
+        :param minimum: float: smallest resistance that can be selected
+        :param maximum: float: largest resistance that can be selected
+        :param steps: int: number of steps between the smallest and the largest resistance
+        :param parent: reference to the window that opened this widget
+        """
+        super(ResistanceScanWidget, self).__init__()
+
+        self.parent = parent
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.steps = steps
+
+        self.init_ui()
+
+    def init_ui(self):
+        _, _, width, height = QDesktopWidget().screenGeometry().getCoords()
+        self.setGeometry(int(0.2 * width), int(0.2 * height), 400, 150)
+
+        self.setWindowTitle("Resistance scan")
+        self.setWindowIcon(QIcon("img/line-chart.png"))
+
+        v_layout = QVBoxLayout()
+        v_layout.addWidget(QLabel("Move the slider to correct the data for different series resistances"))
+
+        h_layout_range = QHBoxLayout()
+        self.minimum_textbox = QLineEdit(str(self.minimum))
+        self.minimum_textbox.setPlaceholderText("Minimum resistance [Ω]")
+        self.maximum_textbox = QLineEdit(str(self.maximum))
+        self.maximum_textbox.setPlaceholderText("Maximum resistance [Ω]")
+        self.steps_textbox = QLineEdit(str(self.steps))
+        self.steps_textbox.setPlaceholderText("Number of steps")
+        self.apply_range_btn = QPushButton("Apply range")
+        self.apply_range_btn.clicked.connect(self.apply_range)
+        for widget in [self.minimum_textbox, self.maximum_textbox, self.steps_textbox, self.apply_range_btn]:
+            h_layout_range.addWidget(widget)
+        v_layout.addLayout(h_layout_range)
+
+        h_layout_slider = QHBoxLayout()
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(0, self.steps)
+        self.slider.valueChanged.connect(self.emit_value)
+        self.value_label = QLabel()
+        self.value_label.setMinimumWidth(80)
+        h_layout_slider.addWidget(self.slider)
+        h_layout_slider.addWidget(self.value_label)
+        v_layout.addLayout(h_layout_slider)
+
+        self.submit_btn = QPushButton("Add corrected matrix")
+        self.submit_btn.clicked.connect(self.submit_data)
+        v_layout.addWidget(self.submit_btn)
+
+        self.setLayout(v_layout)
+        self.update_label()
+        self.show()
+
+    def get_resistance(self, position=None):
+        """
+        Convert position of the slider to the value of resistance.
+
+        :param position: int: position of the slider, current position if None
+        :return: float: resistance
+        """
+        if position is None:
+            position = self.slider.value()
+        return self.minimum + position * (self.maximum - self.minimum) / self.steps
+
+    def get_neighbouring_resistances(self, count=3):
+        """
+        Resistances of the slider positions closest to the current one, ordered by distance from the current position.
+        These are the values most likely to be selected next.
+
+        :param count: int: number of positions on each side of the current position
+        :return: list of floats: resistances
+        """
+        position = self.slider.value()
+        resistances = []
+        for distance in range(1, count + 1):
+            for neighbour in [position + distance, position - distance]:
+                if 0 <= neighbour <= self.steps:
+                    resistances.append(self.get_resistance(neighbour))
+        return resistances
+
+    def update_label(self):
+        self.value_label.setText("{:g} Ω".format(self.get_resistance()))
+
+    def emit_value(self):
+        self.update_label()
+        self.value_changed.emit(self.get_resistance())
+
+    def apply_range(self):
+        """
+        Change the range of the slider to the values from the text boxes.
+
+        :return: NoneType
+        """
+        values = [self.minimum_textbox.text(), self.maximum_textbox.text(), self.steps_textbox.text()]
+        if not all(is_numeric(value) for value in values):
+            show_error_message("Warning", "Input data has to be numeric")
+            return
+        if int(float(values[2])) < 1:
+            show_error_message("Warning", "Number of steps has to be at least 1")
+            return
+
+        self.minimum = float(values[0])
+        self.maximum = float(values[1])
+        self.steps = int(float(values[2]))
+        self.slider.setRange(0, self.steps)
+        self.emit_value()
+
+    def submit_data(self):
+        self.submitted.emit([self.get_resistance()])
+
+    def closeEvent(self, event):
+        self.closed.emit()
+        super(ResistanceScanWidget, self).closeEvent(event)